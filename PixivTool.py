@@ -135,6 +135,9 @@ class Window(FluentWindow):
         # 设置当最后一个窗口关闭时，应用程序不退出，以便托盘图标可以继续运行
         QApplication.setQuitOnLastWindowClosed(False)
 
+        # 恢复上次退出或崩溃时未完成的下载任务
+        download_manager.restore_tasks()
+
     def init_widgets(self):
         self.widget_map = {}
         for data in data_list:
@@ -0,0 +1,550 @@
+# app/async_engine.py
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .download import DownloadTask, RetryLater, IMAGE_RESUME_ATTEMPTS, TAG_PAGE_CONCURRENCY, \
+    PIPELINE_BACKLOG_LIMIT, DEFAULT_API_WORKERS, PAGE_RETRY_ATTEMPTS, cookie_manager
+from .details_cache import details_cache
+from .rate_limit import bandwidth_limiter
+from .progress import byte_counter
+from .task_journal import task_journal
+
+# httpx 为可选依赖，未安装时只能使用线程池下载引擎
+try:
+    import httpx
+
+    HTTPX_AVAILABLE = True
+except ImportError as e:
+    HTTPX_AVAILABLE = False
+    print(f"警告: httpx 不可用，将无法使用异步下载引擎: {e}")
+
+DEFAULT_ASYNC_CONCURRENCY = 100  # 默认的同时在途图片数
+ASYNC_API_CONCURRENCY = DEFAULT_API_WORKERS * 2  # 同时在途的 API 请求数，API 另受令牌桶限流
+ASYNC_IO_WORKERS = 8  # 执行 SQLite 与文件读写等阻塞调用的线程数，事件循环线程只处理网络
+ASYNC_WRITE_BUFFER = 256 * 1024  # 图片数据攒够该大小再交给 I/O 线程写入，避免每个 8KB 分块都切换一次线程
+
+
+class AsyncEngine:
+    """
+    异步下载引擎。
+    在一个后台线程中运行 asyncio 事件循环，所有异步任务共享同一组 httpx.AsyncClient 连接池，
+    在途请求数只受信号量限制，而不受操作系统线程数限制；API 请求与图片下载使用各自的信号量，互不占用。
+    SQLite 读写、文件读写等阻塞调用通过 run_blocking() 交给一个小线程池，不阻塞事件循环。
+    """
+    _instance, _lock = None, threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, '_initialized'): return
+        self.loop = None
+        self.semaphore = None  # 图片下载
+        self.api_semaphore = None  # 枚举、详情请求
+        self._clients = {}  # 代理地址 -> httpx.AsyncClient，只在事件循环线程中访问
+        self._io_executor = None
+        self._ready = threading.Event()
+        self._concurrency = DEFAULT_ASYNC_CONCURRENCY
+        self._initialized = True
+
+    def start(self, concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        """启动事件循环；已在运行时按设置页当前的并发数调整图片信号量，每个任务开始时调用"""
+        concurrency = max(1, int(concurrency))
+        with self._lock:
+            if self.loop is None:
+                self._concurrency = concurrency
+                threading.Thread(target=self._loop_main, name="PixivAsyncEngine", daemon=True).start()
+        self._ready.wait()
+        if concurrency != self._concurrency:
+            self.loop.call_soon_threadsafe(self._resize, concurrency)
+
+    def _resize(self, concurrency):
+        """
+        在事件循环线程中换用新的图片信号量：已持有旧信号量的下载照常释放旧的，
+        之后开始的下载都受新上限约束。
+        """
+        if concurrency != self._concurrency:
+            self._concurrency = concurrency
+            self.semaphore = asyncio.Semaphore(concurrency)
+
+    def _loop_main(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        # 信号量必须在事件循环线程中创建
+        self.semaphore = asyncio.Semaphore(self._concurrency)
+        self.api_semaphore = asyncio.Semaphore(ASYNC_API_CONCURRENCY)
+        self._io_executor = ThreadPoolExecutor(ASYNC_IO_WORKERS, thread_name_prefix="PixivAsyncIO")
+        self._ready.set()
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """在引擎线程中执行协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run_blocking(self, fn, *args):
+        """在 I/O 线程池中执行阻塞调用并等待结果，只能在事件循环线程中调用"""
+        return await self.loop.run_in_executor(self._io_executor, fn, *args)
+
+    def get_client(self, proxies=None):
+        proxy = (proxies or {}).get('https')
+        client = self._clients.get(proxy)
+        if client is None:
+            # 在途请求数由信号量限制，连接池不再设上限，调整并发数后无需重建客户端
+            keepalive = self._concurrency + ASYNC_API_CONCURRENCY
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=keepalive)
+            try:
+                client = httpx.AsyncClient(proxy=proxy, limits=limits, follow_redirects=True)
+            except TypeError:
+                # 旧版本 httpx 使用 proxies 参数
+                client = httpx.AsyncClient(proxies=proxy, limits=limits, follow_redirects=True)
+            self._clients[proxy] = client
+        return client
+
+
+async_engine = AsyncEngine()
+
+
+class AsyncDownloadTask(DownloadTask):
+    """
+    使用异步引擎执行的下载任务。
+    枚举、详情获取和图片下载都以协程形式运行在引擎的事件循环中，
+    进度与 DownloadTask 一样写入 progress_signal 缓冲区和 byte_counter，由 DownloadManager 定时取走。
+    """
+
+    def start(self):
+        async_engine.start(self.config.get('async_concurrency', DEFAULT_ASYNC_CONCURRENCY))
+        future = async_engine.submit(self._run_async())
+        self._track_future(future)  # stop() 取消该 Future 时会同时取消协程
+
+    def stop(self):
+        """
+        取消主协程，由 _run_async 取消各阶段协程并等它们退出后再结算，
+        不在这里直接 _finish()，避免结算时还有协程在写文件和任务日志。
+        """
+        self.resume()
+        self.stop_event.set()
+        with self.lock:
+            pending = list(self._futures)
+        for future in pending:
+            future.cancel()
+
+    async def _run_async(self):
+        """
+        枚举 -> 积压队列 -> 详情协程 -> 待下载队列 -> 图片协程（作品内多页并行）。
+        两个队列都有容量上限，下游跟不上时 put() 挂起上游，标签分页枚举也随之暂停。
+        """
+        concurrency = max(1, int(self.config.get('async_concurrency', DEFAULT_ASYNC_CONCURRENCY)))
+        self._work_queue = asyncio.Queue(PIPELINE_BACKLOG_LIMIT)
+        self._image_queue = asyncio.Queue(2 * concurrency)
+        details_workers = [asyncio.ensure_future(self._details_worker_async()) for _ in range(ASYNC_API_CONCURRENCY)]
+        image_workers = [asyncio.ensure_future(self._image_worker_async()) for _ in range(concurrency)]
+        try:
+            if self.restored is None:
+                await async_engine.run_blocking(self._load_existing_ids)
+            if self.restored is not None:
+                await self._enqueue_works_async(self._restore_works())
+            elif self.catalog == 'User' and self.completion_strategy == 'incremental':
+                high_water = await async_engine.run_blocking(self._incremental_high_water)
+                top_works = await self._fetch_user_top_works_async(self.item_id) if high_water is not None else None
+                work_ids = self._incremental_candidates(top_works, high_water)
+                from_top = work_ids is not None
+                if not from_top:
+                    work_ids = await self._fetch_user_works_async(self.item_id)
+                    self._note_latest_work(work_ids)
+                await self._enqueue_works_async(await async_engine.run_blocking(
+                    self._apply_incremental_strategy, work_ids, high_water, from_top))
+            elif self.catalog == 'User':
+                all_works_from_api = await self._fetch_user_works_async(self.item_id)
+                await self._enqueue_works_async(await async_engine.run_blocking(
+                    self._apply_completion_strategy, all_works_from_api))
+            elif self.catalog == 'Tag':
+                await self._expand_tag_works_async(self.item_id, self.age_mode)
+            elif self.catalog == 'Ranking':
+                await self._enqueue_works_async(self._ranking_works())
+
+            if self.stop_event.is_set(): return
+            await async_engine.run_blocking(task_journal.mark_expanded, self.item_id)
+            if self.catalog == 'Tag' and self.restored is None and self._enumerated_count:
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"【{self.item_id}】枚举完成，共发现 {self._enumerated_count} 个作品，其中 {self.total_works} 个需要下载。",
+                                          self.catalog)
+            if self.total_works == 0:
+                self.progress_signal.emit(self.item_id, 0, 0, "没有作品需要下载或访问失败。", self.catalog)
+                return
+
+            # 枚举结束后逐级放入结束标记，等上游阶段排空再结束下游阶段
+            for _ in details_workers:
+                await self._work_queue.put(None)
+            await asyncio.gather(*details_workers)
+            for _ in image_workers:
+                await self._image_queue.put(None)
+            await asyncio.gather(*image_workers)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"严重错误: {e}", self.catalog)
+        finally:
+            workers = details_workers + image_workers
+            for worker in workers:
+                worker.cancel()
+            # 等各阶段协程处理完取消后再结算
+            await asyncio.gather(*workers, return_exceptions=True)
+            await async_engine.run_blocking(self._finish)
+
+    async def _enqueue_works_async(self, work_ids):
+        """去重后放入积压队列，队列已满时挂起调用方，直到详情阶段消化"""
+        new_ids = await async_engine.run_blocking(self._claim_new_works, work_ids)
+        with self.lock:
+            self.total_works += len(new_ids)
+        for work_id in new_ids:
+            if self.stop_event.is_set():
+                return
+            await self._work_queue.put(work_id)
+
+    async def _details_worker_async(self):
+        """详情阶段：取得详情并创建目录后送入待下载队列，失败的作品直接结算"""
+        while (work_id := await self._work_queue.get()) is not None:
+            if work_id in self._skipped_works:
+                # 积压队列中的作品在界面上被删除（skip_works），不再下载
+                with self.lock:
+                    self.total_works -= 1
+                await async_engine.run_blocking(task_journal.remove_works, self.item_id, [work_id])
+                continue
+            try:
+                async with async_engine.api_semaphore:
+                    prepared = await self._prepare_work_async(work_id)
+                error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                prepared, error = None, e
+            if not prepared:
+                await async_engine.run_blocking(self._complete_work, work_id, False, error)
+                continue
+            work_details, work_dir = prepared
+            if not work_details['image_urls']:
+                await async_engine.run_blocking(self._complete_work, work_id, True)
+                continue
+            with self.lock:
+                self._work_pages[work_id] = self._new_page_state(work_details['image_urls'], work_dir)
+            await self._image_queue.put(work_id)
+
+    async def _image_worker_async(self):
+        """图片阶段：每次领取一个作品，作品内最多 _page_concurrency() 页并行，最后一页结束时结算该作品"""
+        while (work_id := await self._image_queue.get()) is not None:
+            with self.lock:
+                state = self._work_pages[work_id]
+
+            async def page_runner():
+                while state['pending']:
+                    image_url = state['pending'].popleft()
+                    try:
+                        async with async_engine.semaphore:
+                            success = await self._download_page_async(work_id, image_url, state['dir'])
+                        error = None
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        success, error = False, e
+                    await async_engine.run_blocking(self._finish_page, work_id, success, error)
+
+            await asyncio.gather(*(page_runner() for _ in range(min(self._page_concurrency(), state['total']))))
+
+    async def _prepare_work_async(self, work_id):
+        """_prepare_work 的异步版本，返回 (详情, 目录)，失败返回 None"""
+        if self.stop_event.is_set():
+            return None
+        await self._wait_if_paused_async()
+
+        work_details = await self._get_work_details_async(work_id)
+        if not work_details:
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: 详情获取失败，跳过。", self.catalog)
+            return None
+
+        if self.catalog == 'User' and self.entity_name == "Unknown":
+            self.entity_name = work_details.get('user_name', 'Unknown_Author')
+
+        work_dir = await async_engine.run_blocking(self._create_work_directory, work_details)
+        if not work_dir:
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: 目录创建失败，跳过。", self.catalog)
+            return None
+        return work_details, work_dir
+
+    async def _download_page_async(self, work_id, image_url, work_dir):
+        """_download_page 的异步版本，失败时只重试这一页"""
+        for attempt in range(PAGE_RETRY_ATTEMPTS + 1):
+            if self.stop_event.is_set():
+                return False
+            await self._wait_if_paused_async()
+            if await self._download_image_async(image_url, work_id, work_dir):
+                return True
+            if attempt < PAGE_RETRY_ATTEMPTS and not self.stop_event.is_set():
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"作品 {work_id}: {image_url.split('/')[-1]} 下载失败，单独重试该页 "
+                                          f"({attempt + 1}/{PAGE_RETRY_ATTEMPTS})", self.catalog)
+        return False
+
+    async def _wait_if_paused_async(self):
+        while self.pause_event.is_set() and not self.stop_event.is_set():
+            await asyncio.sleep(0.5)
+
+    async def _sleep_unless_stopped_async(self, seconds):
+        """退避等待，停止任务时立即返回"""
+        deadline = time.time() + seconds
+        while not self.stop_event.is_set() and time.time() < deadline:
+            await asyncio.sleep(min(0.5, deadline - time.time()))
+
+    async def _wait_for_tokens_async(self, url, headers):
+        """_wait_for_tokens 的异步版本，令牌不足时只挂起当前协程"""
+        while True:
+            cookie, wait_time = cookie_manager.acquire(url, self._cookie_from_headers(headers))
+            if cookie:
+                headers['cookie'] = f"PHPSESSID={cookie}"
+            if wait_time <= 0:
+                return True
+            await self._sleep_unless_stopped_async(wait_time)
+            if self.stop_event.is_set():
+                return False
+
+    async def _get_response_with_retries_async(self, url, headers, stream=False, timeout=20, max_retries=5):
+        """
+        _get_response_with_retries 的异步版本，等待期间只挂起当前协程，不占用线程。
+        stream=True 时调用方负责 aclose() 返回的响应。
+        """
+        client = async_engine.get_client(self._get_proxies())
+        retries = 0
+        while retries < max_retries:
+            if self.stop_event.is_set(): return None
+            await self._wait_if_paused_async()
+            if not await self._wait_for_tokens_async(url, headers): return None
+
+            try:
+                request = client.build_request('GET', url, headers=headers, timeout=timeout)
+                response = await client.send(request, stream=stream)
+
+                if response.status_code in (403, 429):
+                    await response.aclose()
+                    try:
+                        self._handle_rate_limit(url, response.status_code, headers)
+                    except RetryLater as e:
+                        # 协程等待不占用线程，只挂起当前请求，解禁后换上可用Cookie重试
+                        await self._sleep_unless_stopped_async(e.not_before - time.time())
+                        headers['cookie'] = f"PHPSESSID={cookie_manager.get_cookie()}"
+                    continue
+
+                if response.status_code == 416:
+                    return response  # 续传的 Range 无效，由调用方丢弃临时文件后重新下载
+
+                if response.is_error:
+                    await response.aclose()
+                response.raise_for_status()
+                return response
+
+            except httpx.HTTPError as e:
+                retries += 1
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"请求 {url}: 网络错误或超时: {e} (重试 {retries}/{max_retries})",
+                                          self.catalog)
+                await self._sleep_unless_stopped_async(2 * retries)
+
+        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                  f"请求 {url}: 达到最大重试次数，放弃。", self.catalog)
+        return None
+
+    async def _fetch_user_works_async(self, user_id):
+        headers = self._get_headers(cookie_manager.get_cookie())
+        url = f"https://www.pixiv.net/ajax/user/{user_id}/profile/all"
+        response = await self._get_response_with_retries_async(url, headers)
+        if not response:
+            return []
+        try:
+            return self._parse_user_works(response.json())
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"解析用户作品列表失败: {e}", self.catalog)
+            return []
+
+    async def _fetch_user_top_works_async(self, user_id):
+        headers = self._get_headers(cookie_manager.get_cookie())
+        response = await self._get_response_with_retries_async(self._user_top_url(user_id), headers)
+        if not response:
+            return None
+        try:
+            return self._parse_user_top_works(response.json())
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"解析用户最新作品失败: {e}", self.catalog)
+            return None
+
+    async def _expand_tag_works_async(self, tag, age_mode):
+        """第1页结果直接使用，其余分页由 TAG_PAGE_CONCURRENCY 个协程依次领取并发获取，每页结果立即送入流水线"""
+        page_ids, total_count = await self._fetch_tag_page_async(tag, age_mode, 1)
+        if page_ids is None:
+            return
+        if total_count == 0:
+            self.progress_signal.emit(self.item_id, 0, 0, f"【{tag}】关键词没有找到作品。", self.catalog)
+            return
+        self.progress_signal.emit(self.item_id, 0, 0, f"【{tag}】关键词总共有【{total_count}】个作品。", self.catalog)
+        await self._submit_tag_page_ids_async(page_ids)
+
+        pages = iter(range(2, (total_count + 59) // 60 + 1))
+
+        async def page_worker():
+            for page in pages:
+                if self.stop_event.is_set():
+                    return
+                await self._wait_if_paused_async()
+                ids, _ = await self._fetch_tag_page_async(tag, age_mode, page)
+                if ids:
+                    await self._submit_tag_page_ids_async(ids)
+
+        await asyncio.gather(*(page_worker() for _ in range(TAG_PAGE_CONCURRENCY)))
+
+    async def _submit_tag_page_ids_async(self, page_ids):
+        with self.lock:
+            self._enumerated_count += len(page_ids)
+        await self._enqueue_works_async(await async_engine.run_blocking(self._filter_new_works, page_ids))
+
+    async def _fetch_tag_page_async(self, tag, age_mode, page):
+        """_fetch_tag_page 的异步版本，返回 (作品ID列表, 作品总数)，失败时返回 (None, 0)"""
+        headers = self._get_headers(cookie_manager.get_cookie())
+        page_response = await self._get_response_with_retries_async(self._tag_search_url(tag, age_mode, page), headers)
+        if not page_response:
+            self.progress_signal.emit(self.item_id, 0, 0, f"获取【{tag}】第{page}页作品失败，跳过该页。", self.catalog)
+            return None, 0
+        try:
+            page_data = page_response.json()
+            if page_data.get('error'):
+                self.progress_signal.emit(self.item_id, 0, 0,
+                                          f"获取【{tag}】第{page}页作品API返回错误: {page_data.get('message', '')}",
+                                          self.catalog)
+                return None, 0
+            illust_manga = page_data.get('body', {}).get('illustManga', {})
+            page_ids = [illust['id'] for illust in illust_manga.get('data', []) if illust.get('id')]
+            return page_ids, illust_manga.get('total', 0)
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"获取【{tag}】第{page}页作品失败: {e}", self.catalog)
+            return None, 0
+
+    async def _get_work_details_async(self, work_id):
+        if work_details := self._journaled_details(work_id):
+            return work_details
+        work_details = await async_engine.run_blocking(details_cache.get, work_id)
+        if work_details is None:
+            work_details = await self._fetch_work_details_async(work_id)
+            if work_details:
+                await async_engine.run_blocking(details_cache.put, work_id, work_details)
+        if work_details:
+            await async_engine.run_blocking(task_journal.set_work_details, self.item_id, work_id, work_details)
+        return work_details
+
+    async def _fetch_work_details_async(self, work_id):
+        headers = self._get_headers(cookie_manager.get_cookie())
+        details_res = await self._get_response_with_retries_async(self._details_url(work_id), headers)
+        if not details_res:
+            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情获取失败。", self.catalog)
+            return None
+        try:
+            details_res_data = details_res.json()
+            pages_data = None
+            if self._needs_pages_request(details_res_data):
+                pages_res = await self._get_response_with_retries_async(self._pages_url(work_id), headers)
+                if not pages_res:
+                    self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情获取失败。", self.catalog)
+                    return None
+                pages_data = pages_res.json()
+            return self._parse_work_details(work_id, details_res_data, pages_data)
+        except json.JSONDecodeError:
+            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情JSON解析失败。", self.catalog)
+            return None
+
+    async def _download_image_async(self, image_url, work_id, work_dir):
+        """_download_image 的异步版本，文件读写、续传记录和下载索引都在 I/O 线程池中执行"""
+        save_path = os.path.join(work_dir, image_url.split('/')[-1])
+        temp_save_path = save_path + ".tmp"
+        if await async_engine.run_blocking(os.path.exists, save_path):
+            return True
+        if await async_engine.run_blocking(self._reuse_indexed_file, work_id, save_path):
+            return True
+
+        headers = self._get_headers(cookie_manager.get_cookie())
+        headers['Referer'] = f"https://www.pixiv.net/artworks/{work_id}"
+
+        for attempt in range(1, IMAGE_RESUME_ATTEMPTS + 1):
+            offset, expected_size, etag = await async_engine.run_blocking(self._load_partial, temp_save_path, image_url)
+            if expected_size and offset == expected_size:
+                return await async_engine.run_blocking(self._finalize_temp_file, temp_save_path, save_path,
+                                                       expected_size, offset, work_id)
+            self._set_range_headers(headers, offset, etag)
+
+            response = await self._get_response_with_retries_async(image_url, headers, stream=True, timeout=30)
+            if not response:
+                return False
+
+            actual_size = offset
+            try:
+                position = self._resume_position(response.status_code, response.headers, offset)
+                if position is None:
+                    await async_engine.run_blocking(self._discard_partial, temp_save_path)
+                    continue
+                offset, expected_size = position
+                await async_engine.run_blocking(self._save_partial_meta, temp_save_path, image_url, expected_size,
+                                                response.headers.get('ETag') or etag)
+
+                actual_size = offset
+                hasher = hashlib.sha1() if offset == 0 else None
+                buffer = bytearray()
+                f = await async_engine.run_blocking(open, temp_save_path, 'ab' if offset else 'wb')
+                try:
+                    async for chunk in response.aiter_bytes(chunk_size=8192):
+                        if self.stop_event.is_set():
+                            return False  # 保留临时文件，下次续传
+                        await self._wait_if_paused_async()
+                        buffer += chunk
+                        if hasher:
+                            hasher.update(chunk)
+                        actual_size += len(chunk)
+                        byte_counter.add(len(chunk))
+                        if len(buffer) >= ASYNC_WRITE_BUFFER:
+                            await async_engine.run_blocking(f.write, bytes(buffer))
+                            buffer.clear()
+                        if delay := bandwidth_limiter.throttle(self.catalog, len(chunk)):
+                            await self._sleep_unless_stopped_async(delay)
+                finally:
+                    # 停止或传输中断时缓冲的数据同样写入临时文件，续传位置与文件大小一致
+                    await async_engine.run_blocking(self._close_temp_file, f, bytes(buffer))
+
+                if await async_engine.run_blocking(self._finalize_temp_file, temp_save_path, save_path, expected_size,
+                                                   actual_size, work_id, hasher.hexdigest() if hasher else None):
+                    return True
+                if not await async_engine.run_blocking(os.path.exists, temp_save_path):
+                    return False
+            except httpx.HTTPError as e:
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"作品 {work_id}: 图片传输中断: {e}，将从 {actual_size} 字节处续传 ({attempt}/{IMAGE_RESUME_ATTEMPTS})",
+                                          self.catalog)
+            except Exception as e:
+                await async_engine.run_blocking(self._discard_partial, temp_save_path)
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"作品 {work_id}: 图片下载处理错误: {e}", self.catalog)
+                return False
+            finally:
+                await response.aclose()
+        return False
+
+    @staticmethod
+    def _close_temp_file(f, tail):
+        try:
+            if tail:
+                f.write(tail)
+        finally:
+            f.close()
@@ -0,0 +1,209 @@
+# app/completion_planner.py
+
+import os
+import time
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .config_manager import get_config
+from .http_client import http_client, build_headers, build_proxies
+from .download import cookie_manager
+from .file_scan import directory_scanner, SCAN_WORKERS
+from .metadata_store import load_metadata, save_metadata, sort_ids, metadata_exists, metadata_paths_in
+
+PROGRESS_INTERVAL = 0.5  # 扫描进度的最短汇报间隔（秒）
+
+
+def read_json_config(json_path):
+    """读取补全下载的配置文件，返回 (配置, 错误信息)，新旧格式的已下载ID都合并在 image_id 中"""
+    return load_metadata(json_path)
+
+
+def fetch_user_name(user_id):
+    """
+    通过 profile/top 获取用户名，返回 (用户名或 None, 错误信息)。
+    与下载任务共用账号和主机的令牌桶，令牌不足时在调用线程（规划线程）中等待。
+    """
+    url = f"https://www.pixiv.net/ajax/user/{user_id}/profile/top"
+    try:
+        cookie, wait_time = cookie_manager.acquire(url, cookie_manager.get_cookie())
+        while wait_time > 0:
+            time.sleep(wait_time)
+            cookie, wait_time = cookie_manager.acquire(url, cookie)
+        headers = build_headers(cookie)
+        proxies = build_proxies(get_config().get('proxy', {}))
+        response = http_client.get(url, headers=headers, proxies=proxies, timeout=10)
+        response.raise_for_status()
+        user_data = response.json()
+        if not user_data.get('error') and user_data.get('body', {}).get('name'):
+            return user_data['body']['name'], None
+        return None, f"【补全下载】无法获取用户 {user_id} 的名称，将使用ID作为名称。"
+    except Exception as e:
+        return None, f"【补全下载】获取用户 {user_id} 名称时发生错误: {e}，将使用ID作为名称。"
+
+
+def generate_metadata_file(item_id, item_folder_path, item_type, extracted_image_ids):
+    """
+    用扫描得到的作品ID为没有配置文件的目录生成配置文件。
+    返回 (排序后的作品ID列表，失败时为 None, 日志列表)，可在任意线程中调用。
+    """
+    logs = []
+    if not extracted_image_ids:
+        logs.append(f"【补全下载】在 {item_folder_path} 中未找到任何图片文件。")
+        return None, logs
+
+    sorted_ids = sort_ids(extracted_image_ids)
+    path_config = get_config().get('download_path', {})
+
+    entity_name = item_id
+    if item_type == 'user':
+        user_name, error = fetch_user_name(item_id)
+        if user_name:
+            entity_name = user_name
+        else:
+            logs.append(error)
+
+    meta = {
+        "download_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "base_path": os.path.abspath(path_config.get('base_path', './downloads')),
+        "uid_option": path_config.get('uid_option', 'UID'),
+        "pid_option": path_config.get('pid_option', '无')
+    }
+    if item_type == 'user':
+        meta["user_name"] = entity_name
+        meta["user_id"] = item_id
+    elif item_type == 'tag':
+        meta["tag_name"] = item_id
+        meta["tag_id"] = item_id
+
+    json_file_path = os.path.join(item_folder_path, f"{item_id}.json")
+    try:
+        save_metadata(json_file_path, meta, sorted_ids)
+        logs.append(f"【补全下载】已为 {item_type} {item_id} 生成配置文件: {json_file_path}")
+        return sorted_ids, logs
+    except Exception as e:
+        logs.append(f"【补全下载】生成配置文件 {json_file_path} 失败: {e}")
+        return None, logs
+
+
+class CompletionPlannerThread(QThread):
+    """
+    批量补全下载的规划线程：遍历 User/Tag 下载目录，由线程池并行读取各目录的配置文件，
+    没有配置文件的用户目录并行扫描图片并生成配置文件，最后一次性发出 (任务ID, 配置文件路径) 列表和日志，
+    界面线程只负责批量加入下载列表。已下载的作品ID由下载任务在工作线程中从配置文件读取，不经过界面线程和任务日志。
+    """
+    progress_signal = pyqtSignal(int, int)  # 已处理目录数, 目录总数
+    plan_ready = pyqtSignal(list, list)  # [(任务ID, 配置文件路径)], [日志]
+
+    def __init__(self, catalog, download_dir, parent=None, item_names=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.download_dir = download_dir
+        self.item_names = set(item_names) if item_names is not None else None  # 只处理这些目录（单个补全下载）
+        self.is_stopped = False
+        self._done = 0
+        self._total = 0
+        self._last_progress = 0.0
+        self._progress_lock = threading.Lock()
+
+    def run(self):
+        logs, plan = [], []
+        try:
+            with os.scandir(self.download_dir) as entries:
+                item_dirs = [(entry.name, entry.path) for entry in entries if entry.is_dir()
+                             and (self.item_names is None or entry.name in self.item_names)]
+        except OSError as e:
+            self.plan_ready.emit([], [f"【补全下载】无法读取目录 {self.download_dir}: {e}"])
+            return
+
+        self._total = len(item_dirs)
+        plan_dir = self._plan_user_dir if self.catalog == 'User' else self._plan_tag_dir
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            results = list(pool.map(lambda args: plan_dir(*args), item_dirs))
+            if self.is_stopped:
+                return
+            self.progress_signal.emit(self._total, self._total)
+
+            # 没有配置文件的用户目录：一次并行扫描，再并行生成配置文件（需要请求用户名）
+            to_generate = [(name, path) for (name, path), (item_id, _, _) in zip(item_dirs, results)
+                           if item_id is None and self.catalog == 'User' and name.isdigit()]
+            if to_generate:
+                scanned_ids = directory_scanner.scan_many([path for _, path in to_generate])
+                generated = dict(zip([name for name, _ in to_generate], pool.map(
+                    lambda args: generate_metadata_file(args[0], args[1], 'user', scanned_ids[args[1]]),
+                    to_generate)))
+            else:
+                generated = {}
+
+        for (item_name, item_path), (item_id, json_path, dir_logs) in zip(item_dirs, results):
+            logs.extend(dir_logs)
+            if item_id is None and item_name in generated:
+                generated_ids, generate_logs = generated[item_name]
+                logs.extend(generate_logs)
+                if generated_ids is None:
+                    logs.append(f"【补全下载】警告: 无法为用户 {item_name} 生成配置文件，跳过。")
+                    continue
+                item_id, json_path = item_name, os.path.join(item_path, f"{item_name}.json")
+                logs.append(f"【补全下载】已为用户 {item_id} 从文件生成配置文件。")
+            if item_id is not None:
+                plan.append((item_id, json_path))
+        if not self.is_stopped:
+            self.plan_ready.emit(plan, logs)
+
+    def _plan_user_dir(self, item_name, item_path):
+        """返回 (UID, 配置文件路径, 日志)，没有可用的配置文件时 UID 为 None"""
+        logs = []
+        try:
+            json_paths = metadata_paths_in(item_path)
+        except OSError as e:
+            json_paths = []
+            logs.append(f"【补全下载】警告: 无法读取目录 {item_path}: {e}")
+        result = (None, None, logs)
+        for json_path in json_paths:
+            config_data, error = read_json_config(json_path)
+            if error:
+                logs.append(error)
+                continue
+            # JSON 丢失、只剩快照或追加日志时描述信息为空，文件名即 UID
+            stem = os.path.splitext(os.path.basename(json_path))[0]
+            user_id = config_data.get('user_id') or (stem if stem.isdigit() else None)
+            if user_id:
+                logs.append(f"【补全下载】找到用户 {user_id} 的配置文件: {json_path}")
+                result = (str(user_id), json_path, logs)
+                break
+        if result[0] is None and not item_name.isdigit():
+            logs.append(f"【补全下载】警告: 用户目录 '{item_name}' 无UID配置文件且无法自动生成 (非数字目录名)，跳过。")
+        self._step()
+        return result
+
+    def _plan_tag_dir(self, item_name, item_path):
+        logs = []
+        json_path = os.path.join(item_path, f"{item_name}.json")
+        result = (None, None, logs)
+        if metadata_exists(json_path):
+            config_data, error = read_json_config(json_path)
+            if config_data:
+                result = (item_name, json_path, logs)
+            else:
+                if error:
+                    logs.append(error)
+                logs.append(f"【补全下载】警告: 读取标签 {item_name} 的配置文件失败，跳过。")
+        self._step()
+        return result
+
+    def _step(self):
+        """工作线程每处理完一个目录调用一次，按固定间隔汇报进度"""
+        with self._progress_lock:
+            self._done += 1
+            now = time.monotonic()
+            if now - self._last_progress < PROGRESS_INTERVAL:
+                return
+            self._last_progress = now
+            done = self._done
+        self.progress_signal.emit(done, self._total)
+
+    def stop(self):
+        self.is_stopped = True
@@ -0,0 +1,85 @@
+# app/concurrency.py
+
+import threading
+
+WINDOW_TICKS = 3            # 每隔多少秒评估一次
+LATENCY_SPIKE_RATIO = 2.0   # 窗口中位延迟超过基线的倍数视为延迟突增
+DEFAULT_MAX_CONCURRENCY = 20
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 并发控制器。
+    下载请求结束时通过 record() 报告耗时与结果，DownloadManager 每秒调用一次 tick()，
+    每个评估窗口内：出现 429/403 或超时则并发减半；延迟明显高于基线则减为 3/4；
+    成功请求数不低于上一窗口且延迟平稳时并发加一。
+    """
+
+    def __init__(self, initial=5, min_limit=1, max_limit=DEFAULT_MAX_CONCURRENCY):
+        self._lock = threading.Lock()
+        self.min_limit, self.max_limit = 1, DEFAULT_MAX_CONCURRENCY
+        self.limit = initial
+        self.reset(initial, min_limit, max_limit)
+
+    def reset(self, initial, min_limit=1, max_limit=DEFAULT_MAX_CONCURRENCY):
+        with self._lock:
+            self.min_limit = max(1, int(min_limit))
+            self.max_limit = max(self.min_limit, int(max_limit))
+            self.limit = min(self.max_limit, max(self.min_limit, int(initial)))
+            self._latencies = []
+            self._ok = 0
+            self._throttled = 0
+            self._timeouts = 0
+            self._baseline_latency = None
+            self._last_ok = 0
+            self._ticks = 0
+
+    def set_bounds(self, min_limit, max_limit):
+        with self._lock:
+            self.min_limit = max(1, int(min_limit))
+            self.max_limit = max(self.min_limit, int(max_limit))
+            self.limit = min(self.max_limit, max(self.min_limit, self.limit))
+
+    def record(self, latency=None, throttled=False, timeout=False):
+        """报告一次请求的结果；latency 为收到响应头的耗时（秒）"""
+        with self._lock:
+            if throttled:
+                self._throttled += 1
+            elif timeout:
+                self._timeouts += 1
+            else:
+                self._ok += 1
+                if latency is not None:
+                    self._latencies.append(latency)
+
+    def tick(self):
+        """每秒调用一次，返回（可能调整后的）并发上限"""
+        with self._lock:
+            self._ticks += 1
+            if self._ticks < WINDOW_TICKS:
+                return self.limit
+            self._ticks = 0
+
+            latencies, ok = sorted(self._latencies), self._ok
+            throttled, timeouts = self._throttled, self._timeouts
+            self._latencies, self._ok, self._throttled, self._timeouts = [], 0, 0, 0
+
+            median = latencies[len(latencies) // 2] if latencies else None
+            spiked = (median is not None and self._baseline_latency is not None
+                      and median > self._baseline_latency * LATENCY_SPIKE_RATIO)
+
+            if throttled or timeouts:
+                self.limit = max(self.min_limit, self.limit // 2)
+            elif spiked:
+                self.limit = max(self.min_limit, self.limit * 3 // 4)
+            elif ok > 0 and ok >= self._last_ok and self.limit < self.max_limit:
+                self.limit += 1
+
+            if median is not None and not spiked:
+                self._baseline_latency = median if self._baseline_latency is None \
+                    else self._baseline_latency * 0.8 + median * 0.2
+            self._last_ok = ok
+            return self.limit
+
+
+concurrency_controller = AdaptiveConcurrency()
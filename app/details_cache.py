@@ -0,0 +1,149 @@
+# app/details_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from .config_manager import get_config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 缓存数据库放在软件目录下，与 config.ini 同级
+CACHE_DB_PATH = os.path.join(BASE_DIR, '../details_cache.db')
+
+DEFAULT_TTL_DAYS = 7          # 缓存有效期（天）
+DEFAULT_MAX_ENTRIES = 50000   # 最大缓存条数，超出后按最近访问时间淘汰
+EVICT_CHECK_INTERVAL = 200    # 每写入多少条检查一次容量
+
+
+class DetailsCache:
+    """
+    作品详情的本地缓存（SQLite）。
+    以作品ID为键保存解析后的详情（标题、标签、创建日期、作者名、图片地址等），
+    补全下载、每日排行榜以及与用户作品重叠的标签搜索都可以直接命中，省去详情接口的请求。
+    配置项位于 config.ini 的 [details_cache] 段：enabled、ttl_days、max_entries。
+    """
+    _instance, _lock = None, threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path=CACHE_DB_PATH):
+        if hasattr(self, '_initialized'): return
+        self.db_path = db_path
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._writes_since_check = 0
+        self._config = None  # (enabled, ttl 秒, max_entries)，由 configure() 设置
+        self.hits = 0
+        self.misses = 0
+        self._initialized = True
+
+    def _get_conn(self):
+        """延迟打开数据库，打开失败时返回 None，缓存自动失效但不影响下载"""
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS work_details (
+                                    work_id TEXT PRIMARY KEY,
+                                    data TEXT NOT NULL,
+                                    fetched_at REAL NOT NULL,
+                                    last_access REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON work_details(last_access)")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"警告: 无法打开详情缓存数据库 {self.db_path}: {e}")
+                self._conn = False
+        return self._conn or None
+
+    def configure(self, section):
+        """
+        解析 [details_cache] 段并缓存结果，查询时不再逐次读取配置。
+        由 DownloadManager 在加载配置和配置保存后调用。
+        """
+        enabled = str(section.get('enabled', 'True')).lower() not in ('false', '0', 'no')
+        try:
+            ttl = float(section.get('ttl_days', DEFAULT_TTL_DAYS)) * 86400
+        except (TypeError, ValueError):
+            ttl = DEFAULT_TTL_DAYS * 86400
+        try:
+            max_entries = max(1, int(section.get('max_entries', DEFAULT_MAX_ENTRIES)))
+        except (TypeError, ValueError):
+            max_entries = DEFAULT_MAX_ENTRIES
+        self._config = (enabled, ttl, max_entries)
+
+    def _settings(self):
+        if self._config is None:  # 未经 DownloadManager 配置时（如单独使用）读取一次全局配置
+            self.configure(get_config().get('details_cache', {}))
+        return self._config
+
+    def get(self, work_id):
+        """返回缓存的作品详情 dict，未命中或已过期返回 None"""
+        enabled, ttl, _ = self._settings()
+        if not enabled:
+            return None
+        now = time.time()
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT data, fetched_at FROM work_details WHERE work_id = ?",
+                                   (str(work_id),)).fetchone()
+                if row is None or now - row[1] > ttl:
+                    if row is not None:
+                        conn.execute("DELETE FROM work_details WHERE work_id = ?", (str(work_id),))
+                        conn.commit()
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE work_details SET last_access = ? WHERE work_id = ?", (now, str(work_id)))
+                conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                print(f"读取详情缓存失败 ({work_id}): {e}")
+                self.misses += 1
+                return None
+
+    def put(self, work_id, details):
+        enabled, _, max_entries = self._settings()
+        if not enabled:
+            return
+        now = time.time()
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO work_details (work_id, data, fetched_at, last_access) "
+                             "VALUES (?, ?, ?, ?)",
+                             (str(work_id), json.dumps(details, ensure_ascii=False), now, now))
+                self._writes_since_check += 1
+                if self._writes_since_check >= EVICT_CHECK_INTERVAL:
+                    self._writes_since_check = 0
+                    self._evict(conn, max_entries)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"写入详情缓存失败 ({work_id}): {e}")
+
+    def _evict(self, conn, max_entries):
+        """超出容量时删除最久未访问的条目"""
+        count = conn.execute("SELECT COUNT(*) FROM work_details").fetchone()[0]
+        if count > max_entries:
+            conn.execute("DELETE FROM work_details WHERE work_id IN "
+                         "(SELECT work_id FROM work_details ORDER BY last_access LIMIT ?)",
+                         (count - max_entries,))
+
+    def format_stats(self):
+        total = self.hits + self.misses
+        rate = f"{self.hits * 100 // total}%" if total else "-"
+        return f"详情缓存: 命中 {self.hits} 次/未命中 {self.misses} 次 (命中率 {rate})"
+
+
+details_cache = DetailsCache()
@@ -1,746 +1,1745 @@
-# app/download.py
-
-import os
-import requests
-import time
-import json
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from PyQt5.QtCore import QObject, QThread, pyqtSignal, QTimer
-import re
-from urllib.parse import quote
-
-from .config_manager import get_config, ConfigManager
-
-
-class CookieManager:
-    _instance, _lock = None, threading.Lock()
-
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None: cls._instance = super().__new__(cls)
-        return cls._instance
-
-    def __init__(self):
-        if hasattr(self, '_initialized'): return
-        self._cookies_state, self._current_index, self._lock, self._initialized = [], 0, threading.Lock(), True
-
-    def load_cookies(self, config):
-        with self._lock:
-            self._cookies_state = []
-            for acc in config.get('Accounts', {}).values():
-                if cookie := acc.get('cookies', {}).get('PHPSESSID'): self._cookies_state.append(
-                    {'cookie': cookie, 'banned_until': 0})
-
-    def get_cookie(self):
-        with self._lock:
-            if not self._cookies_state: return ""
-            # 尝试找到一个未被禁用或禁用时间已过的cookie
-            for _ in range(len(self._cookies_state)):
-                self._current_index = (self._current_index + 1) % len(self._cookies_state)
-                info = self._cookies_state[self._current_index]
-                if time.time() > info['banned_until']:
-                    return info['cookie']
-            # 如果所有cookie都被禁用，则返回当前索引的cookie，让调用者处理等待
-            if self._cookies_state:
-                return self._cookies_state[self._current_index]['cookie']
-            return ""
-
-    def ban_cookie(self, cookie_to_ban):
-        with self._lock:
-            for info in self._cookies_state:
-                if info['cookie'] == cookie_to_ban:
-                    ban_time = time.time() + 180  # 禁用3分钟
-                    info['banned_until'] = ban_time
-                    print(f"Cookie ...{cookie_to_ban[-6:]} banned until {time.ctime(ban_time)}");
-                    break
-
-    def get_cookie_count(self):
-        with self._lock:
-            return len(self._cookies_state)
-
-
-cookie_manager = CookieManager()
-
-
-class DownloadThread(QThread):
-    # 修改信号签名，增加 catalog 参数
-    progress_signal = pyqtSignal(str, int, int, str, str)  # item_id, completed, total, status, catalog
-    finished_signal = pyqtSignal(str, str)  # item_id, catalog
-    chunk_downloaded = pyqtSignal(int)
-
-    def __init__(self, item_id, config, catalog, item_type='user', age_mode='all', existing_image_ids=None,
-                 completion_strategy='default', custom_path=None, ranking_type_name=None, ranking_date_str=None,
-                 parent=None):
-        super().__init__(parent)
-        self.item_id = item_id
-        self.config = config
-        self.catalog = catalog  # 保存 catalog
-        self.item_type = item_type
-        self.age_mode = age_mode
-
-        self.stop_event, self.pause_event = threading.Event(), threading.Event()
-        self.lock = threading.Lock()
-        self.session = requests.Session()
-        self.completed_works = 0
-        self.total_works = 0
-        self.downloaded_work_ids = []
-        self.entity_name = "Unknown"
-
-        self.existing_image_ids = set(existing_image_ids) if existing_image_ids else set()
-        self.completion_strategy = completion_strategy
-        self.original_existing_image_ids = set(existing_image_ids) if existing_image_ids else set()
-
-        self.custom_download_path = custom_path
-        self.ranking_type_name = ranking_type_name
-        self.ranking_date_str = ranking_date_str
-        self.metadata_folder = None
-
-    def run(self):
-        try:
-            thread_count = int(self.config.get('thread_count', 5))
-            adapter = requests.adapters.HTTPAdapter(pool_connections=thread_count, pool_maxsize=thread_count)
-            self.session.mount('https', adapter)
-
-            time.sleep(1)
-
-            works_to_download = []
-            if self.catalog == 'User':
-                all_works_from_api = self._fetch_user_works(self.item_id)
-                works_to_download = self._apply_completion_strategy(all_works_from_api)
-            elif self.catalog == 'Tag':
-                all_works_from_api = self._fetch_tag_works(self.item_id, self.age_mode)
-                works_to_download = self._apply_completion_strategy(all_works_from_api)
-            elif self.catalog == 'Ranking':
-                works_to_download = [self.item_id]  # For Ranking, item_id is already the illust_id
-
-            self.total_works = len(works_to_download)
-
-            if self.stop_event.is_set(): return
-            if self.total_works == 0:
-                if self.catalog == 'Ranking':
-                    self.progress_signal.emit(self.item_id, 0, 0, f"作品 {self.item_id} 无需下载或获取详情失败。",
-                                              self.catalog)
-                else:
-                    self.progress_signal.emit(self.item_id, 0, 0, "没有作品需要下载或访问失败。", self.catalog)
-                self._save_metadata_file()
-                return
-
-            # self.progress_signal.emit(self.item_id, 0, self.total_works,
-            #                           f"找到 {self.total_works} 个作品，使用 {thread_count} 线程下载...", self.catalog)
-
-            with ThreadPoolExecutor(max_workers=thread_count) as executor:
-                future_to_work = {executor.submit(self._process_single_work, work_id): work_id for work_id in
-                                  works_to_download}
-                for future in as_completed(future_to_work):
-                    if self.stop_event.is_set(): break
-                    try:
-                        success, work_id = future.result()
-                        with self.lock:
-                            self.completed_works += 1
-                        if success:
-                            self.downloaded_work_ids.append(work_id)
-                            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                                      f"作品 {work_id} 下载成功 ({self.completed_works}/{self.total_works})",
-                                                      self.catalog)
-                        else:
-                            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                                      f"作品 {work_id} 下载失败 ({self.completed_works}/{self.total_works})",
-                                                      self.catalog)
-                    except Exception as e:
-                        work_id = future_to_work.get(future, "未知")
-                        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                                  f"作品 {work_id} 处理时发生错误: {e} ({self.completed_works}/{self.total_works})",
-                                                  self.catalog)
-
-        except Exception as e:
-            self.progress_signal.emit(self.item_id, 0, 0, f"严重错误: {e}", self.catalog)
-        finally:
-            if self.catalog != 'Ranking':
-                self._save_metadata_file()
-            self.finished_signal.emit(self.item_id, self.catalog)  # 传递 catalog
-
-    def _process_single_work(self, work_id):
-        if self.stop_event.is_set():
-            return False, work_id
-        self.check_pause()
-
-        work_details = self._get_work_details(work_id)
-        if not work_details:
-            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                      f"作品 {work_id}: 详情获取失败，跳过。", self.catalog)
-            return False, work_id
-
-        if self.catalog == 'User' and self.entity_name == "Unknown":
-            self.entity_name = work_details.get('user_name', 'Unknown_Author')
-
-        work_dir = self._create_work_directory(work_details)
-        if not work_dir:
-            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                      f"作品 {work_id}: 目录创建失败，跳过。", self.catalog)
-            return False, work_id
-
-        all_images_downloaded = True
-        for i, image_url in enumerate(work_details['image_urls']):
-            if self.stop_event.is_set():
-                return False, work_id
-            self.check_pause()
-
-            if not self._download_image(image_url, work_id, work_dir):
-                all_images_downloaded = False
-                break
-
-        return all_images_downloaded, work_id
-
-    def _get_response_with_retries(self, url, headers, proxies, stream=False, timeout=20, max_retries=5):
-        """
-        辅助方法：封装带重试、Cookie管理和429/403处理的requests.get请求。
-        headers 参数必须是可变的字典，因为会更新其中的 'cookie' 字段。
-        """
-        retries = 0
-        while retries < max_retries:
-            if self.stop_event.is_set(): return None
-            self.check_pause()
-
-            current_cookie_value = headers.get('cookie', '').split('PHPSESSID=')[-1] if 'PHPSESSID=' in headers.get(
-                'cookie', '') else ""
-
-            try:
-                response = self.session.get(url, headers=headers, proxies=proxies, stream=stream, timeout=timeout)
-
-                if response.status_code == 403:
-                    if current_cookie_value:
-                        cookie_manager.ban_cookie(current_cookie_value)
-                    self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                              f"请求 {url}: 403错误，Cookie被禁用，尝试更换Cookie。", self.catalog)
-                    # 获取新Cookie并更新headers
-                    new_cookie = cookie_manager.get_cookie()
-                    headers['cookie'] = f"PHPSESSID={new_cookie}"
-                    time.sleep(1)  # 短暂等待后重试
-                    continue  # 立即重试
-
-                if response.status_code == 429:
-                    if current_cookie_value:
-                        cookie_manager.ban_cookie(current_cookie_value)  # 禁用当前Cookie 3分钟
-
-                    num_available_cookies = cookie_manager.get_cookie_count()
-
-                    if num_available_cookies == 1:
-                        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                                  f"请求 {url}: 429错误，只有一个Cookie，等待3分钟。", self.catalog)
-                        time.sleep(180)  # 等待3分钟
-                    else:
-                        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                                  f"请求 {url}: 429错误，更换Cookie并等待30秒。", self.catalog)
-                        time.sleep(30)  # 等待30秒
-
-                    # 获取新Cookie并更新headers
-                    new_cookie = cookie_manager.get_cookie()
-                    headers['cookie'] = f"PHPSESSID={new_cookie}"
-                    continue  # 立即重试
-
-                response.raise_for_status()  # 对于4xx或5xx的HTTP状态码抛出异常
-                return response  # 成功，返回响应
-
-            except requests.exceptions.RequestException as e:
-                retries += 1
-                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                          f"请求 {url}: 网络错误或超时: {e} (重试 {retries}/{max_retries})",
-                                          self.catalog)
-                time.sleep(2 * retries)  # 指数退避，等待时间随重试次数增加
-            except Exception as e:
-                retries += 1
-                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                          f"请求 {url}: 未知错误: {e} (重试 {retries}/{max_retries})", self.catalog)
-                time.sleep(2 * retries)
-
-        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                  f"请求 {url}: 达到最大重试次数，放弃。", self.catalog)
-        return None  # 达到最大重试次数后失败
-
-    def _fetch_user_works(self, user_id):
-        cookie = cookie_manager.get_cookie()
-        headers, proxies = self._get_headers(cookie), self._get_proxies()
-        url = f"https://www.pixiv.net/ajax/user/{user_id}/profile/all"
-
-        response = self._get_response_with_retries(url, headers, proxies, timeout=20)
-        if not response:
-            return []
-
-        try:
-            data = response.json()
-            if data.get('error'): raise Exception(data.get('message', "API返回错误"))
-            body = data.get('body', {});
-            illusts, manga = body.get('illusts', {}), body.get('manga', {})
-            return list(illusts.keys() if isinstance(illusts, dict) else []) + \
-                list(manga.keys() if isinstance(manga, dict) else [])
-        except Exception as e:
-            self.progress_signal.emit(self.item_id, 0, 0, f"解析用户作品列表失败: {e}", self.catalog)
-            return []
-
-    def _fetch_tag_works(self, tag, age_mode):
-        cookie = cookie_manager.get_cookie()
-        headers, proxies = self._get_headers(cookie), self._get_proxies()
-        all_tag_works = []
-
-        initial_url = f"https://www.pixiv.net/ajax/search/artworks/{quote(tag)}?word={quote(tag)}&order=date_d&mode={age_mode}&s_mode=s_tag&p=1"
-        response = self._get_response_with_retries(initial_url, headers, proxies, timeout=20)
-        if not response:
-            return []
-
-        try:
-            data = response.json()
-            if data.get('error'): raise Exception(data.get('message', "API返回错误"))
-
-            total_count = data.get('body', {}).get('illustManga', {}).get('total', 0)
-            if total_count == 0:
-                self.progress_signal.emit(self.item_id, 0, 0, f"【{tag}】关键词没有找到作品。", self.catalog)
-                return []
-
-            self.progress_signal.emit(self.item_id, 0, 0, f"【{tag}】关键词总共有【{total_count}】个作品。", self.catalog)
-
-            pages_to_fetch = (total_count + 59) // 60
-
-            for page in range(1, pages_to_fetch + 1):
-                if self.stop_event.is_set(): break
-                page_url = f"https://www.pixiv.net/ajax/search/artworks/{quote(tag)}?word={quote(tag)}&order=date_d&mode={age_mode}&s_mode=s_tag&p={page}"
-
-                page_response = self._get_response_with_retries(page_url, headers, proxies, timeout=20)
-                if not page_response:
-                    self.progress_signal.emit(self.item_id, 0, 0, f"获取【{tag}】第{page}页作品失败，跳过该页。",
-                                              self.catalog)
-                    continue  # 跳过当前页，尝试下一页
-
-                page_data = page_response.json()
-                if page_data.get('error'):
-                    self.progress_signal.emit(self.item_id, 0, 0,
-                                              f"获取【{tag}】第{page}页作品API返回错误: {page_data.get('message', '')}",
-                                              self.catalog)
-                    continue
-
-                page_illusts = page_data.get('body', {}).get('illustManga', {}).get('data', [])
-                for illust in page_illusts:
-                    all_tag_works.append(illust['id'])
-
-            return all_tag_works
-        except Exception as e:
-            self.progress_signal.emit(self.item_id, 0, 0, f"获取标签作品列表失败: {e}", self.catalog)
-            return []
-
-    def _apply_completion_strategy(self, all_works_from_api):
-        filtered_works = []
-        if self.existing_image_ids and (self.completion_strategy == 'default' or self.completion_strategy == 'smart'):
-            if self.completion_strategy == 'default':
-                for work_id in all_works_from_api:
-                    if work_id not in self.existing_image_ids:
-                        filtered_works.append(work_id)
-                self.progress_signal.emit(self.item_id, 0, 0,
-                                          f"【补全下载】默认去重模式，发现 {len(all_works_from_api)} 个作品，其中 {len(filtered_works)} 个是新作品。",
-                                          self.catalog)
-            elif self.completion_strategy == 'smart':
-                if self.existing_image_ids:
-                    numeric_existing_ids = [int(x) for x in self.existing_image_ids if x.isdigit()]
-                    if numeric_existing_ids:
-                        max_existing_id = max(numeric_existing_ids)
-                        for work_id in all_works_from_api:
-                            if work_id.isdigit() and int(work_id) > max_existing_id:
-                                filtered_works.append(work_id)
-                        self.progress_signal.emit(self.item_id, 0, 0,
-                                                  f"【补全下载】智能补全模式，最大已下载ID: {max_existing_id}，发现 {len(filtered_works)} 个新作品。",
-                                                  self.catalog)
-                    else:
-                        filtered_works = all_works_from_api
-                        self.progress_signal.emit(self.item_id, 0, 0,
-                                                  f"【补全下载】智能补全模式，但无有效数字ID，将下载所有作品。",
-                                                  self.catalog)
-                else:
-                    filtered_works = all_works_from_api
-                    self.progress_signal.emit(self.item_id, 0, 0,
-                                              f"【补全下载】智能补全模式，无历史记录，将下载所有作品。", self.catalog)
-        else:
-            filtered_works = all_works_from_api
-            self.progress_signal.emit(self.item_id, 0, 0,
-                                      f"【常规下载】发现 {len(all_works_from_api)} 个作品。", self.catalog)
-        return filtered_works
-
-    def _get_work_details(self, work_id):
-        cookie = cookie_manager.get_cookie()
-        headers, proxies = self._get_headers(cookie), self._get_proxies()
-        pages_url = f"https://www.pixiv.net/ajax/illust/{work_id}/pages"
-        details_url = f"https://www.pixiv.net/ajax/illust/{work_id}"
-
-        # 注意：这里需要确保headers是可变的，以便_get_response_with_retries可以更新cookie
-        # 传递headers的副本，或者确保headers对象在函数调用之间是共享的
-        # 这里我们直接传递headers，因为它是局部变量，每次调用都会重新创建
-        pages_res = self._get_response_with_retries(pages_url, headers, proxies, timeout=20)
-        details_res = self._get_response_with_retries(details_url, headers, proxies, timeout=20)
-
-        if not pages_res or not details_res:
-            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情获取失败。", self.catalog)
-            return None
-
-        try:
-            pages_data, details_res_data = pages_res.json(), details_res.json()
-            if pages_data.get('error') or details_res_data.get('error'):
-                self.progress_signal.emit(self.item_id, 0, 0,
-                                          f"作品 {work_id} API返回错误: {pages_data.get('message', '')} {details_res_data.get('message', '')}",
-                                          self.catalog)
-                return None
-            work_data = details_res_data['body']
-            work_data['work_id'] = work_id
-            image_urls = [p['urls']['original'] for p in pages_data['body']]
-            return {'image_urls': image_urls, 'title': work_data.get('illustTitle', ''),
-                    'comment': work_data.get('illustComment', ''),
-                    'tags': [t['tag'] for t in work_data.get('tags', {}).get('tags', [])],
-                    'create_date': work_data.get('createDate', ''), 'user_name': work_data.get('userName', ''),
-                    'work_id': work_id}
-        except json.JSONDecodeError:
-            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情JSON解析失败。", self.catalog)
-            return None
-        except Exception as e:
-            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情处理未知错误: {e}", self.catalog)
-            return None
-
-    def _download_image(self, image_url, work_id, work_dir):
-        save_path = os.path.join(work_dir, image_url.split('/')[-1])
-        temp_save_path = save_path + ".tmp"  # 临时文件路径
-
-        # 如果最终文件已存在，则跳过下载
-        if os.path.exists(save_path):
-            return True
-
-        cookie = cookie_manager.get_cookie()
-        headers, proxies = self._get_headers(cookie), self._get_proxies()
-        headers['Referer'] = f"https://www.pixiv.net/artworks/{work_id}"
-
-        response = self._get_response_with_retries(image_url, headers, proxies, stream=True, timeout=30)
-        if not response:
-            # _get_response_with_retries 已经处理了重试和错误消息
-            return False
-
-        try:
-            expected_size = int(response.headers.get('Content-Length', 0))  # 获取预期文件大小
-            actual_size = 0  # 实际下载大小
-
-            with open(temp_save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if self.stop_event.is_set():
-                        # 如果停止事件被触发，清理临时文件并退出
-                        if os.path.exists(temp_save_path):
-                            os.remove(temp_save_path)
-                        return False
-                    self.check_pause()  # 检查是否需要暂停
-                    f.write(chunk)
-                    actual_size += len(chunk)  # 累加实际下载大小
-                    self.chunk_downloaded.emit(len(chunk))
-
-            # 下载到临时文件成功后，进行大小校验
-            if expected_size > 0 and actual_size == expected_size:
-                # 大小匹配，原子性重命名临时文件到最终路径
-                os.rename(temp_save_path, save_path)
-                return True
-            elif expected_size == 0 and actual_size > 0:
-                # 如果Content-Length未提供，但文件已下载且非空，则认为成功
-                os.rename(temp_save_path, save_path)
-                return True
-            else:
-                # 大小不匹配或文件为空，删除临时文件
-                if os.path.exists(temp_save_path):
-                    os.remove(temp_save_path)
-                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                          f"作品 {work_id}: 图片 {os.path.basename(save_path)} 下载大小不匹配 (预期: {expected_size}, 实际: {actual_size})。",
-                                          self.catalog)
-                return False  # 标记为失败，让上层逻辑决定是否重试整个作品
-
-        except Exception as e:
-            # 其他未知错误，清理临时文件
-            if os.path.exists(temp_save_path):
-                os.remove(temp_save_path)
-            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
-                                      f"作品 {work_id}: 图片下载处理错误: {e}", self.catalog)
-            return False
-
-    def _get_headers(self, cookie):
-        return {"cookie": f"PHPSESSID={cookie}", "referer": "https://www.pixiv.net",
-                "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
-
-    def _get_proxies(self):
-        p = self.config.get('proxy', {});
-        t, a, p_ = p.get('type', 'none'), p.get('address', ''), p.get('port', '')
-        if t == 'none' or not a or not p_: return None
-        proto = 'socks5' if t == '2' else 'http';
-        return {'http': f"{proto}://{a}:{p_}", 'https': f"{proto}://{a}:{p_}"}
-
-    def _sanitize_filename(self, name):
-        sanitized_name = re.sub(r'[<>:"/\\|?*]', '_', name)
-        sanitized_name = sanitized_name.rstrip('.')
-        sanitized_name = ''.join(c for c in sanitized_name if c.isprintable())
-        return sanitized_name.strip()
-
-    def _create_work_directory(self, work_details):
-        path_config = self.config.get('download_path', {})
-        base_download_root = path_config.get('base_path', './downloads')
-
-        uid_option = path_config.get('uid_option', 'UID')
-        pid_option = path_config.get('pid_option', '无')
-
-        current_path = ""
-        if self.catalog == 'User':
-            first_level_folder = ""
-            if uid_option == 'UID':
-                first_level_folder = self._sanitize_filename(self.item_id)
-            else:
-                first_level_folder = self._sanitize_filename(work_details.get('user_name', 'Unknown_Author'))
-            current_path = os.path.join(base_download_root, self.catalog, first_level_folder)
-            self.metadata_folder = current_path
-
-        elif self.catalog == 'Tag':
-            first_level_folder = self._sanitize_filename(self.item_id)
-            current_path = os.path.join(base_download_root, self.catalog, first_level_folder)
-            self.metadata_folder = current_path
-
-        elif self.catalog == 'Ranking':
-            current_path = self.custom_download_path
-            self.metadata_folder = current_path
-
-        if pid_option != '无':
-            second_level_folder = ""
-            if pid_option == 'PID':
-                second_level_folder = self._sanitize_filename(work_details.get('work_id', 'Unknown_PID'))
-            else:
-                second_level_folder = self._sanitize_filename(work_details.get('title', 'Unknown_Title'))
-
-            current_path = os.path.join(current_path, second_level_folder)
-
-        try:
-            os.makedirs(current_path, exist_ok=True)
-        except OSError as e:
-            print(f"Error creating download directory {current_path}: {e}")
-            self.progress_signal.emit(self.item_id, 0, 0, f"创建目录失败: {e}", self.catalog)
-            return None
-
-        return current_path
-
-    def _save_metadata_file(self):
-        if self.catalog == 'Ranking':
-            return  # Ranking metadata is handled by Ranking class
-
-        all_downloaded_ids = self.original_existing_image_ids.union(set(self.downloaded_work_ids))
-        try:
-            sorted_all_downloaded_ids = sorted(list(all_downloaded_ids), key=lambda x: int(x))
-        except ValueError:
-            sorted_all_downloaded_ids = sorted(list(all_downloaded_ids))
-
-        if not sorted_all_downloaded_ids and self.item_type == 'user':
-            self.progress_signal.emit(self.item_id, self.total_works, self.total_works,
-                                      f"【{self.item_id}】元数据保存跳过: 没有新的或已存在的作品ID。", self.catalog)
-            return
-
-        if not self.metadata_folder:
-            return
-
-        meta = {
-            "quantity": len(sorted_all_downloaded_ids),
-            "image_id": sorted_all_downloaded_ids,
-            "download_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "base_path": os.path.abspath(self.config.get('download_path', {}).get('base_path', './downloads')),
-            "uid_option": self.config.get('download_path', {}).get('uid_option', 'UID'),
-            "pid_option": self.config.get('download_path', {}).get('pid_option', '无')
-        }
-
-        if self.item_type == 'user':
-            meta["user_name"] = self.entity_name if self.entity_name != "Unknown" else self.item_id
-            meta["user_id"] = self.item_id
-        elif self.item_type == 'tag':
-            meta["tag_name"] = self.item_id
-            meta["tag_id"] = self.item_id
-            meta["age_mode"] = self.age_mode
-
-        meta_path = os.path.join(self.metadata_folder, f"{self.item_id}.json")
-        try:
-            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(meta, f, ensure_ascii=False, indent=2)
-            self.progress_signal.emit(self.item_id, self.total_works, self.total_works,
-                                      f"【{self.item_id}】元数据保存成功", self.catalog)
-        except Exception as e:
-            self.progress_signal.emit(self.item_id, self.total_works, self.total_works,
-                                      f"【{self.item_id}】元数据保存失败: {e}", self.catalog)
-
-    def stop(self):
-        self.resume();
-        self.stop_event.set()
-
-    def pause(self):
-        self.pause_event.set()
-
-    def resume(self):
-        self.pause_event.clear()
-
-    def check_pause(self):
-        while self.pause_event.is_set():
-            if self.stop_event.is_set(): break
-            time.sleep(0.5)
-
-
-class DownloadManager(QObject):
-    # 修改信号签名，增加 catalog 参数
-    task_progress = pyqtSignal(str, int, int, str, str);  # item_id, completed, total, status, catalog
-    task_finished = pyqtSignal(str, str);  # item_id, catalog
-    speed_updated = pyqtSignal(float)
-    _instance, _lock, _initialized = None, threading.Lock(), False
-
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None: cls._instance = super().__new__(cls)
-        return cls._instance
-
-    def __init__(self, parent=None):
-        if self._initialized: return
-        super().__init__(parent)
-        self.active_threads, self.config = {}, {};
-        self.bytes_in_second = 0;
-        self.byte_lock = threading.Lock()
-        self.speed_timer = None;
-        self._initialized = True
-        self.task_queue = []
-        self.active_tasks = {}
-
-    def init_timer(self):
-        if self.speed_timer is None:
-            self.speed_timer = QTimer(self);
-            self.speed_timer.timeout.connect(self._calculate_speed);
-            self.speed_timer.start(1000)
-
-    def load_config(self, config_data):
-        self.config = config_data;
-        cookie_manager.load_cookies(config_data)
-
-    def add_task(self, item_id, catalog, item_type='user', age_mode='all', existing_image_ids=None,
-                 completion_strategy='default', custom_path=None, ranking_type_name=None, ranking_date_str=None):
-        if self.is_task_queued_or_active(item_id):
-            return False
-
-        task_data = {
-            'item_id': item_id,
-            'catalog': catalog,
-            'item_type': item_type,
-            'age_mode': age_mode,
-            'existing_image_ids': existing_image_ids,
-            'completion_strategy': completion_strategy,
-            'custom_path': custom_path,
-            'ranking_type_name': ranking_type_name,
-            'ranking_date_str': ranking_date_str
-        }
-        self.task_queue.append(task_data)
-        self._start_next_task()
-        return True
-
-    def _start_next_task(self):
-        max_threads = int(self.config.get('thread_count', 5))
-        if len(self.active_tasks) >= max_threads:
-            return
-
-        if not self.task_queue:
-            return
-
-        task_data = self.task_queue.pop(0)
-        item_id = task_data['item_id']
-
-        thread = DownloadThread(
-            item_id=item_id,
-            config=self.config,
-            catalog=task_data['catalog'],
-            item_type=task_data['item_type'],
-            age_mode=task_data['age_mode'],
-            existing_image_ids=task_data['existing_image_ids'],
-            completion_strategy=task_data['completion_strategy'],
-            custom_path=task_data['custom_path'],
-            ranking_type_name=task_data['ranking_type_name'],
-            ranking_date_str=task_data['ranking_date_str']
-        )
-        # 连接信号时，槽函数需要匹配新的信号签名
-        thread.progress_signal.connect(self.task_progress.emit)
-        thread.finished_signal.connect(self._on_thread_finished)
-        thread.chunk_downloaded.connect(self._on_chunk_downloaded)
-        thread.start()
-        self.active_tasks[item_id] = thread
-
-    def _on_thread_finished(self, item_id, catalog):  # 接收 catalog 参数
-        if item_id in self.active_tasks:
-            thread = self.active_tasks.pop(item_id)
-            thread.quit()
-            thread.wait()
-            self.task_finished.emit(item_id, catalog)  # 传递 catalog
-            self._start_next_task()
-
-    def _on_chunk_downloaded(self, bytes_downloaded):
-        with self.byte_lock:
-            self.bytes_in_second += bytes_downloaded
-
-    def _calculate_speed(self):
-        with self.byte_lock:
-            speed = self.bytes_in_second
-            self.bytes_in_second = 0
-        self.speed_updated.emit(speed)
-
-    def is_task_queued_or_active(self, item_id):
-        if item_id in self.active_tasks:
-            return True
-        for task in self.task_queue:
-            if task['item_id'] == item_id:
-                return True
-        return False
-
-    def pause_download(self, item_id):
-        if item_id in self.active_tasks:
-            self.active_tasks[item_id].pause()
-
-    def resume_download(self, item_id):
-        if item_id in self.active_tasks:
-            self.active_tasks[item_id].resume()
-
-    def stop_download(self, item_id):
-        if item_id in self.active_tasks:
-            self.active_tasks[item_id].stop()
-            self.active_tasks.pop(item_id, None)
-        self.task_queue = [task for task in self.task_queue if task['item_id'] != item_id]
-        self._start_next_task()
-
-    def get_active_and_queued_tasks(self):
-        active_ids = list(self.active_tasks.keys())
-        queued_ids = [task['item_id'] for task in self.task_queue]
-        return active_ids + queued_ids
-
-    def get_active_and_queued_ranking_tasks(self):
-        ranking_tasks = []
-        for item_id, thread in self.active_tasks.items():
-            if thread.catalog == 'Ranking':
-                ranking_tasks.append(item_id)
-        for task_data in self.task_queue:
-            if task_data['catalog'] == 'Ranking':
-                ranking_tasks.append(task_data['item_id'])
-        return ranking_tasks
-
-    def pause_all_ranking_downloads(self):
-        for item_id, thread in self.active_tasks.items():
-            if thread.catalog == 'Ranking':
-                thread.pause()
-
-    def resume_all_ranking_downloads(self):
-        for item_id, thread in self.active_tasks.items():
-            if thread.catalog == 'Ranking':
-                thread.resume()
-
-    def stop_all_ranking_downloads(self):
-        items_to_stop = [item_id for item_id, thread in self.active_tasks.items() if thread.catalog == 'Ranking']
-        for item_id in items_to_stop:
-            self.stop_download(item_id)
-
-        self.task_queue = [task for task in self.task_queue if task['catalog'] != 'Ranking']
-        self._start_next_task()
-
-
-download_manager = DownloadManager()
+# app/download.py
+
+import os
+import requests
+import time
+import json
+import threading
+import heapq
+import itertools
+import collections
+import hashlib
+from concurrent.futures import Future, CancelledError
+from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+import re
+from urllib.parse import quote, urlparse
+
+from .config_manager import get_config, ConfigManager, config_manager
+from .http_client import http_client, build_headers, build_proxies
+from .details_cache import details_cache
+from .rate_limit import TokenBucket, bandwidth_limiter
+from .concurrency import concurrency_controller, DEFAULT_MAX_CONCURRENCY
+from .task_journal import task_journal
+from .progress import byte_counter, ProgressBuffer, PROGRESS_FLUSH_INTERVAL_MS
+from .task_queue import TaskQueue, PRIORITY_NORMAL
+from .download_index import download_index
+from .metadata_store import load_metadata, save_metadata, append_ids
+
+API_HOST, IMAGE_HOST = 'www.pixiv.net', 'i.pximg.net'
+# config.ini [rate_limit] 段的默认值：每秒请求数与突发上限。
+# 默认值不低于原来逐个任务下载时的请求频率（5 个线程、每次请求约 0.5 秒，约 10 次/秒），
+# 单账号的限速与 API 主机相同，只有一个账号时也不会比主机限速更严
+DEFAULT_RATE_LIMITS = {'cookie_rate': 10.0, 'cookie_burst': 20,
+                       'api_rate': 10.0, 'api_burst': 20,
+                       'image_rate': 20.0, 'image_burst': 20}
+
+
+class CookieManager:
+    _instance, _lock = None, threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, '_initialized'): return
+        self._cookies_state, self._current_index, self._lock = [], 0, threading.Lock()
+        self._limits = dict(DEFAULT_RATE_LIMITS)
+        # 按主机限速：API 请求与图片请求各自一个令牌桶
+        self._host_buckets = {API_HOST: TokenBucket(self._limits['api_rate'], self._limits['api_burst']),
+                              IMAGE_HOST: TokenBucket(self._limits['image_rate'], self._limits['image_burst'])}
+        self._initialized = True
+
+    def load_cookies(self, config):
+        with self._lock:
+            self._load_rate_limits(config)
+            # 重新加载时保留已有账号的令牌和禁用状态
+            previous = {info['cookie']: info for info in self._cookies_state}
+            self._cookies_state = []
+            for acc in config.get('Accounts', {}).values():
+                if cookie := acc.get('cookies', {}).get('PHPSESSID'):
+                    info = previous.get(cookie) or {
+                        'cookie': cookie, 'banned_until': 0,
+                        'bucket': TokenBucket(self._limits['cookie_rate'], self._limits['cookie_burst'])}
+                    info['bucket'].set_rate(self._limits['cookie_rate'], self._limits['cookie_burst'])
+                    self._cookies_state.append(info)
+
+    def _load_rate_limits(self, config):
+        section = config.get('rate_limit', {})
+        for key, default in DEFAULT_RATE_LIMITS.items():
+            try:
+                self._limits[key] = max(0.0, float(section.get(key, default)))
+            except (TypeError, ValueError):
+                self._limits[key] = default
+        self._host_buckets[API_HOST].set_rate(self._limits['api_rate'], self._limits['api_burst'])
+        self._host_buckets[IMAGE_HOST].set_rate(self._limits['image_rate'], self._limits['image_burst'])
+
+    def _best_available_locked(self):
+        """未被禁用的账号中令牌最多的一个；令牌相同时轮换，避免总是落到第一个账号。调用方需持有 _lock"""
+        now = time.time()
+        self._current_index = (self._current_index + 1) % len(self._cookies_state)
+        rotated = self._cookies_state[self._current_index:] + self._cookies_state[:self._current_index]
+        available = [info for info in rotated if now > info['banned_until']]
+        if not available:
+            return None
+        return max(available, key=lambda info: info['bucket'].available())
+
+    def get_cookie(self):
+        with self._lock:
+            if not self._cookies_state: return ""
+            if info := self._best_available_locked():
+                return info['cookie']
+            # 如果所有cookie都被禁用，则返回最早解禁的cookie，让调用者处理等待
+            return min(self._cookies_state, key=lambda info: info['banned_until'])['cookie']
+
+    def acquire(self, url, cookie=None):
+        """
+        发送请求前申请令牌，返回 (cookie, wait)。
+        wait 为 0 表示令牌已扣除可以立即发送，否则需等待 wait 秒后再次申请。
+        API 请求所用账号令牌不足或已被禁用时，会换成令牌最多的可用账号。
+        """
+        host = urlparse(url).hostname or ''
+        with self._lock:
+            buckets = [self._host_buckets[host]] if host in self._host_buckets else []
+            info = None
+            if host == API_HOST and cookie:
+                info = next((i for i in self._cookies_state if i['cookie'] == cookie), None)
+                if info is not None and (info['bucket'].time_until() > 0 or time.time() <= info['banned_until']):
+                    info = self._best_available_locked() or info
+                if info is not None:
+                    cookie = info['cookie']
+                    buckets.append(info['bucket'])
+            wait = max((bucket.time_until() for bucket in buckets), default=0.0)
+            if wait == 0:
+                for bucket in buckets:
+                    bucket.consume()
+            return cookie, wait
+
+    def format_limiter_state(self):
+        with self._lock:
+            now = time.time()
+            usable = sum(1 for info in self._cookies_state if now > info['banned_until'])
+            api, image = self._host_buckets[API_HOST], self._host_buckets[IMAGE_HOST]
+            return (f"限流: API {api.available():.0f}/{api.capacity:.0f} "
+                    f"图片 {image.available():.0f}/{image.capacity:.0f} "
+                    f"账号 {usable}/{len(self._cookies_state)}")
+
+    def ban_cookie(self, cookie_to_ban):
+        with self._lock:
+            for info in self._cookies_state:
+                if info['cookie'] == cookie_to_ban:
+                    ban_time = time.time() + 180  # 禁用3分钟
+                    info['banned_until'] = ban_time
+                    print(f"Cookie ...{cookie_to_ban[-6:]} banned until {time.ctime(ban_time)}");
+                    break
+
+    def get_cookie_count(self):
+        with self._lock:
+            return len(self._cookies_state)
+
+    def get_wait_time(self):
+        """距离最早一个Cookie解禁还需等待的秒数；当前有可用Cookie时为0，未配置Cookie时返回None"""
+        with self._lock:
+            if not self._cookies_state: return None
+            return max(0.0, min(info['banned_until'] for info in self._cookies_state) - time.time())
+
+
+cookie_manager = CookieManager()
+
+NO_COOKIE_BACKOFF = 30  # 未配置Cookie时遇到限流的等待秒数
+MAX_TOKEN_WAIT = 5  # 令牌等待超过该秒数时把作业交回调度器，不占用工作线程
+IMAGE_RESUME_ATTEMPTS = 3  # 图片传输中断后从断点续传的次数
+TAG_PAGE_CONCURRENCY = 4  # 标签搜索同时在途的分页请求数
+PIPELINE_BACKLOG_LIMIT = 1000  # 积压队列达到该数量时暂停标签分页枚举
+DEFAULT_API_WORKERS = 4  # API 线程池（枚举、详情）的默认线程数，API 请求另受令牌桶限流
+DEFAULT_PAGE_CONCURRENCY = 4  # 单个作品同时下载的页数
+PAGE_RETRY_ATTEMPTS = 2  # 单页下载失败后单独重试的次数
+
+
+class RetryLater(Exception):
+    """
+    作业暂时无法继续（例如所有Cookie都处于限流禁用期）。
+    调度器捕获后把作业放入延迟队列，到 not_before 时刻再重新执行，等待期间不占用工作线程。
+    """
+
+    def __init__(self, not_before, reason=""):
+        super().__init__(reason)
+        self.not_before = not_before
+
+
+class TaskPaused(RetryLater):
+    """
+    作业执行到暂停检查点时任务已被暂停。调度器捕获后把作业暂存到该任务名下，
+    立即释放工作线程给其他任务；任务恢复后作业从头重新执行，图片的临时文件保留，从断点续传。
+    """
+
+    def __init__(self):
+        super().__init__(0, "任务已暂停")
+
+
+class WorkScheduler:
+    """
+    作品级作业调度器。
+    用户、标签、排行榜任务都会展开成作品级作业提交到这里，由一组常驻工作线程统一执行，
+    避免为每个任务单独创建线程、连接池和线程池。
+    """
+
+    def __init__(self, max_workers=5, name="PixivWorker"):
+        self._cond = threading.Condition()
+        self._ready = collections.deque()
+        self._parked = {}  # owner -> [job]，已暂停任务的作业暂存于此，不占用工作线程
+        self._delayed = []  # (not_before, seq, job) 小顶堆，限流退避中的作业
+        self._seq = itertools.count()
+        self._max_workers = max(1, int(max_workers))
+        self._workers = 0
+        self._name = name
+
+    def submit(self, fn, *args, owner=None):
+        """提交作业，返回 Future。owner 需提供 is_paused()，暂停期间其作业不会被执行"""
+        future = Future()
+        with self._cond:
+            self._ready.append((future, fn, args, owner))
+            self._spawn_workers()
+            self._cond.notify()
+        return future
+
+    def set_max_workers(self, max_workers):
+        with self._cond:
+            self._max_workers = max(1, int(max_workers))
+            self._spawn_workers()
+            self._cond.notify_all()  # 多余的线程被唤醒后自行退出
+
+    def get_max_workers(self):
+        return self._max_workers
+
+    def park_owner(self, owner, job):
+        """
+        把已暂停任务的作业暂存起来，不占用工作线程。
+        在 _cond 内再次检查暂停状态：resume() 先清除暂停标志再调用 resume_owner()，
+        两者不会错过彼此，已恢复的任务的作业直接放回就绪队列。
+        """
+        with self._cond:
+            if owner.is_paused():
+                self._parked.setdefault(owner, []).append(job)
+            else:
+                self._ready.append(job)
+                self._cond.notify()
+
+    def resume_owner(self, owner):
+        """把暂停期间暂存的作业重新放回就绪队列"""
+        with self._cond:
+            jobs = self._parked.pop(owner, [])
+            if jobs:
+                self._ready.extend(jobs)
+                self._cond.notify_all()
+
+    def cancel_owner(self, owner):
+        """
+        取消某个任务尚未执行的全部作业（就绪、暂停暂存、退避中）。
+        退避中的作业已处于运行状态无法 cancel()，以 CancelledError 结束其 Future。
+        """
+        with self._cond:
+            jobs = self._parked.pop(owner, [])
+            jobs += [job for job in self._ready if job[3] is owner]
+            self._ready = collections.deque(job for job in self._ready if job[3] is not owner)
+            jobs += [item[2] for item in self._delayed if item[2][3] is owner]
+            self._delayed = [item for item in self._delayed if item[2][3] is not owner]
+            heapq.heapify(self._delayed)
+        for future, _, _, _ in jobs:
+            if not future.cancel() and not future.done():
+                future.set_exception(CancelledError())
+
+    def _promote_due_jobs(self):
+        """把退避时间已到的作业移回就绪队列（调用方需持有 _cond）"""
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._ready.append(heapq.heappop(self._delayed)[2])
+
+    def _spawn_workers(self):
+        while self._workers < self._max_workers and self._workers < len(self._ready):
+            self._workers += 1
+            threading.Thread(target=self._worker_loop, name=f"{self._name}-{self._workers}", daemon=True).start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._workers <= self._max_workers:
+                    self._promote_due_jobs()
+                    if self._ready:
+                        break
+                    # 只有退避中的作业时，等到最早的解禁时间
+                    self._cond.wait(self._delayed[0][0] - time.time() if self._delayed else None)
+                if self._workers > self._max_workers:
+                    self._workers -= 1
+                    return
+                job = self._ready.popleft()
+                future, fn, args, owner = job
+                if owner is not None and owner.is_paused():
+                    self._parked.setdefault(owner, []).append(job)
+                    continue
+
+            # 退避后重新执行的作业 Future 已处于运行状态
+            if not future.running() and not future.set_running_or_notify_cancel():
+                continue  # 作业在排队期间被取消
+            try:
+                result = fn(*args)
+            except TaskPaused:
+                self.park_owner(owner, job)
+            except RetryLater as e:
+                with self._cond:
+                    heapq.heappush(self._delayed, (e.not_before, next(self._seq), job))
+                    self._cond.notify()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+class DownloadTask(QObject):
+    finished_signal = pyqtSignal(str, str)  # item_id, catalog
+    work_finished = pyqtSignal(str, str, bool, str)  # item_id, work_id, success, catalog：排行榜按作品更新列表
+
+    def __init__(self, item_id, config, catalog, scheduler, image_scheduler=None, item_type='user', age_mode='all',
+                 existing_image_ids=None, completion_strategy='default', custom_path=None, ranking_type_name=None,
+                 ranking_date_str=None, work_ids=None, metadata_file=None, restored=None, parent=None):
+        super().__init__(parent)
+        # 进度消息先缓存，由 DownloadManager 定时取走；下载字节数累加到 byte_counter
+        self.progress_signal = ProgressBuffer()  # emit(item_id, completed, total, status, catalog)
+        self.item_id = item_id
+        self.config = config
+        self.catalog = catalog  # 保存 catalog
+        self.item_type = item_type
+        self.age_mode = age_mode
+
+        self.scheduler = scheduler  # 共享的 API 调度器：作品枚举、详情请求
+        self.image_scheduler = image_scheduler or scheduler  # 共享的图片调度器：逐页下载图片
+        self._futures = set()  # 在途作业，结束后自动移除
+        self._is_finished = False
+        self._pending_expansions = 0  # 尚未结束的枚举作业数
+        self._seen_work_ids = set()  # 已提交的作品ID，用于跨分页去重
+        self._enumerated_count = 0  # 标签枚举得到的作品总数（去重前）
+        self._tag_pages = None
+        # 流水线状态：积压队列(待获取详情) -> 详情阶段 -> 待下载页队列 -> 图片阶段
+        self._backlog = collections.deque()
+        self._details_inflight = 0
+        self._ready_works = collections.deque()  # 还有页未提交的作品ID
+        self._images_inflight = 0
+        self._work_pages = {}  # work_id -> 待提交的页、在途页数及各页结果汇总，最后一页结束时结算作品
+        self._paused_enumeration = []  # 积压过多时暂停的分页枚举，积压回落后恢复
+
+        self.stop_event, self.pause_event = threading.Event(), threading.Event()
+        self.lock = threading.Lock()
+        self.completed_works = 0
+        self.total_works = 0
+        self.downloaded_work_ids = []
+        self.entity_name = "Unknown"
+
+        self.existing_image_ids = set(existing_image_ids) if existing_image_ids else set()
+        self.completion_strategy = completion_strategy
+        self.original_existing_image_ids = set(existing_image_ids) if existing_image_ids else set()
+        self._indexed_work_ids = None  # 下载索引中该用户/标签目录已有文件的作品，首次过滤时读取
+        self._latest_work_id = None  # 本次从接口得到的最新作品ID，任务完成后写入下载索引
+        self._failed_works = 0
+
+        self.custom_download_path = custom_path
+        self.ranking_type_name = ranking_type_name
+        self.ranking_date_str = ranking_date_str
+        # 排行榜整榜作为一个任务，作品ID由界面获取后传入；旧版本日志中每个作品一个任务，item_id 即作品ID
+        self.work_ids = list(work_ids) if work_ids else None
+        self._skipped_works = set()  # 界面上从列表删除的作品，尚未开始时不再下载
+        self.metadata_folder = None
+        # 元数据文件路径，随任务写入日志：排行榜按日期命名，恢复的任务照样记录已下载的作品；
+        # 补全下载时为找到的配置文件，已下载的作品ID在枚举作业中从中读取，不经过界面线程和任务日志
+        self.metadata_file = metadata_file
+        # 从任务日志恢复的状态：{'pending': [...], 'done': [...], 'details': {...}}，新任务为 None
+        self.restored = restored
+
+    def start(self):
+        """
+        把任务的作品枚举作为第一个作业提交到 API 调度器。枚举得到的作品依次经过
+        积压队列 -> 详情阶段（API 调度器）-> 待下载页队列 -> 图片阶段（图片调度器，每页一个作业），
+        各阶段窗口有上限，下游跟不上时暂停上游。
+        """
+        self._submit_expansion(self._expand_works)
+
+    def _track_future(self, future):
+        """登记在途作业供 stop() 取消，作业结束后立即移除，任务再大登记表也不会增长"""
+        with self.lock:
+            self._futures.add(future)
+        future.add_done_callback(self._untrack_future)
+
+    def _untrack_future(self, future):
+        with self.lock:
+            self._futures.discard(future)
+
+    def _submit_expansion(self, fn, *args, next_step=None):
+        """
+        提交枚举类作业（作品列表、标签分页）。所有枚举作业结束且已提交的作品都完成后任务才结束。
+        next_step 在本作业结束时先于结算执行，用于接力提交下一个分页作业。
+        """
+        with self.lock:
+            self._pending_expansions += 1
+        future = self.scheduler.submit(fn, *args, owner=self)
+        self._track_future(future)
+
+        def on_done(f):
+            if next_step is not None and not self.stop_event.is_set():
+                next_step()
+            self._on_expansion_done(f)
+
+        future.add_done_callback(on_done)
+
+    def _expand_works(self):
+        """枚举作业：恢复/用户/排行榜直接得到作品列表，标签按页并发枚举，边枚举边送入流水线"""
+        if self.restored is None:
+            self._load_existing_ids()
+        if self.restored is not None:
+            self._enqueue_works(self._restore_works())
+        elif self.catalog == 'User' and self.completion_strategy == 'incremental':
+            high_water = self._incremental_high_water()
+            top_works = self._fetch_user_top_works(self.item_id) if high_water is not None else None
+            work_ids = self._incremental_candidates(top_works, high_water)
+            from_top = work_ids is not None
+            if not from_top:
+                work_ids = self._fetch_user_works(self.item_id)
+                self._note_latest_work(work_ids)
+            self._enqueue_works(self._apply_incremental_strategy(work_ids, high_water, from_top))
+        elif self.catalog == 'User':
+            all_works_from_api = self._fetch_user_works(self.item_id)
+            self._enqueue_works(self._apply_completion_strategy(all_works_from_api))
+        elif self.catalog == 'Tag':
+            self._expand_tag_works(self.item_id, self.age_mode)
+        elif self.catalog == 'Ranking':
+            self._enqueue_works(self._ranking_works())
+
+    def _load_existing_ids(self):
+        """补全下载：从配置文件读取已下载的作品ID（二进制快照和追加日志一并合并）"""
+        if self.existing_image_ids or not self.metadata_file or self.catalog == 'Ranking':
+            return
+        meta, error = load_metadata(self.metadata_file)
+        if error:
+            self.progress_signal.emit(self.item_id, 0, 0, f"{error}，按常规方式下载。", self.catalog)
+            return
+        with self.lock:
+            self.existing_image_ids = set(meta.get('image_id', []))
+            self.original_existing_image_ids = set(self.existing_image_ids)
+        self.progress_signal.emit(self.item_id, 0, 0,
+                                  f"【补全下载】已读取配置文件，共 {len(self.existing_image_ids)} 个已下载的作品。",
+                                  self.catalog)
+
+    def _ranking_works(self):
+        return [work_id for work_id in (self.work_ids or [self.item_id]) if work_id not in self._skipped_works]
+
+    def skip_works(self, work_ids):
+        """
+        从任务中去掉尚未开始获取详情的作品（排行榜列表中删除的作品），已开始的作品照常完成。
+        在 GUI 线程中调用，返回从积压队列中去掉的作品ID列表。
+        """
+        with self.lock:
+            self._skipped_works.update(map(str, work_ids))
+            skipped = [work_id for work_id in self._backlog if work_id in self._skipped_works]
+            if skipped:
+                self._backlog = collections.deque(w for w in self._backlog if w not in self._skipped_works)
+                self.total_works -= len(skipped)
+        if skipped:
+            task_journal.remove_works(self.item_id, skipped)
+            self._check_finished()
+        return skipped
+
+    def _claim_new_works(self, work_ids):
+        """跨分页去重并追加到任务日志，返回本次新增的作品ID"""
+        with self.lock:
+            new_ids = [work_id for work_id in dict.fromkeys(work_ids) if work_id not in self._seen_work_ids]
+            start_seq = len(self._seen_work_ids)
+            self._seen_work_ids.update(new_ids)
+        if new_ids and self.restored is None and not self.stop_event.is_set():
+            task_journal.set_works(self.item_id, new_ids, start_seq)
+        return new_ids
+
+    def _enqueue_works(self, work_ids):
+        """去重后把作品放入积压队列并推动流水线，返回本次新增数量"""
+        new_ids = self._claim_new_works(work_ids)
+        if not new_ids or self.stop_event.is_set():
+            return 0
+        with self.lock:
+            self.total_works += len(new_ids)  # 先计数再入队，保证作品完成时不会误判任务结束
+            self._backlog.extend(new_ids)
+        self._pump()
+        return len(new_ids)
+
+    def _image_window(self):
+        """图片阶段同时在途的页数，跟随图片调度器线程数（自适应并发时随之变化）"""
+        return self.image_scheduler.get_max_workers()
+
+    def _details_window(self):
+        """详情阶段同时在途的请求数，跟随 API 调度器线程数"""
+        return self.scheduler.get_max_workers()
+
+    def _page_concurrency(self):
+        """单个作品同时下载的页数，每次读取配置，设置页修改后立即生效"""
+        try:
+            return max(1, int(self.config.get('page_concurrency', DEFAULT_PAGE_CONCURRENCY)))
+        except (TypeError, ValueError):
+            return DEFAULT_PAGE_CONCURRENCY
+
+    def _pump(self):
+        """
+        按各阶段窗口从上游取作品提交作业：图片阶段最多 _image_window() 个在途页，
+        每个作品最多 _page_concurrency() 页并行，按作品先后顺序提交；
+        详情阶段最多 _details_window() 个在途请求，且待下载的作品不超过图片窗口的两倍；
+        积压队列回落到 PIPELINE_BACKLOG_LIMIT 的一半以下时恢复被暂停的分页枚举。
+        """
+        if self.stop_event.is_set():
+            return
+        image_jobs, details_jobs, resumes = [], [], []
+        with self.lock:
+            image_window, details_window = self._image_window(), self._details_window()
+            page_limit, waiting = self._page_concurrency(), []
+            while self._ready_works and self._images_inflight < image_window:
+                work_id = self._ready_works.popleft()
+                state = self._work_pages[work_id]
+                while state['pending'] and state['inflight'] < page_limit and self._images_inflight < image_window:
+                    image_jobs.append((work_id, state['pending'].popleft(), state['dir']))
+                    state['inflight'] += 1
+                    self._images_inflight += 1
+                if state['pending']:
+                    waiting.append(work_id)
+            self._ready_works.extendleft(reversed(waiting))  # 还有页未提交的作品保持原来的顺序
+            while (self._backlog and self._details_inflight < details_window
+                   and len(self._ready_works) + self._details_inflight < 2 * image_window):
+                details_jobs.append(self._backlog.popleft())
+                self._details_inflight += 1
+            if self._paused_enumeration and len(self._backlog) < PIPELINE_BACKLOG_LIMIT // 2:
+                resumes, self._paused_enumeration = self._paused_enumeration, []
+                self._pending_expansions += len(resumes)  # 恢复期间仍计为在途枚举，避免误判枚举结束
+
+        for work_id, image_url, work_dir in image_jobs:
+            future = self.image_scheduler.submit(self._download_page, work_id, image_url, work_dir, owner=self)
+            self._track_future(future)
+            future.add_done_callback(lambda f, w=work_id: self._on_page_done(f, w))
+        for work_id in details_jobs:
+            future = self.scheduler.submit(self._prepare_work, work_id, owner=self)
+            self._track_future(future)
+            future.add_done_callback(lambda f, w=work_id: self._on_details_done(f, w))
+        for resume in resumes:
+            resume()
+            self._end_expansion()
+
+    def _future_outcome(self, future):
+        """返回 (结果, 异常)，被取消的作业返回 (None, None)"""
+        if future.cancelled():
+            return None, None
+        exc = future.exception()
+        if exc is not None:
+            return None, (None if isinstance(exc, CancelledError) else exc)
+        return future.result(), None
+
+    def _on_expansion_done(self, future):
+        _, exc = self._future_outcome(future)
+        if exc is not None and not self.stop_event.is_set():
+            self.progress_signal.emit(self.item_id, 0, 0, f"严重错误: {exc}", self.catalog)
+        self._end_expansion()
+
+    def _end_expansion(self):
+        with self.lock:
+            self._pending_expansions -= 1
+            expansion_finished = self._pending_expansions == 0 and not self._paused_enumeration
+        if expansion_finished and not self.stop_event.is_set():
+            task_journal.mark_expanded(self.item_id)
+            if self.catalog == 'Tag' and self.restored is None:
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"【{self.item_id}】枚举完成，共发现 {self._enumerated_count} 个作品，其中 {self.total_works} 个需要下载。",
+                                          self.catalog)
+        self._check_finished()
+
+    def _on_details_done(self, future, work_id):
+        prepared, exc = self._future_outcome(future)
+        with self.lock:
+            self._details_inflight -= 1
+            if prepared:
+                work_details, work_dir = prepared
+                if work_details['image_urls']:
+                    self._work_pages[work_id] = self._new_page_state(work_details['image_urls'], work_dir)
+                    self._ready_works.append(work_id)
+        if not prepared:
+            self._complete_work(work_id, error=exc)
+        elif not work_details['image_urls']:
+            self._complete_work(work_id, success=True)
+        self._pump()
+        self._check_finished()
+
+    def _on_page_done(self, future, work_id):
+        success, exc = self._future_outcome(future)
+        with self.lock:
+            self._images_inflight -= 1
+            self._work_pages[work_id]['inflight'] -= 1
+        self._finish_page(work_id, bool(success), exc)
+        self._pump()
+        self._check_finished()
+
+    def _new_page_state(self, image_urls, work_dir):
+        return {'pending': collections.deque(image_urls), 'dir': work_dir, 'inflight': 0,
+                'total': len(image_urls), 'remaining': len(image_urls), 'failed': 0, 'error': None}
+
+    def _finish_page(self, work_id, success, error=None):
+        """登记一页的下载结果，作品的最后一页结束时结算该作品；部分页失败时已下载的页保留在磁盘上"""
+        with self.lock:
+            state = self._work_pages[work_id]
+            state['remaining'] -= 1
+            if not success:
+                state['failed'] += 1
+            if state['error'] is None:
+                state['error'] = error
+            if state['remaining'] > 0:
+                return
+            del self._work_pages[work_id]
+        if 0 < state['failed'] < state['total'] and not self.stop_event.is_set():
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: {state['total'] - state['failed']}/{state['total']} 页下载成功，"
+                                      f"已下载的页已保留，其余页下次补全下载时重新下载。", self.catalog)
+        self._complete_work(work_id, success=state['failed'] == 0, error=state['error'])
+
+    def _check_finished(self):
+        with self.lock:
+            if self._pending_expansions > 0 or self._details_inflight > 0 or self._images_inflight > 0:
+                return
+            # 停止后积压和待下载的作品不再处理，只需等在途作业退出
+            if not self.stop_event.is_set() and (self._paused_enumeration or self._backlog or self._ready_works
+                                                 or self.completed_works < self.total_works):
+                return
+            nothing_to_do = self.total_works == 0
+        if nothing_to_do and not self.stop_event.is_set():
+            self.progress_signal.emit(self.item_id, 0, 0, "没有作品需要下载或访问失败。", self.catalog)
+        self._finish()
+
+    def _restore_works(self):
+        """从任务日志恢复：不再请求作品列表，上次已完成的作品直接计入下载结果"""
+        self.downloaded_work_ids.extend(self.restored['done'])
+        self.progress_signal.emit(self.item_id, 0, 0,
+                                  f"【恢复任务】从上次中断处继续，已完成 {len(self.restored['done'])} 个作品，剩余 {len(self.restored['pending'])} 个。",
+                                  self.catalog)
+        return list(self.restored['pending'])
+
+    def _complete_work(self, work_id, success=False, error=None):
+        """作品离开流水线（成功、失败或出错）时计数并输出日志"""
+        with self.lock:
+            self.completed_works += 1
+            completed, total = self.completed_works, self.total_works
+            if success:
+                self.downloaded_work_ids.append(work_id)
+            else:
+                self._failed_works += 1
+        if success:
+            task_journal.mark_work_done(self.item_id, work_id)
+            download_index.record_work(work_id, self.catalog, self.item_id)
+            if metadata_path := self._metadata_path():
+                append_ids(metadata_path, [work_id])
+
+        if self.stop_event.is_set():
+            return
+        if self.catalog == 'Ranking':
+            self.work_finished.emit(self.item_id, work_id, success, self.catalog)
+        if error is not None:
+            self.progress_signal.emit(self.item_id, completed, total,
+                                      f"作品 {work_id} 处理时发生错误: {error} ({completed}/{total})",
+                                      self.catalog)
+        elif success:
+            self.progress_signal.emit(self.item_id, completed, total,
+                                      f"作品 {work_id} 下载成功 ({completed}/{total})", self.catalog)
+        else:
+            self.progress_signal.emit(self.item_id, completed, total,
+                                      f"作品 {work_id} 下载失败 ({completed}/{total})", self.catalog)
+
+    def _finish(self):
+        with self.lock:
+            if self._is_finished: return
+            self._is_finished = True
+        try:
+            if self.catalog == 'User' and not self.stop_event.is_set():
+                self._update_high_water()
+            self._save_metadata_file()
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      http_client.format_stats(), self.catalog)
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      details_cache.format_stats(), self.catalog)
+            if download_index.reused_files:
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          download_index.format_stats(), self.catalog)
+        finally:
+            self.finished_signal.emit(self.item_id, self.catalog)  # 传递 catalog
+
+    def _prepare_work(self, work_id):
+        """详情阶段：获取作品详情并创建目录，返回 (详情, 目录)，失败返回 None"""
+        if self.stop_event.is_set():
+            return None
+        self.check_pause()
+
+        work_details = self._get_work_details(work_id)
+        if not work_details:
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: 详情获取失败，跳过。", self.catalog)
+            return None
+
+        if self.catalog == 'User' and self.entity_name == "Unknown":
+            self.entity_name = work_details.get('user_name', 'Unknown_Author')
+
+        work_dir = self._create_work_directory(work_details)
+        if not work_dir:
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: 目录创建失败，跳过。", self.catalog)
+            return None
+        return work_details, work_dir
+
+    def _download_page(self, work_id, image_url, work_dir):
+        """图片阶段：下载作品的一页，失败时只重试这一页，成功返回 True"""
+        for attempt in range(PAGE_RETRY_ATTEMPTS + 1):
+            if self.stop_event.is_set():
+                return False
+            self.check_pause()
+            if self._download_image(image_url, work_id, work_dir):
+                return True
+            if attempt < PAGE_RETRY_ATTEMPTS and not self.stop_event.is_set():
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"作品 {work_id}: {image_url.split('/')[-1]} 下载失败，单独重试该页 "
+                                          f"({attempt + 1}/{PAGE_RETRY_ATTEMPTS})", self.catalog)
+        return False
+
+    def _get_response_with_retries(self, url, headers, proxies, stream=False, timeout=20, max_retries=5):
+        """
+        辅助方法：封装带重试、Cookie管理和429/403处理的requests.get请求。
+        headers 参数必须是可变的字典，因为会更新其中的 'cookie' 字段。
+        """
+        retries = 0
+        while retries < max_retries:
+            if self.stop_event.is_set(): return None
+            self.check_pause()
+            if not self._wait_for_tokens(url, headers): return None
+
+            try:
+                request_started = time.monotonic()
+                response = http_client.get(url, headers=headers, proxies=proxies, stream=stream, timeout=timeout)
+
+                if response.status_code in (403, 429):
+                    response.close()
+                    self._record_concurrency(url, throttled=True)
+                    self._handle_rate_limit(url, response.status_code, headers)
+                    continue  # 已换上可用Cookie，立即重试
+
+                if response.status_code == 416:
+                    return response  # 续传的 Range 无效，由调用方丢弃临时文件后重新下载
+
+                response.raise_for_status()  # 对于4xx或5xx的HTTP状态码抛出异常
+                self._record_concurrency(url, latency=time.monotonic() - request_started)
+                return response  # 成功，返回响应
+
+            except RetryLater:
+                raise
+            except requests.exceptions.RequestException as e:
+                retries += 1
+                if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                    self._record_concurrency(url, timeout=True)
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"请求 {url}: 网络错误或超时: {e} (重试 {retries}/{max_retries})",
+                                          self.catalog)
+                self.stop_event.wait(2 * retries)  # 指数退避，等待时间随重试次数增加，停止时立即返回
+            except Exception as e:
+                retries += 1
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"请求 {url}: 未知错误: {e} (重试 {retries}/{max_retries})", self.catalog)
+                self.stop_event.wait(2 * retries)
+
+        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                  f"请求 {url}: 达到最大重试次数，放弃。", self.catalog)
+        return None  # 达到最大重试次数后失败
+
+    def _record_concurrency(self, url, **kwargs):
+        """自适应并发只调节图片线程池，因此只统计图片请求；API 请求由令牌桶限流"""
+        if urlparse(url).hostname == IMAGE_HOST:
+            concurrency_controller.record(**kwargs)
+
+    def _cookie_from_headers(self, headers):
+        cookie_header = headers.get('cookie', '')
+        return cookie_header.split('PHPSESSID=')[-1] if 'PHPSESSID=' in cookie_header else ""
+
+    def _wait_for_tokens(self, url, headers):
+        """按账号和主机令牌桶限速，必要时换用令牌更多的账号；任务被停止时返回 False"""
+        while True:
+            cookie, wait_time = cookie_manager.acquire(url, self._cookie_from_headers(headers))
+            if cookie:
+                headers['cookie'] = f"PHPSESSID={cookie}"
+            if wait_time <= 0:
+                return True
+            if wait_time > MAX_TOKEN_WAIT:
+                raise RetryLater(time.time() + wait_time, "令牌不足")
+            if self.stop_event.wait(wait_time):
+                return False
+
+    def _handle_rate_limit(self, url, status_code, headers):
+        """
+        处理 403/429：禁用当前Cookie，仍有可用Cookie时换上并返回，由调用方立即重试；
+        所有Cookie都在禁用期内时抛出 RetryLater，整个作业交回调度器，到最早解禁时间再重新执行，
+        期间工作线程可以去处理其他任务的作业，停止/暂停也不会被等待阻塞。
+        """
+        current_cookie_value = self._cookie_from_headers(headers)
+        if current_cookie_value:
+            cookie_manager.ban_cookie(current_cookie_value)
+
+        wait_time = cookie_manager.get_wait_time()
+        if wait_time is None:
+            wait_time = NO_COOKIE_BACKOFF
+        if wait_time > 0:
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"请求 {url}: {status_code}错误，暂无可用Cookie，{int(wait_time)}秒后重试。",
+                                      self.catalog)
+            raise RetryLater(time.time() + wait_time, f"{status_code}错误")
+
+        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                  f"请求 {url}: {status_code}错误，Cookie被禁用，更换Cookie后重试。", self.catalog)
+        headers['cookie'] = f"PHPSESSID={cookie_manager.get_cookie()}"
+
+    def _fetch_user_works(self, user_id):
+        cookie = cookie_manager.get_cookie()
+        headers, proxies = self._get_headers(cookie), self._get_proxies()
+        url = f"https://www.pixiv.net/ajax/user/{user_id}/profile/all"
+
+        response = self._get_response_with_retries(url, headers, proxies, timeout=20)
+        if not response:
+            return []
+
+        try:
+            return self._parse_user_works(response.json())
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"解析用户作品列表失败: {e}", self.catalog)
+            return []
+
+    def _fetch_user_top_works(self, user_id):
+        """请求 profile/top（只含最近的作品，远小于 profile/all），返回 {类别: [作品ID]}，失败返回 None"""
+        cookie = cookie_manager.get_cookie()
+        headers, proxies = self._get_headers(cookie), self._get_proxies()
+        response = self._get_response_with_retries(self._user_top_url(user_id), headers, proxies, timeout=20)
+        if not response:
+            return None
+        try:
+            return self._parse_user_top_works(response.json())
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"解析用户最新作品失败: {e}", self.catalog)
+            return None
+
+    def _user_top_url(self, user_id):
+        return f"https://www.pixiv.net/ajax/user/{user_id}/profile/top"
+
+    def _parse_user_top_works(self, data):
+        if data.get('error'): raise Exception(data.get('message', "API返回错误"))
+        body = data.get('body', {})
+        return {kind: list(works.keys()) if isinstance(works, dict) else []
+                for kind, works in ((kind, body.get(kind, {})) for kind in ('illusts', 'manga'))}
+
+    def _parse_user_works(self, data):
+        if data.get('error'): raise Exception(data.get('message', "API返回错误"))
+        body = data.get('body', {});
+        illusts, manga = body.get('illusts', {}), body.get('manga', {})
+        return list(illusts.keys() if isinstance(illusts, dict) else []) + \
+            list(manga.keys() if isinstance(manga, dict) else [])
+
+    def _tag_search_url(self, tag, age_mode, page):
+        return f"https://www.pixiv.net/ajax/search/artworks/{quote(tag)}?word={quote(tag)}&order=date_d&mode={age_mode}&s_mode=s_tag&p={page}"
+
+    def _expand_tag_works(self, tag, age_mode):
+        """
+        先获取第1页得到作品总数（第1页结果直接使用），其余分页作为独立的枚举作业提交，
+        同时在途的分页不超过 TAG_PAGE_CONCURRENCY 个，每页结束时接力提交下一页；
+        每页的作品ID去重、过滤后立即送入流水线，不必等待全部分页枚举完成；积压过多时暂停接力。
+        """
+        page_ids, total_count = self._fetch_tag_page(tag, age_mode, 1)
+        if page_ids is None:
+            return
+        if total_count == 0:
+            self.progress_signal.emit(self.item_id, 0, 0, f"【{tag}】关键词没有找到作品。", self.catalog)
+            return
+
+        self.progress_signal.emit(self.item_id, 0, 0, f"【{tag}】关键词总共有【{total_count}】个作品。", self.catalog)
+        self._submit_tag_page_ids(page_ids)
+
+        pages_to_fetch = (total_count + 59) // 60
+        with self.lock:
+            self._tag_pages = iter(range(2, pages_to_fetch + 1))
+        for _ in range(TAG_PAGE_CONCURRENCY):
+            self._submit_next_tag_page(tag, age_mode)
+
+    def _submit_next_tag_page(self, tag, age_mode):
+        with self.lock:
+            if len(self._backlog) >= PIPELINE_BACKLOG_LIMIT and not self.stop_event.is_set():
+                # 下游跟不上时暂停枚举，由 _pump 在积压回落后恢复
+                self._paused_enumeration.append(lambda: self._submit_next_tag_page(tag, age_mode))
+                return
+            page = next(self._tag_pages, None)
+        if page is None or self.stop_event.is_set():
+            return
+        self._submit_expansion(self._fetch_tag_page_job, tag, age_mode, page,
+                               next_step=lambda: self._submit_next_tag_page(tag, age_mode))
+
+    def _fetch_tag_page_job(self, tag, age_mode, page):
+        if self.stop_event.is_set():
+            return
+        self.check_pause()
+        page_ids, _ = self._fetch_tag_page(tag, age_mode, page)
+        if page_ids:
+            self._submit_tag_page_ids(page_ids)
+
+    def _submit_tag_page_ids(self, page_ids):
+        with self.lock:
+            self._enumerated_count += len(page_ids)
+        self._enqueue_works(self._filter_new_works(page_ids))
+
+    def _fetch_tag_page(self, tag, age_mode, page):
+        """获取标签搜索的一页，返回 (作品ID列表, 作品总数)，失败时返回 (None, 0)"""
+        cookie = cookie_manager.get_cookie()
+        headers, proxies = self._get_headers(cookie), self._get_proxies()
+
+        page_response = self._get_response_with_retries(self._tag_search_url(tag, age_mode, page), headers, proxies,
+                                                        timeout=20)
+        if not page_response:
+            self.progress_signal.emit(self.item_id, 0, 0, f"获取【{tag}】第{page}页作品失败，跳过该页。", self.catalog)
+            return None, 0
+
+        try:
+            page_data = page_response.json()
+            if page_data.get('error'):
+                self.progress_signal.emit(self.item_id, 0, 0,
+                                          f"获取【{tag}】第{page}页作品API返回错误: {page_data.get('message', '')}",
+                                          self.catalog)
+                return None, 0
+            illust_manga = page_data.get('body', {}).get('illustManga', {})
+            # 搜索结果中可能夹杂没有ID的广告位
+            page_ids = [illust['id'] for illust in illust_manga.get('data', []) if illust.get('id')]
+            return page_ids, illust_manga.get('total', 0)
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"获取【{tag}】第{page}页作品失败: {e}", self.catalog)
+            return None, 0
+
+    def _max_existing_id(self):
+        numeric_existing_ids = [int(x) for x in self.existing_image_ids if x.isdigit()]
+        return max(numeric_existing_ids) if numeric_existing_ids else None
+
+    def _indexed_ids(self):
+        """下载索引中记录的、已在本用户/标签目录下载过的作品ID（排行榜每个作品单独一个任务，不需要）"""
+        if self._indexed_work_ids is None:
+            self._indexed_work_ids = set() if self.catalog == 'Ranking' else \
+                download_index.work_ids_for(self.catalog, self.item_id)
+        return self._indexed_work_ids
+
+    def _filter_new_works(self, work_ids):
+        """按补全策略过滤作品ID，不输出日志；标签分页枚举时逐页调用"""
+        if self.completion_strategy in ('default', 'incremental'):
+            indexed_ids = self._indexed_ids()
+            if not self.existing_image_ids and not indexed_ids:
+                return list(work_ids)
+            return [work_id for work_id in work_ids
+                    if work_id not in self.existing_image_ids and work_id not in indexed_ids]
+        if not self.existing_image_ids:
+            return list(work_ids)
+        if self.completion_strategy == 'smart':
+            max_existing_id = self._max_existing_id()
+            if max_existing_id is None:
+                return list(work_ids)
+            return [work_id for work_id in work_ids if work_id.isdigit() and int(work_id) > max_existing_id]
+        return list(work_ids)
+
+    def _note_latest_work(self, work_ids):
+        """记录接口返回的最新作品ID并返回，没有数字ID时返回 None"""
+        numeric_ids = [int(work_id) for work_id in work_ids if work_id.isdigit()]
+        if numeric_ids:
+            self._latest_work_id = max(numeric_ids + [self._latest_work_id or 0])
+        return self._latest_work_id
+
+    def _incremental_high_water(self):
+        """增量补全的起点：下载索引记录的高水位与已下载ID中的最大值取较大者，都没有时返回 None"""
+        state = download_index.item_state(self.catalog, self.item_id)
+        marks = [mark for mark in ((state or {}).get('high_water'), self._max_existing_id()) if mark]
+        return max(marks) if marks else None
+
+    def _incremental_candidates(self, top_works, high_water):
+        """
+        根据 profile/top 的结果确定需要检查的作品：最新作品没有超过高水位时返回空列表；
+        每个类别中都有不超过高水位的作品时，新作品一定都在 top 中，直接返回 top 的作品；
+        否则（或没有高水位、请求失败）返回 None，由调用方获取完整作品列表。
+        """
+        if high_water is None or top_works is None:
+            return None
+        top_ids = [work_id for work_ids in top_works.values() for work_id in work_ids]
+        latest_work_id = self._note_latest_work(top_ids)
+        if latest_work_id is None or latest_work_id <= high_water:
+            return []
+        for work_ids in top_works.values():
+            numeric_ids = [int(work_id) for work_id in work_ids if work_id.isdigit()]
+            if numeric_ids and min(numeric_ids) > high_water:
+                return None  # 该类别的新作品可能超出 top 返回的范围
+        return top_ids
+
+    def _apply_incremental_strategy(self, work_ids, high_water, from_top):
+        if high_water is None:
+            filtered_works = self._filter_new_works(work_ids)
+            self.progress_signal.emit(self.item_id, 0, 0,
+                                      f"【增量补全】没有已下载记录，获取完整作品列表，发现 {len(work_ids)} 个作品，"
+                                      f"其中 {len(filtered_works)} 个需要下载。", self.catalog)
+            return filtered_works
+
+        filtered_works = [work_id for work_id in self._filter_new_works(work_ids)
+                          if work_id.isdigit() and int(work_id) > high_water]
+        if self._latest_work_id is not None and self._latest_work_id <= high_water:
+            message = f"【增量补全】最新作品 {self._latest_work_id} 已下载，跳过。"
+        elif from_top:
+            message = f"【增量补全】已下载到 {high_water}，最新作品中发现 {len(filtered_works)} 个新作品。"
+        else:
+            message = f"【增量补全】已下载到 {high_water}，获取完整作品列表，发现 {len(filtered_works)} 个新作品。"
+        self.progress_signal.emit(self.item_id, 0, 0, message, self.catalog)
+        return filtered_works
+
+    def _update_high_water(self):
+        """任务完成后记录本次检查；所有作品都下载成功时把高水位提高到最新作品ID"""
+        if self._latest_work_id is None:
+            return
+        with self.lock:
+            failed = self._failed_works
+        download_index.update_item_state(self.catalog, self.item_id,
+                                         high_water=None if failed else self._latest_work_id,
+                                         latest_id=self._latest_work_id)
+
+    def _apply_completion_strategy(self, all_works_from_api):
+        self._note_latest_work(all_works_from_api)
+        filtered_works = self._filter_new_works(all_works_from_api)
+        if (self.existing_image_ids or self._indexed_ids()) and self.completion_strategy == 'default':
+            self.progress_signal.emit(self.item_id, 0, 0,
+                                      f"【补全下载】默认去重模式，发现 {len(all_works_from_api)} 个作品，其中 {len(filtered_works)} 个是新作品。",
+                                      self.catalog)
+        elif self.existing_image_ids and self.completion_strategy == 'smart':
+            max_existing_id = self._max_existing_id()
+            if max_existing_id is not None:
+                self.progress_signal.emit(self.item_id, 0, 0,
+                                          f"【补全下载】智能补全模式，最大已下载ID: {max_existing_id}，发现 {len(filtered_works)} 个新作品。",
+                                          self.catalog)
+            else:
+                self.progress_signal.emit(self.item_id, 0, 0,
+                                          f"【补全下载】智能补全模式，但无有效数字ID，将下载所有作品。",
+                                          self.catalog)
+        else:
+            self.progress_signal.emit(self.item_id, 0, 0,
+                                      f"【常规下载】发现 {len(all_works_from_api)} 个作品。", self.catalog)
+        return filtered_works
+
+    def _get_work_details(self, work_id):
+        """依次查找恢复的任务日志、本地详情缓存，都未命中时请求接口并写回缓存"""
+        if work_details := self._journaled_details(work_id):
+            return work_details
+        work_details = details_cache.get(work_id)
+        if work_details is None:
+            work_details = self._fetch_work_details(work_id)
+            if work_details:
+                details_cache.put(work_id, work_details)
+        if work_details:
+            task_journal.set_work_details(self.item_id, work_id, work_details)
+        return work_details
+
+    def _journaled_details(self, work_id):
+        if self.restored is None:
+            return None
+        return self.restored['details'].get(str(work_id))
+
+    def _fetch_work_details(self, work_id):
+        cookie = cookie_manager.get_cookie()
+        headers, proxies = self._get_headers(cookie), self._get_proxies()
+
+        # 注意：这里需要确保headers是可变的，以便_get_response_with_retries可以更新cookie
+        # 这里我们直接传递headers，因为它是局部变量，每次调用都会重新创建
+        details_res = self._get_response_with_retries(self._details_url(work_id), headers, proxies, timeout=20)
+        if not details_res:
+            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情获取失败。", self.catalog)
+            return None
+
+        try:
+            details_res_data = details_res.json()
+            pages_data = None
+            if self._needs_pages_request(details_res_data):
+                pages_res = self._get_response_with_retries(self._pages_url(work_id), headers, proxies, timeout=20)
+                if not pages_res:
+                    self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情获取失败。", self.catalog)
+                    return None
+                pages_data = pages_res.json()
+            return self._parse_work_details(work_id, details_res_data, pages_data)
+        except json.JSONDecodeError:
+            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情JSON解析失败。", self.catalog)
+            return None
+
+    def _details_url(self, work_id):
+        return f"https://www.pixiv.net/ajax/illust/{work_id}"
+
+    def _pages_url(self, work_id):
+        return f"https://www.pixiv.net/ajax/illust/{work_id}/pages"
+
+    def _needs_pages_request(self, details_res_data):
+        """
+        单页作品的详情中已经包含 urls.original，无需再请求 /pages。
+        只有多页作品（或详情中缺少原图地址时）才需要第二次请求。
+        """
+        if details_res_data.get('error'):
+            return False
+        work_data = details_res_data.get('body') or {}
+        return not (work_data.get('pageCount') == 1 and (work_data.get('urls') or {}).get('original'))
+
+    def _parse_work_details(self, work_id, details_res_data, pages_data=None):
+        """从详情接口（多页作品还有 /pages 接口）的 JSON 中提取下载所需信息，失败返回 None"""
+        try:
+            if details_res_data.get('error') or (pages_data and pages_data.get('error')):
+                pages_message = pages_data.get('message', '') if pages_data else ''
+                self.progress_signal.emit(self.item_id, 0, 0,
+                                          f"作品 {work_id} API返回错误: {details_res_data.get('message', '')} {pages_message}",
+                                          self.catalog)
+                return None
+            work_data = details_res_data['body']
+            work_data['work_id'] = work_id
+            if pages_data is not None:
+                image_urls = [p['urls']['original'] for p in pages_data['body']]
+            else:
+                image_urls = [work_data['urls']['original']]
+            return {'image_urls': image_urls, 'title': work_data.get('illustTitle', ''),
+                    'comment': work_data.get('illustComment', ''),
+                    'tags': [t['tag'] for t in work_data.get('tags', {}).get('tags', [])],
+                    'create_date': work_data.get('createDate', ''), 'user_name': work_data.get('userName', ''),
+                    'work_id': work_id}
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, 0, 0, f"作品 {work_id} 详情处理未知错误: {e}", self.catalog)
+            return None
+
+    def _download_image(self, image_url, work_id, work_dir):
+        save_path = os.path.join(work_dir, image_url.split('/')[-1])
+        temp_save_path = save_path + ".tmp"  # 临时文件路径，停止或出错时连同 .meta 记录一起保留，下次续传
+
+        # 如果最终文件已存在，则跳过下载
+        if os.path.exists(save_path):
+            return True
+        if self._reuse_indexed_file(work_id, save_path):
+            return True
+
+        cookie = cookie_manager.get_cookie()
+        headers, proxies = self._get_headers(cookie), self._get_proxies()
+        headers['Referer'] = f"https://www.pixiv.net/artworks/{work_id}"
+
+        for attempt in range(1, IMAGE_RESUME_ATTEMPTS + 1):
+            offset, expected_size, etag = self._load_partial(temp_save_path, image_url)
+            if expected_size and offset == expected_size:
+                # 上次已下载完整但未来得及重命名
+                return self._finalize_temp_file(temp_save_path, save_path, expected_size, offset, work_id)
+            self._set_range_headers(headers, offset, etag)
+
+            response = self._get_response_with_retries(image_url, headers, proxies, stream=True, timeout=30)
+            if not response:
+                # _get_response_with_retries 已经处理了重试和错误消息
+                return False
+
+            actual_size = offset
+            try:
+                position = self._resume_position(response.status_code, response.headers, offset)
+                if position is None:
+                    # 416 或 Content-Range 与本地记录不符，丢弃临时文件从头下载
+                    self._discard_partial(temp_save_path)
+                    continue
+                offset, expected_size = position
+                self._save_partial_meta(temp_save_path, image_url, expected_size, response.headers.get('ETag') or etag)
+
+                actual_size = offset  # 实际下载大小（含已续传部分）
+                hasher = hashlib.sha1() if offset == 0 else None  # 续传的文件不计算哈希
+                with open(temp_save_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if self.stop_event.is_set():
+                            return False  # 保留临时文件，下次续传
+                        self.check_pause()  # 检查是否需要暂停
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                        actual_size += len(chunk)  # 累加实际下载大小
+                        byte_counter.add(len(chunk))
+                        if delay := bandwidth_limiter.throttle(self.catalog, len(chunk)):
+                            self.stop_event.wait(delay)  # 超出限速时等待，停止任务时立即返回
+
+                if self._finalize_temp_file(temp_save_path, save_path, expected_size, actual_size, work_id,
+                                            hasher.hexdigest() if hasher else None):
+                    return True
+                if not os.path.exists(temp_save_path):
+                    return False  # 文件已损坏被删除
+
+            except RetryLater:
+                raise  # 暂停：临时文件和续传记录保留，作业恢复后从断点继续
+            except requests.exceptions.RequestException as e:
+                # 传输中断，已写入的部分保留，下一轮从断点继续
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"作品 {work_id}: 图片传输中断: {e}，将从 {actual_size} 字节处续传 ({attempt}/{IMAGE_RESUME_ATTEMPTS})",
+                                          self.catalog)
+            except Exception as e:
+                # 其他未知错误，清理临时文件
+                self._discard_partial(temp_save_path)
+                self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                          f"作品 {work_id}: 图片下载处理错误: {e}", self.catalog)
+                return False
+            finally:
+                response.close()
+        return False
+
+    def _reuse_indexed_file(self, work_id, save_path):
+        """该图片已在其他目录下载过时直接链接过去，返回是否成功"""
+        source = download_index.reuse_file(work_id, self.catalog, self.item_id, save_path)
+        if source is None:
+            return False
+        self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                  f"作品 {work_id}: {os.path.basename(save_path)} 已存在于 {os.path.dirname(source)}，"
+                                  f"直接复用，跳过下载。", self.catalog)
+        return True
+
+    def _partial_meta_path(self, temp_save_path):
+        return temp_save_path + ".meta"
+
+    def _load_partial(self, temp_save_path, image_url):
+        """
+        读取续传记录，返回 (已下载字节数, 文件总大小, ETag)。
+        记录缺失、地址不符或临时文件比记录的总大小还大时，清除残留文件从头下载。
+        """
+        try:
+            with open(self._partial_meta_path(temp_save_path), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            offset, expected_size = os.path.getsize(temp_save_path), int(meta.get('size', 0))
+            if meta.get('url') == image_url and offset > 0 and (not expected_size or offset <= expected_size):
+                return offset, expected_size, meta.get('etag')
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+        self._discard_partial(temp_save_path)
+        return 0, 0, None
+
+    def _save_partial_meta(self, temp_save_path, image_url, expected_size, etag):
+        with open(self._partial_meta_path(temp_save_path), 'w', encoding='utf-8') as f:
+            json.dump({'url': image_url, 'size': expected_size, 'etag': etag}, f)
+
+    def _discard_partial(self, temp_save_path):
+        for path in (temp_save_path, self._partial_meta_path(temp_save_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _set_range_headers(self, headers, offset, etag):
+        """有已下载部分时请求剩余字节；带上 If-Range，文件在服务器端变化时会返回完整内容"""
+        headers.pop('Range', None)
+        headers.pop('If-Range', None)
+        if offset > 0:
+            headers['Range'] = f"bytes={offset}-"
+            if etag:
+                headers['If-Range'] = etag
+
+    def _resume_position(self, status_code, response_headers, offset):
+        """
+        根据响应确定写入起点和文件总大小，返回 (起始偏移, 总大小)；
+        206 且 Content-Range 与本地一致时续写，200 表示服务器忽略了 Range，从头写入；其余情况返回 None。
+        """
+        if status_code == 206:
+            match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response_headers.get('Content-Range', ''))
+            if not match or int(match.group(1)) != offset:
+                return None
+            if match.group(2) != '*':
+                return offset, int(match.group(2))
+            content_length = int(response_headers.get('Content-Length', 0) or 0)
+            return offset, offset + content_length if content_length else 0
+        if status_code == 200:
+            return 0, int(response_headers.get('Content-Length', 0) or 0)
+        return None
+
+    def _finalize_temp_file(self, temp_save_path, save_path, expected_size, actual_size, work_id, sha1=None):
+        """下载到临时文件成功后，进行大小校验，通过则原子重命名为最终文件并登记到下载索引"""
+        if expected_size > 0 and actual_size == expected_size:
+            # 大小匹配，原子性重命名临时文件到最终路径
+            os.rename(temp_save_path, save_path)
+            self._discard_partial(temp_save_path)
+            download_index.record_file(work_id, self.catalog, self.item_id, save_path, actual_size, sha1)
+            return True
+        elif expected_size == 0 and actual_size > 0:
+            # 如果Content-Length未提供，但文件已下载且非空，则认为成功
+            os.rename(temp_save_path, save_path)
+            self._discard_partial(temp_save_path)
+            download_index.record_file(work_id, self.catalog, self.item_id, save_path, actual_size, sha1)
+            return True
+        elif 0 < actual_size < expected_size:
+            # 连接提前结束，保留已下载部分以便续传
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: 图片 {os.path.basename(save_path)} 下载不完整 (已下载: {actual_size}/{expected_size})，保留临时文件以便续传。",
+                                      self.catalog)
+            return False
+        else:
+            # 大小超出预期或文件为空，删除临时文件
+            self._discard_partial(temp_save_path)
+            self.progress_signal.emit(self.item_id, self.completed_works, self.total_works,
+                                      f"作品 {work_id}: 图片 {os.path.basename(save_path)} 下载大小不匹配 (预期: {expected_size}, 实际: {actual_size})。",
+                                      self.catalog)
+            return False  # 标记为失败，让上层逻辑决定是否重试整个作品
+
+    def _get_headers(self, cookie):
+        return build_headers(cookie)
+
+    def _get_proxies(self):
+        return build_proxies(self.config.get('proxy', {}))
+
+    def _sanitize_filename(self, name):
+        sanitized_name = re.sub(r'[<>:"/\\|?*]', '_', name)
+        sanitized_name = sanitized_name.rstrip('.')
+        sanitized_name = ''.join(c for c in sanitized_name if c.isprintable())
+        return sanitized_name.strip()
+
+    def _create_work_directory(self, work_details):
+        path_config = self.config.get('download_path', {})
+        base_download_root = path_config.get('base_path', './downloads')
+
+        uid_option = path_config.get('uid_option', 'UID')
+        pid_option = path_config.get('pid_option', '无')
+
+        current_path = ""
+        if self.catalog == 'User':
+            first_level_folder = ""
+            if uid_option == 'UID':
+                first_level_folder = self._sanitize_filename(self.item_id)
+            else:
+                first_level_folder = self._sanitize_filename(work_details.get('user_name', 'Unknown_Author'))
+            current_path = os.path.join(base_download_root, self.catalog, first_level_folder)
+            self.metadata_folder = current_path
+
+        elif self.catalog == 'Tag':
+            first_level_folder = self._sanitize_filename(self.item_id)
+            current_path = os.path.join(base_download_root, self.catalog, first_level_folder)
+            self.metadata_folder = current_path
+
+        elif self.catalog == 'Ranking':
+            current_path = self.custom_download_path
+            self.metadata_folder = current_path
+
+        if pid_option != '无':
+            second_level_folder = ""
+            if pid_option == 'PID':
+                second_level_folder = self._sanitize_filename(work_details.get('work_id', 'Unknown_PID'))
+            else:
+                second_level_folder = self._sanitize_filename(work_details.get('title', 'Unknown_Title'))
+
+            current_path = os.path.join(current_path, second_level_folder)
+
+        try:
+            os.makedirs(current_path, exist_ok=True)
+        except OSError as e:
+            print(f"Error creating download directory {current_path}: {e}")
+            self.progress_signal.emit(self.item_id, 0, 0, f"创建目录失败: {e}", self.catalog)
+            return None
+
+        return current_path
+
+    def _metadata_path(self):
+        """用户/标签为目录下的 <ID>.json；排行榜使用指定的文件，旧版本按作品拆分的排行榜任务没有元数据文件"""
+        if self.metadata_file or self.catalog == 'Ranking':
+            return self.metadata_file
+        return os.path.join(self.metadata_folder, f"{self.item_id}.json") if self.metadata_folder else None
+
+    def _save_metadata_file(self):
+        all_downloaded_ids = self.original_existing_image_ids.union(self.downloaded_work_ids, self._indexed_ids())
+
+        if not all_downloaded_ids and self.item_type == 'user':
+            self.progress_signal.emit(self.item_id, self.total_works, self.total_works,
+                                      f"【{self.item_id}】元数据保存跳过: 没有新的或已存在的作品ID。", self.catalog)
+            return
+
+        metadata_path = self._metadata_path()
+        if not metadata_path:
+            return
+
+        if self.catalog == 'Ranking':
+            meta = {
+                "ranking_type": self.ranking_type_name,
+                "ranking_date": self.ranking_date_str,
+                "download_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "base_path": os.path.abspath(self.custom_download_path),
+                "pid_option": self.config.get('download_path', {}).get('pid_option', '无')
+            }
+        else:
+            meta = {
+                "download_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "base_path": os.path.abspath(self.config.get('download_path', {}).get('base_path', './downloads')),
+                "uid_option": self.config.get('download_path', {}).get('uid_option', 'UID'),
+                "pid_option": self.config.get('download_path', {}).get('pid_option', '无')
+            }
+
+        if self.item_type == 'user':
+            meta["user_name"] = self.entity_name if self.entity_name != "Unknown" else self.item_id
+            meta["user_id"] = self.item_id
+        elif self.item_type == 'tag':
+            meta["tag_name"] = self.item_id
+            meta["tag_id"] = self.item_id
+            meta["age_mode"] = self.age_mode
+
+        try:
+            # 已下载ID写入二进制快照并与下载过程中追加的日志合并，旧的 JSON 数组格式在这里迁移
+            save_metadata(metadata_path, meta, all_downloaded_ids)
+            self.progress_signal.emit(self.item_id, self.total_works, self.total_works,
+                                      f"【{self.item_id}】元数据保存成功", self.catalog)
+        except Exception as e:
+            self.progress_signal.emit(self.item_id, self.total_works, self.total_works,
+                                      f"【{self.item_id}】元数据保存失败: {e}", self.catalog)
+
+    def stop(self):
+        self.resume();
+        self.stop_event.set()
+        with self.lock:
+            pending = list(self._futures)
+        for future in pending:
+            future.cancel()  # 取消仍在排队的作业，正在执行的作业会自行检查 stop_event
+        self.scheduler.cancel_owner(self)  # 退避中的作业不再等待
+        self.image_scheduler.cancel_owner(self)
+        # 没有在途作业时任务在这里结束；结算要写元数据，交给工作线程，不在界面线程的调用栈中执行
+        self.scheduler.submit(self._check_finished)
+
+    def pause(self):
+        self.pause_event.set()
+
+    def resume(self):
+        self.pause_event.clear()
+        self.scheduler.resume_owner(self)
+        self.image_scheduler.resume_owner(self)
+
+    def is_paused(self):
+        return self.pause_event.is_set()
+
+    def check_pause(self):
+        """暂停检查点：任务已暂停时抛出 TaskPaused，由调度器暂存当前作业，不在工作线程中等待"""
+        if self.pause_event.is_set() and not self.stop_event.is_set():
+            raise TaskPaused()
+
+
+class DownloadManager(QObject):
+    # 修改信号签名，增加 catalog 参数
+    task_progress = pyqtSignal(str, int, int, list, str);  # item_id, completed, total, [status, ...], catalog
+    task_finished = pyqtSignal(str, str);  # item_id, catalog
+    task_started = pyqtSignal(str, str)  # item_id, catalog：任务离开等待队列开始下载
+    work_finished = pyqtSignal(str, str, bool, str)  # item_id, work_id, success, catalog：排行榜任务中的单个作品结束
+    speed_updated = pyqtSignal(float)
+    concurrency_changed = pyqtSignal(int)  # 自适应并发调整后的工作线程数
+    _instance, _lock, _initialized = None, threading.Lock(), False
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, parent=None):
+        if self._initialized: return
+        super().__init__(parent)
+        self.config = {}
+        self.speed_timer = None;
+        self.progress_timer = None
+        self._initialized = True
+        self.task_queue = TaskQueue()  # 按优先级排队，按任务ID索引
+        self.active_tasks = {}
+        self._stopping_tasks = set()  # 已停止、在途作业尚未退出的任务，结束后才删除其任务日志
+        self.paused_catalogs = set()  # 整体暂停的类别：已开始的任务暂停，排队的任务暂不开始
+        # 所有任务共享的常驻工作线程池，连接池由 http_client 统一管理：
+        # API 线程池负责枚举和详情请求，图片线程池逐页下载图片，两者互不占用
+        self.scheduler = WorkScheduler(DEFAULT_API_WORKERS, name="PixivApi")
+        self.image_scheduler = WorkScheduler(name="PixivImage")
+        self._adaptive = False
+        config_manager.config_changed.connect(lambda _: self._apply_store_settings())
+
+    def init_timer(self):
+        if self.speed_timer is None:
+            self.speed_timer = QTimer(self);
+            self.speed_timer.timeout.connect(self._calculate_speed);
+            self.speed_timer.start(1000)
+        if self.progress_timer is None:
+            # 各任务的进度消息按固定频率合并为一次更新，避免大量跨线程事件拖慢界面
+            self.progress_timer = QTimer(self)
+            self.progress_timer.timeout.connect(self._flush_progress)
+            self.progress_timer.start(PROGRESS_FLUSH_INTERVAL_MS)
+
+    def load_config(self, config_data):
+        self.config = config_data;
+        cookie_manager.load_cookies(config_data)
+        self._apply_thread_count()
+        self._apply_bandwidth_limit()
+        self._apply_store_settings()
+
+    def _apply_store_settings(self):
+        """把 [details_cache]、[download_index] 配置段交给对应模块解析一次，查询时不再读取配置；加载配置和配置保存后调用"""
+        details_cache.configure(self.config.get('details_cache', {}))
+        download_index.configure(self.config.get('download_index', {}))
+
+    def _apply_bandwidth_limit(self):
+        """
+        按配置设置全局限速 bandwidth_limit（KB/s，0 为不限速），以及 [bandwidth] 段中的类别权重
+        user_weight/tag_weight/ranking_weight（未配置该段时只限制总速度）。每秒调用一次，设置页修改后立即生效。
+        """
+        try:
+            rate = max(0, int(self.config.get('bandwidth_limit', 0))) * 1024
+        except (TypeError, ValueError):
+            rate = 0
+        section = self.config.get('bandwidth', {})
+        weights = {}
+        if section:
+            for catalog in ('User', 'Tag', 'Ranking'):
+                try:
+                    weights[catalog] = float(section.get(f'{catalog.lower()}_weight', 1))
+                except (TypeError, ValueError):
+                    weights[catalog] = 1.0
+        bandwidth_limiter.configure(rate, weights)
+
+    def is_adaptive_concurrency(self):
+        return str(self.config.get('adaptive_concurrency', 'False')) == 'True'
+
+    def _apply_thread_count(self):
+        """按配置的线程数调整图片线程数和连接池大小；开启自适应并发时以配置值为起点，由控制器接管"""
+        thread_count = int(self.config.get('thread_count', 5))
+        adaptive = self.is_adaptive_concurrency()
+        if adaptive:
+            max_limit = int(self.config.get('adaptive_max_threads', DEFAULT_MAX_CONCURRENCY))
+            if not self._adaptive:
+                concurrency_controller.reset(thread_count, 1, max_limit)
+            else:
+                concurrency_controller.set_bounds(1, max_limit)
+            thread_count = concurrency_controller.limit
+        self._adaptive = adaptive
+        self._set_worker_count(thread_count)
+
+    def _set_worker_count(self, count):
+        api_workers = int(self.config.get('api_thread_count', DEFAULT_API_WORKERS))
+        self.scheduler.set_max_workers(api_workers)
+        self.image_scheduler.set_max_workers(count)
+        http_client.set_pool_size(max(count, api_workers))
+
+    def get_thread_count_text(self):
+        """状态栏显示的线程数"""
+        if self.is_adaptive_concurrency():
+            return f"{self.image_scheduler.get_max_workers()} (自适应)"
+        return str(self.config.get('thread_count', 'N/A'))
+
+    def restore_tasks(self):
+        """启动时恢复上次退出或崩溃时未完成的任务，返回恢复的任务数"""
+        restored_tasks = [task_data for task_data in task_journal.load_unfinished()
+                          if not self.is_task_queued_or_active(task_data['item_id'])]
+        for task_data in restored_tasks:
+            self.task_queue.push(task_data, task_data.get('priority', PRIORITY_NORMAL))
+        if restored_tasks:
+            self._start_next_task()
+        return len(restored_tasks)
+
+    def add_task(self, item_id, catalog, item_type='user', age_mode='all', existing_image_ids=None,
+                 completion_strategy='default', custom_path=None, ranking_type_name=None, ranking_date_str=None,
+                 work_ids=None, metadata_file=None, priority=PRIORITY_NORMAL):
+        """
+        加入下载队列；priority 较高（数值较小）的任务先于已排队的低优先级任务开始。
+        work_ids 为排行榜的作品ID列表，整个排行榜作为一个任务下载，已下载的作品ID记录到 metadata_file。
+        """
+        return bool(self.add_tasks([dict(item_id=item_id, catalog=catalog, item_type=item_type, age_mode=age_mode,
+                                         existing_image_ids=existing_image_ids,
+                                         completion_strategy=completion_strategy, custom_path=custom_path,
+                                         ranking_type_name=ranking_type_name, ranking_date_str=ranking_date_str,
+                                         work_ids=work_ids, metadata_file=metadata_file, priority=priority)]))
+
+    def add_tasks(self, tasks):
+        """
+        批量加入下载队列，tasks 为 add_task 参数组成的 dict 列表（省略的参数取默认值）。
+        任务日志在一个事务中写入，调度只触发一次；返回实际加入的任务ID列表（跳过已在队列或下载中的任务）。
+        """
+        tasks_data = []
+        for task in tasks:
+            task_data = self._build_task_data(**task)
+            if self.is_task_queued_or_active(task_data['item_id']) or \
+                    not self.task_queue.push(task_data, task_data['priority']):
+                continue
+            tasks_data.append(task_data)
+        if tasks_data:
+            task_journal.add_tasks(tasks_data)
+            self._start_next_task()
+        return [task_data['item_id'] for task_data in tasks_data]
+
+    def _build_task_data(self, item_id, catalog, item_type='user', age_mode='all', existing_image_ids=None,
+                         completion_strategy='default', custom_path=None, ranking_type_name=None,
+                         ranking_date_str=None, work_ids=None, metadata_file=None, priority=PRIORITY_NORMAL):
+        return {
+            'item_id': item_id,
+            'catalog': catalog,
+            'item_type': item_type,
+            'age_mode': age_mode,
+            'existing_image_ids': existing_image_ids,
+            'completion_strategy': completion_strategy,
+            'custom_path': custom_path,
+            'ranking_type_name': ranking_type_name,
+            'ranking_date_str': ranking_date_str,
+            'work_ids': work_ids,
+            'metadata_file': metadata_file,
+            'priority': priority
+        }
+
+    def _start_next_task(self):
+        self._apply_thread_count()
+        max_threads = int(self.config.get('thread_count', 5))
+        # 已暂停的任务（单独暂停或整类暂停）不占用名额，作业暂存在调度器中，不占工作线程
+        running = sum(1 for task in self.active_tasks.values()
+                      if not task.is_paused() and task.catalog not in self.paused_catalogs)
+        while running < max_threads:
+            task_data = self.task_queue.pop(self.paused_catalogs)
+            if task_data is None:
+                break
+            item_id = task_data['item_id']
+
+            task = self._get_task_class()(
+                item_id=item_id,
+                config=self.config,
+                catalog=task_data['catalog'],
+                scheduler=self.scheduler,
+                image_scheduler=self.image_scheduler,
+                item_type=task_data['item_type'],
+                age_mode=task_data['age_mode'],
+                existing_image_ids=task_data['existing_image_ids'],
+                completion_strategy=task_data['completion_strategy'],
+                custom_path=task_data['custom_path'],
+                ranking_type_name=task_data['ranking_type_name'],
+                ranking_date_str=task_data['ranking_date_str'],
+                work_ids=task_data.get('work_ids'),
+                metadata_file=task_data.get('metadata_file'),
+                restored=task_data.get('restored')
+            )
+            task.finished_signal.connect(self._on_task_finished)
+            task.work_finished.connect(self.work_finished)
+            self.active_tasks[item_id] = task
+            task.start()
+            running += 1
+            self.task_started.emit(item_id, task_data['catalog'])
+
+    def _get_task_class(self):
+        """根据配置选择下载引擎：线程池（默认）或 asyncio 异步引擎"""
+        if self.config.get('download_engine', 'thread') == 'async':
+            from .async_engine import AsyncDownloadTask, HTTPX_AVAILABLE
+            if HTTPX_AVAILABLE:
+                return AsyncDownloadTask
+        return DownloadTask
+
+    def _flush_progress(self):
+        for task in list(self.active_tasks.values()):
+            self._flush_task_progress(task)
+
+    def _flush_task_progress(self, task):
+        """把任务缓存的进度消息合并为一次 task_progress 发出（在 GUI 线程中调用）"""
+        batch = task.progress_signal.drain()
+        if batch:
+            completed, total, messages = batch
+            self.task_progress.emit(task.item_id, completed, total, messages, task.catalog)
+
+    def _on_task_finished(self, item_id, catalog):  # 接收 catalog 参数
+        task = self.sender()
+        if task in self._stopping_tasks:
+            # 被停止的任务在途作业都已退出，此时删除任务日志不会再被作业写回；同ID的新任务已加入时保留
+            self._stopping_tasks.discard(task)
+            if not self.is_task_queued_or_active(item_id):
+                task_journal.remove_task(item_id)
+            return
+        if self.active_tasks.get(item_id) is task:
+            self._flush_task_progress(self.active_tasks.pop(item_id))  # 结束前的最后几条消息
+            task_journal.remove_task(item_id)
+            self.task_finished.emit(item_id, catalog)  # 传递 catalog
+            self._start_next_task()
+
+    def _calculate_speed(self):
+        self.speed_updated.emit(byte_counter.take())
+        self._apply_bandwidth_limit()
+        if self.is_adaptive_concurrency() != self._adaptive:
+            self._apply_thread_count()  # 设置页切换了并发模式
+            self.concurrency_changed.emit(self.image_scheduler.get_max_workers())
+        if self._adaptive:
+            limit = concurrency_controller.tick()
+            if limit != self.image_scheduler.get_max_workers():
+                self._set_worker_count(limit)
+                self.concurrency_changed.emit(limit)
+
+    def is_task_queued_or_active(self, item_id):
+        return item_id in self.active_tasks or item_id in self.task_queue
+
+    def has_tasks(self):
+        return bool(self.active_tasks) or bool(self.task_queue)
+
+    def pause_download(self, item_id):
+        if item_id in self.active_tasks:
+            self.active_tasks[item_id].pause()
+            self._start_next_task()  # 空出的名额交给排队中的任务
+
+    def resume_download(self, item_id):
+        if item_id in self.active_tasks:
+            self.active_tasks[item_id].resume()
+
+    def stop_download(self, item_id):
+        # 先移出 active_tasks 再停止：任务可能在 stop() 中结束，_on_task_finished 随之忽略它
+        task = self.active_tasks.pop(item_id, None)
+        if task:
+            self._stopping_tasks.add(task)  # 任务日志在任务结束时删除
+            task.stop()
+            self._flush_task_progress(task)
+        else:
+            self.task_queue.remove(item_id)
+            task_journal.remove_task(item_id)
+        self._start_next_task()
+
+    def skip_works(self, item_id, work_ids):
+        """
+        从排行榜任务中去掉部分作品：排队中的任务直接改写作品列表，
+        已开始的任务只去掉尚未获取详情的作品，已在下载的作品照常完成。
+        """
+        task_data = self.task_queue.get(item_id)
+        if task_data is not None and task_data.get('work_ids'):
+            skipped = set(work_ids)
+            task_data['work_ids'] = [work_id for work_id in task_data['work_ids'] if work_id not in skipped]
+            task_journal.update_params(task_data)
+        elif item_id in self.active_tasks:
+            self.active_tasks[item_id].skip_works(work_ids)
+
+    def has_ranking_tasks(self):
+        return self.task_queue.count('Ranking') > 0 or \
+            any(task.catalog == 'Ranking' for task in self.active_tasks.values())
+
+    def pause_catalog(self, catalog):
+        """暂停某一类别的全部任务，恢复前该类别排队中的任务不会开始"""
+        self.paused_catalogs.add(catalog)
+        for task in self.active_tasks.values():
+            if task.catalog == catalog:
+                task.pause()
+        self._start_next_task()  # 空出的名额交给其他类别
+
+    def resume_catalog(self, catalog):
+        self.paused_catalogs.discard(catalog)
+        for task in self.active_tasks.values():
+            if task.catalog == catalog:
+                task.resume()
+        self._start_next_task()
+
+    def stop_catalog(self, catalog):
+        """停止某一类别的全部任务（包括排队中的），返回被停止的任务ID列表"""
+        items_to_stop = [item_id for item_id, task in self.active_tasks.items() if task.catalog == catalog]
+        for item_id in items_to_stop:
+            task = self.active_tasks.pop(item_id)
+            self._stopping_tasks.add(task)  # 任务日志在任务结束时删除
+            task.stop()
+            self._flush_task_progress(task)
+        for task_data in self.task_queue.remove_catalog(catalog):
+            items_to_stop.append(task_data['item_id'])
+            task_journal.remove_task(task_data['item_id'])
+        self.paused_catalogs.discard(catalog)
+        self._start_next_task()
+        return items_to_stop
+
+    def pause_all_ranking_downloads(self):
+        self.pause_catalog('Ranking')
+
+    def resume_all_ranking_downloads(self):
+        self.resume_catalog('Ranking')
+
+    def stop_all_ranking_downloads(self):
+        self.stop_catalog('Ranking')
+
+
+download_manager = DownloadManager()
@@ -0,0 +1,318 @@
+# app/download_index.py
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+
+from .config_manager import get_config
+
+try:
+    import fcntl  # reflink（FICLONE）只在 Linux 上可用
+except ImportError:
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 索引数据库放在软件目录下，与 config.ini 同级
+INDEX_DB_PATH = os.path.join(BASE_DIR, '../download_index.db')
+
+LINK_MODES = ('hardlink', 'reflink', 'copy', 'off')
+DEFAULT_LINK_MODE = 'hardlink'
+FICLONE = 0x40049409  # linux/fs.h
+
+
+class DownloadIndex:
+    """
+    全局下载索引（SQLite）：记录 User/Tag/Ranking 各目录中下载过的每个作品和图片文件。
+    item_works 表记录每个用户/标签目录中下载完整的作品，
+    files 表保存每个图片文件的路径、大小和 SHA-1（续传的文件没有哈希），
+    item_state 表保存每个用户的高水位（该ID及更早的作品都已下载）、最新作品ID和上次检查时间，供增量补全使用；
+    scan_cache 表保存补全下载扫描目录的结果（按目录修改时间失效），供 file_scan 使用。
+    同一作品出现在另一个用户/标签/排行榜目录时，图片直接从已有文件硬链接（或 reflink/复制）过去，不再重新下载。
+    配置项位于 config.ini 的 [download_index] 段：enabled、link_mode（hardlink/reflink/copy/off）。
+    """
+    _instance, _lock = None, threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path=INDEX_DB_PATH):
+        if hasattr(self, '_initialized'): return
+        self.db_path = db_path
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._config = None  # (enabled, link_mode)，由 configure() 设置
+        self.reused_files = 0
+        self.reused_bytes = 0
+        self._initialized = True
+
+    def _get_conn(self):
+        """延迟打开数据库，打开失败时返回 None，索引自动失效但不影响下载"""
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS item_works (
+                                    catalog TEXT NOT NULL,
+                                    item_id TEXT NOT NULL,
+                                    work_id TEXT NOT NULL,
+                                    PRIMARY KEY (catalog, item_id, work_id))""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS files (
+                                    path TEXT PRIMARY KEY,
+                                    work_id TEXT NOT NULL,
+                                    file_name TEXT NOT NULL,
+                                    catalog TEXT NOT NULL,
+                                    item_id TEXT NOT NULL,
+                                    size INTEGER NOT NULL,
+                                    sha1 TEXT,
+                                    added_at REAL NOT NULL)""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS item_state (
+                                    catalog TEXT NOT NULL,
+                                    item_id TEXT NOT NULL,
+                                    high_water INTEGER,
+                                    latest_id INTEGER,
+                                    last_check REAL NOT NULL,
+                                    PRIMARY KEY (catalog, item_id))""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS scan_cache (
+                                    path TEXT PRIMARY KEY,
+                                    mtime_ns INTEGER NOT NULL,
+                                    image_ids TEXT NOT NULL,
+                                    subdirs TEXT NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_files_work ON files(work_id, file_name)")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"警告: 无法打开下载索引数据库 {self.db_path}: {e}")
+                self._conn = False
+        return self._conn or None
+
+    def configure(self, section):
+        """解析 [download_index] 段并缓存结果，由 DownloadManager 在加载配置和配置保存后调用"""
+        enabled = str(section.get('enabled', 'True')).lower() not in ('false', '0', 'no')
+        link_mode = str(section.get('link_mode', DEFAULT_LINK_MODE)).lower()
+        self._config = (enabled, link_mode if link_mode in LINK_MODES else DEFAULT_LINK_MODE)
+
+    def _settings(self):
+        if self._config is None:  # 未经 DownloadManager 配置时（如单独使用）读取一次全局配置
+            self.configure(get_config().get('download_index', {}))
+        return self._config
+
+    def work_ids_for(self, catalog, item_id):
+        """返回在该用户/标签目录中下载完整的作品ID集合"""
+        if not self._settings()[0]:
+            return set()
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return set()
+            try:
+                return {row[0] for row in conn.execute(
+                    "SELECT work_id FROM item_works WHERE catalog = ? AND item_id = ?", (catalog, str(item_id)))}
+            except sqlite3.Error as e:
+                print(f"读取下载索引失败 ({catalog} {item_id}): {e}")
+                return set()
+
+    def item_state(self, catalog, item_id):
+        """返回 {'high_water', 'latest_id', 'last_check'}，没有记录时返回 None"""
+        if not self._settings()[0]:
+            return None
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT high_water, latest_id, last_check FROM item_state "
+                                   "WHERE catalog = ? AND item_id = ?", (catalog, str(item_id))).fetchone()
+            except sqlite3.Error as e:
+                print(f"读取下载索引失败 ({catalog} {item_id}): {e}")
+                return None
+        if row is None:
+            return None
+        return {'high_water': row[0], 'latest_id': row[1], 'last_check': row[2]}
+
+    def update_item_state(self, catalog, item_id, high_water=None, latest_id=None):
+        """记录一次检查；high_water 只会升高，为 None 时保持原值"""
+        if not self._settings()[0]:
+            return
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    row = conn.execute("SELECT high_water, latest_id FROM item_state WHERE catalog = ? AND item_id = ?",
+                                       (catalog, str(item_id))).fetchone()
+                    old_high_water, old_latest_id = row if row else (None, None)
+                    if high_water is None or (old_high_water is not None and old_high_water > high_water):
+                        high_water = old_high_water
+                    conn.execute("INSERT OR REPLACE INTO item_state (catalog, item_id, high_water, latest_id, "
+                                 "last_check) VALUES (?, ?, ?, ?, ?)",
+                                 (catalog, str(item_id), high_water,
+                                  latest_id if latest_id is not None else old_latest_id, time.time()))
+            except sqlite3.Error as e:
+                print(f"写入下载索引失败 ({catalog} {item_id}): {e}")
+
+    def load_scan_cache(self):
+        """返回 {目录: (修改时间ns, [作品ID], [子目录名])}"""
+        if not self._settings()[0]:
+            return {}
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return {}
+            try:
+                return {path: (mtime_ns, image_ids.split(), json.loads(subdirs))
+                        for path, mtime_ns, image_ids, subdirs in
+                        conn.execute("SELECT path, mtime_ns, image_ids, subdirs FROM scan_cache")}
+            except (sqlite3.Error, ValueError) as e:
+                print(f"读取目录扫描缓存失败: {e}")
+                return {}
+
+    def save_scan_cache(self, updates, removed=()):
+        """写入重新扫描过的目录 {目录: (修改时间ns, [作品ID], [子目录名])}，删除已不存在的目录"""
+        if not self._settings()[0] or not (updates or removed):
+            return
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO scan_cache (path, mtime_ns, image_ids, subdirs) "
+                                     "VALUES (?, ?, ?, ?)",
+                                     [(path, mtime_ns, ' '.join(image_ids), json.dumps(subdirs, ensure_ascii=False))
+                                      for path, (mtime_ns, image_ids, subdirs) in updates.items()])
+                    conn.executemany("DELETE FROM scan_cache WHERE path = ?", [(path,) for path in removed])
+            except sqlite3.Error as e:
+                print(f"写入目录扫描缓存失败: {e}")
+
+    def record_work(self, work_id, catalog, item_id):
+        """作品的所有图片都下载完成后登记"""
+        if not self._settings()[0]:
+            return
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    conn.execute("INSERT OR IGNORE INTO item_works (catalog, item_id, work_id) VALUES (?, ?, ?)",
+                                 (catalog, str(item_id), str(work_id)))
+            except sqlite3.Error as e:
+                print(f"写入下载索引失败 ({work_id}): {e}")
+
+    def record_file(self, work_id, catalog, item_id, path, size, sha1=None):
+        """图片下载（或链接）完成后登记文件"""
+        if not self._settings()[0]:
+            return
+        now = time.time()
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO files (path, work_id, file_name, catalog, item_id, size, "
+                                 "sha1, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (os.path.abspath(path), str(work_id), os.path.basename(path), catalog,
+                                  str(item_id), int(size), sha1, now))
+            except sqlite3.Error as e:
+                print(f"写入下载索引失败 ({work_id}): {e}")
+
+    def _candidates(self, work_id, file_name):
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return []
+            try:
+                return conn.execute("SELECT path, size, sha1 FROM files WHERE work_id = ? AND file_name = ?",
+                                    (str(work_id), file_name)).fetchall()
+            except sqlite3.Error as e:
+                print(f"读取下载索引失败 ({work_id}): {e}")
+                return []
+
+    def _forget_file(self, path):
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            except sqlite3.Error as e:
+                print(f"写入下载索引失败 ({path}): {e}")
+
+    def reuse_file(self, work_id, catalog, item_id, save_path):
+        """
+        同名图片已在其他目录下载过时，按 link_mode 链接或复制到 save_path，成功返回源文件路径，否则返回 None。
+        源文件已被删除或大小不符的记录会被清除。
+        """
+        enabled, link_mode = self._settings()
+        if not enabled or link_mode == 'off':
+            return None
+        target = os.path.abspath(save_path)
+        for path, size, sha1 in self._candidates(work_id, os.path.basename(save_path)):
+            if path == target:
+                continue
+            try:
+                if os.path.getsize(path) != size:
+                    raise OSError("大小与索引不符")
+            except OSError:
+                self._forget_file(path)
+                continue
+            if self._link(path, target, link_mode):
+                self.record_file(work_id, catalog, item_id, target, size, sha1)
+                with self._db_lock:
+                    self.reused_files += 1
+                    self.reused_bytes += size
+                return path
+        return None
+
+    def _link(self, source, target, link_mode):
+        """先写入临时文件再改名，中途失败不会留下不完整的目标文件"""
+        temp_target = target + ".link"
+        try:
+            if os.path.exists(temp_target):
+                os.remove(temp_target)
+            if link_mode == 'hardlink':
+                try:
+                    os.link(source, temp_target)
+                except OSError:
+                    shutil.copyfile(source, temp_target)  # 跨分区或文件系统不支持硬链接
+            elif link_mode == 'reflink':
+                if not self._reflink(source, temp_target):
+                    shutil.copyfile(source, temp_target)
+            else:
+                shutil.copyfile(source, temp_target)
+            os.replace(temp_target, target)
+            return True
+        except OSError as e:
+            print(f"复用已下载文件失败 ({source} -> {target}): {e}")
+            try:
+                if os.path.exists(temp_target):
+                    os.remove(temp_target)
+            except OSError:
+                pass
+            return False
+
+    def _reflink(self, source, target):
+        if fcntl is None:
+            return False
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            return False
+
+    def format_stats(self):
+        return f"下载索引: 复用已下载文件 {self.reused_files} 个 ({self.reused_bytes / (1024 * 1024):.1f} MB)"
+
+
+download_index = DownloadIndex()
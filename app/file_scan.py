@@ -0,0 +1,95 @@
+# app/file_scan.py
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .download_index import download_index
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+IMAGE_ID_PATTERN = re.compile(r'(\d+)')
+SCAN_WORKERS = 8  # 并行扫描的目录数，扫描主要耗时在磁盘 IO 上
+
+
+class DirectoryScanner:
+    """
+    补全下载时从已下载的图片文件名中提取作品ID。
+    用 os.scandir 遍历目录，多个用户/标签目录由线程池并行扫描；
+    每个子目录的扫描结果按目录修改时间缓存（内存中并持久化到下载索引），
+    目录内没有增删文件时直接使用缓存，再次扫描只读取发生变化的目录。
+    """
+
+    def __init__(self, max_workers=SCAN_WORKERS):
+        self.max_workers = max_workers
+        self._cache = None  # 目录 -> (修改时间ns, [作品ID], [子目录名])
+        self._lock = threading.Lock()
+
+    def _get_cache(self):
+        with self._lock:
+            if self._cache is None:
+                self._cache = download_index.load_scan_cache()
+            return self._cache
+
+    def scan(self, root):
+        """返回 root 下所有图片文件名开头的作品ID集合"""
+        return self.scan_many([root])[root]
+
+    def scan_many(self, roots):
+        """并行扫描多个目录，返回 {目录: 作品ID集合}"""
+        cache = self._get_cache()
+        roots = list(roots)
+        results, updates, visited = {}, {}, set()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(roots)))) as pool:
+            for root, (image_ids, root_updates, root_visited) in zip(
+                    roots, pool.map(lambda root: self._scan_tree(root, cache), roots)):
+                results[root] = image_ids
+                updates.update(root_updates)
+                visited.update(root_visited)
+
+        # 扫描范围内缓存了但这次没有访问到的目录已被删除
+        abs_roots = {os.path.abspath(root) for root in roots}
+        prefixes = tuple(os.path.join(root, '') for root in abs_roots)
+        removed = [path for path in cache
+                   if path not in visited and (path in abs_roots or path.startswith(prefixes))]
+        with self._lock:
+            cache.update(updates)
+            for path in removed:
+                cache.pop(path, None)
+        download_index.save_scan_cache(updates, removed)
+        return results
+
+    def _scan_tree(self, root, cache):
+        """在工作线程中遍历一个目录树，返回 (作品ID集合, 重新扫描的目录, 访问过的目录)"""
+        image_ids, updates, visited = set(), {}, set()
+        stack = [os.path.abspath(root)]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            visited.add(path)
+            cached = cache.get(path)
+            if cached is not None and cached[0] == mtime_ns:
+                dir_ids, subdirs = cached[1], cached[2]
+            else:
+                dir_ids, subdirs = set(), []
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.name)
+                            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                                if match := IMAGE_ID_PATTERN.match(entry.name):
+                                    dir_ids.add(match.group(1))
+                except OSError:
+                    continue
+                dir_ids = sorted(dir_ids)
+                updates[path] = (mtime_ns, dir_ids, subdirs)
+            image_ids.update(dir_ids)
+            stack.extend(os.path.join(path, name) for name in subdirs)
+        return image_ids, updates, visited
+
+
+directory_scanner = DirectoryScanner()
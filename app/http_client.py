@@ -0,0 +1,128 @@
+# app/http_client.py
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+PIXIV_REFERER = "https://www.pixiv.net"
+
+
+def build_headers(cookie=None, referer=PIXIV_REFERER, **extra):
+    """
+    构建访问 Pixiv 的公共请求头。
+    cookie 为 PHPSESSID 的值；extra 中的键值会原样合并进请求头。
+    """
+    headers = {"referer": referer, "user-agent": USER_AGENT}
+    if cookie is not None:
+        headers["cookie"] = f"PHPSESSID={cookie}"
+    headers.update(extra)
+    return headers
+
+
+def build_proxies(proxy_config):
+    """
+    从配置中的 proxy 段构建 requests 使用的代理字典。
+    type: '0' 系统代理, '1' HTTP代理, '2' SOCKS5代理。系统代理返回 None，由 requests 读取环境变量。
+    """
+    if not proxy_config:
+        return None
+    proxy_type = str(proxy_config.get('type', '0'))
+    address, port = proxy_config.get('address', ''), proxy_config.get('port', '')
+    if proxy_type not in ('1', '2') or not address or not str(port).isdigit():
+        return None
+
+    if proxy_type == '2':
+        proxy_value = f"socks5://{address}:{port}"
+    else:
+        if not address.startswith(('http://', 'https://')):
+            address = f"http://{address}"
+        proxy_value = f"{address}:{port}"
+    return {'http': proxy_value, 'https': proxy_value}
+
+
+class HttpClient:
+    """
+    进程内共享的 HTTP 客户端。
+    每种代理配置对应一个长期存在的 Session，Session 内部按主机（www.pixiv.net、i.pximg.net 等）
+    维护 keep-alive 连接池，所有下载、排行榜、头像和元数据请求都应通过这里发出，以复用 TLS 连接。
+    """
+    _instance, _lock = None, threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, '_initialized'): return
+        self._sessions = {}  # 代理地址 -> Session
+        self._sessions_lock = threading.Lock()
+        self._pool_size = 10
+        self._initialized = True
+
+    def set_pool_size(self, pool_size):
+        """调整每个主机的最大连接数，已创建的 Session 会换用新的连接池"""
+        pool_size = max(1, int(pool_size))
+        with self._sessions_lock:
+            if pool_size == self._pool_size:
+                return
+            self._pool_size = pool_size
+            for session in self._sessions.values():
+                self._mount_adapter(session)
+
+    def get_session(self, proxies=None):
+        key = (proxies or {}).get('https', '')
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                # 请求头中显式携带账号 Cookie，禁止 Session 自行保存响应 Cookie，避免多账号之间串号
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                self._mount_adapter(session)
+                self._sessions[key] = session
+            return session
+
+    def _mount_adapter(self, session):
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self._pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def get(self, url, headers=None, proxies=None, **kwargs):
+        return self.get_session(proxies).get(url, headers=headers, proxies=proxies, **kwargs)
+
+    def get_stats(self):
+        """
+        连接复用统计，按主机汇总。
+        返回: dict: {host: {'requests': 请求数, 'connections': 新建连接数}}
+        """
+        stats = {}
+        with self._sessions_lock:
+            adapters = {id(a): a for s in self._sessions.values() for a in s.adapters.values()}
+        for adapter in adapters.values():
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            for manager in managers:
+                for key in list(manager.pools.keys()):
+                    pool = manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    host_stats = stats.setdefault(pool.host, {'requests': 0, 'connections': 0})
+                    host_stats['requests'] += pool.num_requests
+                    host_stats['connections'] += pool.num_connections
+        return stats
+
+    def format_stats(self):
+        stats = self.get_stats()
+        if not stats:
+            return "连接复用: 暂无请求"
+        parts = []
+        for host, s in stats.items():
+            reused = max(0, s['requests'] - s['connections'])
+            parts.append(f"{host} 请求 {s['requests']} 次/新建连接 {s['connections']} 个/复用 {reused} 次")
+        return "连接复用: " + "；".join(parts)
+
+
+http_client = HttpClient()
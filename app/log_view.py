@@ -0,0 +1,158 @@
+# app/log_view.py
+
+import os
+import queue
+import atexit
+import logging
+import logging.handlers
+import datetime
+import threading
+import collections
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import QApplication, QAbstractItemView
+from qfluentwidgets import ListView
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 日志文件放在软件目录下的 logs 文件夹，与 config.ini 同级
+LOG_DIR = os.path.join(BASE_DIR, '../logs')
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024  # 单个日志文件大小上限，超出后轮转
+LOG_FILE_BACKUPS = 3  # 保留的历史日志文件数
+MAX_LOG_LINES = 5000  # 界面中保留的日志行数，超出后丢弃最早的行
+
+_file_logger = None
+_file_logger_lock = threading.Lock()
+
+
+def get_file_logger():
+    """
+    返回写入 logs/pixivtool.log 的 logger，按大小轮转，由后台线程写盘不阻塞界面。
+    无法创建日志文件时返回 None，只影响文件日志。
+    """
+    global _file_logger
+    with _file_logger_lock:
+        if _file_logger is None:
+            try:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(os.path.join(LOG_DIR, 'pixivtool.log'),
+                                                               maxBytes=LOG_FILE_MAX_BYTES,
+                                                               backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                log_queue = queue.SimpleQueue()
+                listener = logging.handlers.QueueListener(log_queue, handler)
+                listener.start()
+                atexit.register(listener.stop)  # 退出前写完队列中的日志
+
+                logger = logging.getLogger('PixivTool')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(logging.handlers.QueueHandler(log_queue))
+                _file_logger = logger
+            except OSError as e:
+                print(f"警告: 无法创建日志文件 {LOG_DIR}: {e}")
+                _file_logger = False
+        return _file_logger or None
+
+
+class LogModel(QAbstractListModel):
+    """
+    日志行的环形缓冲区：最多保留 max_lines 行，超出后丢弃最早的行；
+    与上一行相同的消息合并为一行并显示重复次数。每条消息同时写入轮转的日志文件。
+    """
+
+    def __init__(self, name='PixivTool', max_lines=MAX_LOG_LINES, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self._rows = collections.deque()  # [时间, 消息, 重复次数]
+        self._max_lines = max_lines
+        self._file_logger = get_file_logger()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid() and index.row() < len(self._rows):
+            return self.line(index.row())
+        return None
+
+    def line(self, row):
+        timestamp, message, count = self._rows[row]
+        return f"[{timestamp}] {message}" + (f" (×{count})" if count > 1 else "")
+
+    def append_messages(self, messages):
+        """追加一批消息，只发出一次插入通知"""
+        timestamp = datetime.datetime.now().strftime('%H:%M:%S')
+        new_rows, last_changed = [], False
+        for message in messages:
+            if self._file_logger:
+                self._file_logger.info(f"[{self.name}] {message}")
+            last = new_rows[-1] if new_rows else (self._rows[-1] if self._rows else None)
+            if last is not None and last[1] == message:
+                last[0] = timestamp
+                last[2] += 1
+                last_changed = last_changed or not new_rows
+                continue
+            new_rows.append([timestamp, message, 1])
+
+        if last_changed:
+            index = self.index(len(self._rows) - 1)
+            self.dataChanged.emit(index, index)
+        if not new_rows:
+            return
+        new_rows = new_rows[-self._max_lines:]
+        overflow = len(self._rows) + len(new_rows) - self._max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._rows.popleft()
+            self.endRemoveRows()
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+        self._rows.extend(new_rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows.clear()
+        self.endResetModel()
+
+
+class LogView(ListView):
+    """
+    日志视图：只绘制可见的行，日志再多界面开销也只与可见行数有关。
+    已滚动到底部时新日志到达后保持跟随，向上翻看时不打断。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.log_model = LogModel(parent=self)
+        self.setModel(self.log_model)
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+
+    def set_log_name(self, name):
+        """写入日志文件时的来源标记"""
+        self.log_model.name = name
+
+    def append_messages(self, messages):
+        scroll_bar = self.verticalScrollBar()
+        follow = scroll_bar.value() >= scroll_bar.maximum()
+        self.log_model.append_messages(messages)
+        if follow:
+            self.scrollToBottom()
+
+    def copy(self):
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        if rows:
+            QApplication.clipboard().setText("\n".join(self.log_model.line(row) for row in rows))
+
+    def clear(self):
+        self.log_model.clear()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            self.copy()
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,202 @@
+# app/metadata_store.py
+
+import os
+import json
+import threading
+
+# 已下载作品ID的二进制格式：文件头 + 作品数 + 排序后相邻ID之差（LEB128 变长整数）。
+# 作品ID递增且较密集，差值多数只占 2~3 个字节，两万个作品的列表只有几十 KB，
+# 而缩进的 JSON 数组每个ID要占一行。
+IDS_MAGIC = b'PXID'
+IDS_VERSION = 1
+IDS_SUFFIX = '.ids'
+JOURNAL_SUFFIX = '.ids.journal'  # 下载成功一个作品追加一个ID，保存快照后删除
+
+_journal_locks = {}  # 元数据文件 -> 锁：追加日志与保存快照互斥，保存期间追加的ID不会随日志一起被删除
+_journal_locks_guard = threading.Lock()
+
+
+def _journal_lock(json_path):
+    key = os.path.normcase(os.path.abspath(json_path))
+    with _journal_locks_guard:
+        return _journal_locks.setdefault(key, threading.Lock())
+
+
+def ids_path_for(json_path):
+    return os.path.splitext(json_path)[0] + IDS_SUFFIX
+
+
+def journal_path_for(json_path):
+    return os.path.splitext(json_path)[0] + JOURNAL_SUFFIX
+
+
+def metadata_exists(json_path):
+    """JSON、二进制快照、追加日志任一存在即可读出已下载的作品ID"""
+    return any(os.path.exists(path) for path in (json_path, ids_path_for(json_path), journal_path_for(json_path)))
+
+
+def metadata_paths_in(folder):
+    """目录中各元数据对应的 JSON 路径（按文件名去重），只剩快照或追加日志的也包括在内；目录不可读时抛出 OSError"""
+    json_paths = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            for suffix in ('.json', IDS_SUFFIX, JOURNAL_SUFFIX):
+                if entry.name.endswith(suffix):
+                    stem = entry.name[:-len(suffix)]
+                    json_paths.setdefault(stem, os.path.join(folder, stem + '.json'))
+                    break
+    return list(json_paths.values())
+
+
+def _encode_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varints(data, pos=0):
+    """依次解码 data[pos:] 中的变长整数，末尾不完整的整数（写入时中断）被忽略"""
+    values, value, shift = [], 0, 0
+    for byte in data[pos:]:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value, shift = 0, 0
+    return values
+
+
+def encode_ids(numeric_ids):
+    """把一组整数作品ID编码为排序后的差分变长整数数组"""
+    out = bytearray(IDS_MAGIC)
+    out.append(IDS_VERSION)
+    sorted_ids = sorted(set(numeric_ids))
+    _encode_varint(len(sorted_ids), out)
+    previous = 0
+    for work_id in sorted_ids:
+        _encode_varint(work_id - previous, out)
+        previous = work_id
+    return bytes(out)
+
+
+def decode_ids(data):
+    """encode_ids 的逆过程，返回排序后的整数列表；格式不对或数据不完整时抛出 ValueError"""
+    if data[:len(IDS_MAGIC)] != IDS_MAGIC or len(data) <= len(IDS_MAGIC):
+        raise ValueError("不是作品ID文件")
+    if data[len(IDS_MAGIC)] != IDS_VERSION:
+        raise ValueError(f"不支持的作品ID文件版本: {data[len(IDS_MAGIC)]}")
+    values = _decode_varints(data, len(IDS_MAGIC) + 1)
+    if not values or len(values) - 1 != values[0]:
+        raise ValueError("作品ID文件不完整")
+    work_ids, current = [], 0
+    for delta in values[1:]:
+        current += delta
+        work_ids.append(current)
+    return work_ids
+
+
+def _atomic_write(path, data):
+    """先写临时文件并落盘，再原子替换，写入中途崩溃不会留下半个文件"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _read_ids(json_path):
+    """读取二进制快照和追加日志中的作品ID（字符串集合），快照损坏时抛出 ValueError"""
+    work_ids = set()
+    try:
+        with open(ids_path_for(json_path), 'rb') as f:
+            work_ids.update(map(str, decode_ids(f.read())))
+    except FileNotFoundError:
+        pass
+    try:
+        with open(journal_path_for(json_path), 'rb') as f:
+            work_ids.update(map(str, _decode_varints(f.read())))
+    except FileNotFoundError:
+        pass
+    return work_ids
+
+
+def sort_ids(work_ids):
+    """数字ID按数值排序，其余（不应出现）排在后面"""
+    numeric = sorted((x for x in work_ids if x.isdigit()), key=int)
+    return numeric + sorted(x for x in work_ids if not x.isdigit())
+
+
+def load_metadata(json_path):
+    """
+    读取元数据，返回 (元数据, 错误信息)。元数据中的 image_id 由 JSON 中的列表（旧格式）、
+    二进制快照和追加日志合并而成，调用方不需要区分文件是哪种格式。
+    JSON 不存在（任务在第一次保存元数据前中断）时从快照和追加日志恢复作品ID，描述信息为空。
+    """
+    missing = None
+    try:
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError as e:
+            meta, missing = {}, e
+        work_ids = {str(x) for x in meta.get('image_id', [])}
+        work_ids.update(_read_ids(json_path))
+    except Exception as e:
+        return None, f"错误: 读取配置文件 {json_path} 失败: {e}"
+    if missing is not None and not work_ids:
+        return None, f"错误: 读取配置文件 {json_path} 失败: {missing}"
+    meta['image_id'] = sort_ids(work_ids)
+    meta['quantity'] = len(meta['image_id'])
+    return meta, None
+
+
+def save_metadata(json_path, meta, work_ids):
+    """
+    保存元数据：作品ID与磁盘上已有的快照、追加日志合并后写入二进制快照，
+    JSON 中只保留描述信息，两者都原子替换，最后删除已并入快照的追加日志。
+    从读取追加日志到删除日志期间持有该文件的锁，其他线程此时追加的ID等保存完成后写入新的日志。
+    旧格式的 JSON（带 image_id 数组）在这里被改写为新格式。返回保存的作品数。
+    """
+    all_ids = {str(x) for x in work_ids}
+    meta = dict(meta)
+    meta.pop('image_id', None)
+    meta['image_id_file'] = os.path.basename(ids_path_for(json_path))
+
+    with _journal_lock(json_path):
+        existing, _ = load_metadata(json_path)
+        if existing:
+            all_ids.update(existing['image_id'])  # 文件不存在或快照损坏时以本次的ID重写
+        numeric_ids = [int(x) for x in all_ids if x.isdigit()]
+        other_ids = sort_ids(x for x in all_ids if not x.isdigit())
+        meta['quantity'] = len(all_ids)
+        if other_ids:
+            meta['image_id'] = other_ids
+
+        os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+        _atomic_write(ids_path_for(json_path), encode_ids(numeric_ids))
+        _atomic_write(json_path, json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
+        try:
+            os.remove(journal_path_for(json_path))
+        except FileNotFoundError:
+            pass
+    return len(all_ids)
+
+
+def append_ids(json_path, work_ids):
+    """作品下载成功后立即追加到日志，进程中途退出时已下载的ID不会丢失"""
+    out = bytearray()
+    for work_id in work_ids:
+        if str(work_id).isdigit():
+            _encode_varint(int(work_id), out)
+    if not out:
+        return
+    with _journal_lock(json_path):
+        try:
+            os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+            with open(journal_path_for(json_path), 'ab') as f:
+                f.write(out)
+        except OSError as e:
+            print(f"写入作品ID日志失败: {e}")
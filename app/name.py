@@ -4,6 +4,8 @@ import json
 import requests
 import os
 
+from .http_client import http_client, build_headers, build_proxies
+
 
 def get_user_profile(cookie: str, proxy_settings: dict) -> tuple:
     """
@@ -22,14 +24,10 @@ def get_user_profile(cookie: str, proxy_settings: dict) -> tuple:
 
         # 请求Pixiv排名页面
         url = "https://www.pixiv.net/ranking.php"
-        headers = {
-            "cookie": cookie,
-            "referer": "https://www.pixiv.net",
-            "upgrade-insecure-requests": "1",
-            "user-agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/63.0.3239.132 Safari/537.36"
-        }
+        headers = build_headers()
+        headers.update({"cookie": cookie, "upgrade-insecure-requests": "1"})
 
-        response = requests.get(url, headers=headers, timeout=(5, 5), proxies=proxies)
+        response = http_client.get(url, headers=headers, timeout=(5, 5), proxies=proxies)
 
         if response.status_code != 200:
             print(f"请求失败，状态码: {response.status_code}")  # 调试信息
@@ -98,7 +96,7 @@ def save_profile_image(name: str, image_url: str, headers: dict, proxies: dict)
         print(f"保存头像到: {filepath}")  # 调试信息
 
         # 下载头像
-        response = requests.get(image_url, headers=headers, timeout=(10, 10), proxies=proxies)
+        response = http_client.get(image_url, headers=headers, timeout=(10, 10), proxies=proxies)
 
         if response.status_code == 200:
             # 保存文件
@@ -119,50 +117,9 @@ def setup_proxies(proxy_settings: dict):
     从代理设置字典构建代理配置
     参数: proxy_settings (dict): 代理设置字典
     """
-    if not proxy_settings:
-        return None
-
-    proxy_type = proxy_settings.get('type', 0)
-    proxy_address = proxy_settings.get('address', '')
-    proxy_port = proxy_settings.get('port', '')
-
-    # 以下逻辑与之前类似，但不再访问setting对象
-    if proxy_type == 0:  # 不使用代理
-        print("不使用代理")
-        return None
-
-    elif proxy_type == 1:  # HTTP代理
-        if not proxy_address or not proxy_port:
-            print("HTTP代理配置不完整")
-            return None
-
-        # 确保地址有协议前缀
-        if not proxy_address.startswith(('http://', 'https://')):
-            proxy_address = f"http://{proxy_address}"
-
-        proxy_value = f"{proxy_address}:{proxy_port}"
-        print(f"使用HTTP代理: {proxy_value}")
-        return {"http": proxy_value, "https": proxy_value}
-
-    elif proxy_type == 2:  # SOCKS5代理
-        if not proxy_address or not proxy_port:
-            print("SOCKS5代理配置不完整")
-            return None
-
-        try:
-            # 确保端口是整数
-            proxy_port = int(proxy_port)
-        except ValueError:
-            print(f"无效的SOCKS5端口: {proxy_port}")
-            return None
-
-        print(f"使用SOCKS5代理: socks5://{proxy_address}:{proxy_port}")
-        return {
-            "http": f"socks5://{proxy_address}:{proxy_port}",
-            "https": f"socks5://{proxy_address}:{proxy_port}"
-        }
-
+    proxies = build_proxies(proxy_settings)
+    if proxies is None:
+        print("不使用代理或代理配置不完整")
     else:
-        print(f"未知的代理类型: {proxy_type}")
-        return None
-
+        print(f"使用代理: {proxies['https']}")
+    return proxies
@@ -0,0 +1,73 @@
+# app/progress.py
+
+import threading
+import collections
+
+PROGRESS_FLUSH_INTERVAL_MS = 100  # GUI 线程取走进度的间隔（约 10 Hz）
+
+
+class ByteCounter:
+    """
+    下载字节数累加器。
+    每个线程只累加自己的计数单元，热路径上不加锁也不发送信号；
+    读取方按固定频率汇总各单元的增量，已退出线程的计数并入基数后释放。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells = []  # (thread, [累计字节数])
+        self._cells_lock = threading.Lock()  # 只在登记新线程和汇总时使用
+        self._retired = 0
+        self._last_total = 0
+
+    def add(self, nbytes):
+        cell = getattr(self._local, 'cell', None)
+        if cell is None:
+            cell = self._local.cell = [0]
+            with self._cells_lock:
+                self._cells.append((threading.current_thread(), cell))
+        cell[0] += nbytes
+
+    def take(self):
+        """返回自上次调用以来累加的字节数"""
+        with self._cells_lock:
+            alive = []
+            for thread, cell in self._cells:
+                if thread.is_alive():
+                    alive.append((thread, cell))
+                else:
+                    self._retired += cell[0]
+            self._cells = alive
+            total = self._retired + sum(cell[0] for _, cell in alive)
+        delta, self._last_total = total - self._last_total, total
+        return delta
+
+
+byte_counter = ByteCounter()
+
+
+class ProgressBuffer:
+    """
+    任务进度缓冲区，提供与 pyqtSignal 相同的 emit() 接口。
+    工作线程的进度消息先缓存在这里，由 DownloadManager 在 GUI 线程中按 PROGRESS_FLUSH_INTERVAL_MS
+    取走并合并为一次更新，避免每条消息都投递一个跨线程的 Qt 事件。
+    """
+
+    def __init__(self):
+        self._messages = collections.deque()
+        self._counts = (0, 0)
+
+    def emit(self, item_id, completed, total, status, catalog):
+        if total:
+            self._counts = (completed, total)  # 枚举阶段的消息不带计数
+        self._messages.append(status)
+
+    def drain(self):
+        """取走缓存的消息，返回 (completed, total, [status, ...])，没有新消息时返回 None"""
+        messages = []
+        while self._messages:
+            messages.append(self._messages.popleft())
+        if not messages:
+            return None
+        completed, total = self._counts
+        return completed, total, messages
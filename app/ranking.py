@@ -15,11 +15,14 @@ from qfluentwidgets import (
     FluentIcon as FIF, InfoBar, InfoBarPosition,
     PushButton, SwitchButton, ComboBox,
     RoundMenu, Action, MenuAnimationType, ToolTipFilter, ToolTipPosition,
-    ListWidget, TextEdit # <-- 导入 qfluentwidgets 提供的 ListWidget 和 TextEdit
+    ListWidget # <-- 导入 qfluentwidgets 提供的 ListWidget
 )
 
 from .download import download_manager, cookie_manager
 from .config_manager import config_manager, get_config
+from .http_client import http_client, build_headers, build_proxies
+from .log_view import LogView
+from .task_queue import PRIORITY_LOW
 
 
 class RankingFetcherThread(QThread):
@@ -48,13 +51,8 @@ class RankingFetcherThread(QThread):
             self.ids_fetched.emit([], "", "", "")
             return
 
-        headers = {
-            "cookie": f"PHPSESSID={cookie}",
-            "referer": "https://www.pixiv.net",
-            "Connection": "close",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        proxies = self._get_proxies()
+        headers = build_headers(cookie)
+        proxies = build_proxies(config.get('proxy', {}))
 
         errors = 0
         for i in range(1, self.pages_to_fetch + 1):
@@ -67,7 +65,7 @@ class RankingFetcherThread(QThread):
             self.progress_signal.emit(f"正在访问第 {i}/{self.pages_to_fetch} 页...", "0 KB/s")
 
             try:
-                response = requests.get(current_url, headers=headers, proxies=proxies, timeout=(8.5, 10))
+                response = http_client.get(current_url, headers=headers, proxies=proxies, timeout=(8.5, 10))
                 response.raise_for_status()
 
                 data = response.json()
@@ -110,13 +108,6 @@ class RankingFetcherThread(QThread):
     def stop(self):
         self.is_stopped = True
 
-    def _get_proxies(self):
-        p = get_config().get('proxy', {});
-        t, a, p_ = p.get('type', '0'), p.get('address', ''), p.get('port', '')
-        if t == '0' or not a or not p_: return None
-        proto = 'socks5' if t == '2' else 'http';
-        return {'http': f"{proto}://{a}:{p_}", 'https': f"{proto}://{a}:{p_}"}
-
 
 class Ranking(QWidget):
     LEFT_BORDER_COLOR = "#6ac0fa"
@@ -134,8 +125,8 @@ class Ranking(QWidget):
         self.ranking_fetcher_thread = None
         self._download_item_map = {}
 
+        self.current_ranking_task_id = None  # 整个排行榜作为一个下载任务
         self.current_ranking_illust_ids = set()
-        self.current_ranking_downloaded_ids = set()
         self.current_ranking_metadata_path = None
         self.current_ranking_type_name = None
         self.current_ranking_date_str = None
@@ -214,10 +205,10 @@ class Ranking(QWidget):
         self.ranking_selection_h_layout.addWidget(ranking_selection_frame, 5)
         self.ranking_selection_h_layout.addStretch(1)
 
-        # 修改这里，使用 qfluentwidgets.ListWidget 和 qfluentwidgets.TextEdit
+        # 下载列表使用 qfluentwidgets.ListWidget，日志使用只绘制可见行的 LogView
         download_list_container, self.download_list_widget = self.create_area_widget("下载列表", ListWidget)
-        log_output_container, self.log_output = self.create_area_widget("操作日志", TextEdit)
-        self.log_output.setReadOnly(True)
+        log_output_container, self.log_output = self.create_area_widget("操作日志", LogView)
+        self.log_output.set_log_name("Ranking")
 
         self.log_output.setContextMenuPolicy(Qt.CustomContextMenu)
         self.log_output.customContextMenuRequested.connect(self.show_log_context_menu)
@@ -251,6 +242,8 @@ class Ranking(QWidget):
         self.thread_info_label.setStyleSheet(label_style)
         self.speed_label = QLabel("速度: 0 KB/s")
         self.speed_label.setStyleSheet(label_style)
+        self.limiter_info_label = QLabel("限流: N/A")
+        self.limiter_info_label.setStyleSheet(label_style)
         self.r18_toggle = SwitchButton(self)
         self.r18_toggle.setText("包含 R18 作品")
         self.r18_toggle.setChecked(False)
@@ -262,6 +255,7 @@ class Ranking(QWidget):
         status_layout.addWidget(self.proxy_info_label)
         status_layout.addWidget(self.thread_info_label)
         status_layout.addWidget(self.speed_label)
+        status_layout.addWidget(self.limiter_info_label)
         status_layout.addStretch()
         status_layout.addWidget(self.r18_toggle)
         status_layout.addWidget(self.cookie_info_label)
@@ -386,7 +380,9 @@ class Ranking(QWidget):
         # 修改信号连接，槽函数需要接收新的 catalog 参数
         download_manager.task_progress.connect(self.on_download_progress)
         download_manager.task_finished.connect(self.on_download_finished)
+        download_manager.work_finished.connect(self.on_work_finished)
         download_manager.speed_updated.connect(self.update_speed_display)
+        download_manager.concurrency_changed.connect(self.update_thread_count)
         config_manager.config_changed.connect(self.update_status_bar)
         # 2. 为 Ranking 窗口本身设置右键菜单策略
         self.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -408,7 +404,6 @@ class Ranking(QWidget):
         self.enabled_false()
 
         self.current_ranking_illust_ids.clear()
-        self.current_ranking_downloaded_ids.clear()
         self.current_ranking_metadata_path = None
         self.current_ranking_type_name = None
         self.current_ranking_date_str = None
@@ -591,7 +586,7 @@ class Ranking(QWidget):
         if self.total_illusts_for_current_ranking == 0:
             self.append_log("没有作品需要下载。任务结束。")
             self.is_ranking_download_active = False
-            self._save_ranking_metadata()
+            self._reset_ranking_state()
             return
 
         # self.append_log(f"将下载 {self.total_illusts_for_current_ranking} 个作品。")
@@ -603,82 +598,75 @@ class Ranking(QWidget):
             list_item.setData(Qt.UserRole, illust_id)
             self.download_list_widget.addItem(list_item)
             self._download_item_map[illust_id] = list_item
-
-            download_manager.add_task(
-                item_id=illust_id,
-                catalog='Ranking',
-                item_type='illust',
-                custom_path=full_ranking_dir,
-                ranking_type_name=ranking_type_name,
-                ranking_date_str=ranking_date_str,
-                existing_image_ids=None
-            )
             self.current_ranking_illust_ids.add(illust_id)
 
+        # 整个排行榜作为一个任务：只占一个任务名额，任务日志只写一条
+        self.current_ranking_task_id = f"{ranking_type_name} {ranking_date_str}"
+        download_manager.add_task(
+            item_id=self.current_ranking_task_id,
+            catalog='Ranking',
+            item_type='illust',
+            custom_path=full_ranking_dir,
+            ranking_type_name=ranking_type_name,
+            ranking_date_str=ranking_date_str,
+            work_ids=list(illust_ids_to_download),
+            # 任务下载一个作品就追加一个ID，结束时保存元数据；重启后恢复的任务同样写入该文件
+            metadata_file=self._ranking_metadata_file(),
+            priority=PRIORITY_LOW  # 排行榜排在手动添加的任务之后
+        )
+
         self.append_log(f"已将 {self.total_illusts_for_current_ranking} 个作品添加到下载队列。")
         self.pause_resume_btn.setEnabled(True)
         self.stop_all_btn.setEnabled(True)
 
 
-    def on_download_progress(self, item_id, completed, total, status, catalog): # 接收 catalog 参数
+    def on_download_progress(self, item_id, completed, total, messages, catalog): # 一次收到该任务的一批消息
         # 仅处理 Ranking 类型的进度信息
         if catalog != 'Ranking':
             return
 
         # Filter out granular messages for logging
-        if "正在获取详情" in status or "正在创建目录" in status or "正在下载图片" in status:
-            return
-
-        self.append_log(f"【{item_id}】 {status}")
+        self.append_logs([f"【{item_id}】 {status}" for status in messages
+                          if not ("正在获取详情" in status or "正在创建目录" in status or "正在下载图片" in status)])
 
 
-    def on_download_finished(self, item_id, catalog): # 接收 catalog 参数
-        # 仅处理 Ranking 类型的完成信息
-        if catalog != 'Ranking':
+    def on_work_finished(self, item_id, work_id, success, catalog):
+        """排行榜任务中的一个作品结束：从列表移除并更新进度"""
+        if catalog != 'Ranking' or item_id != self.current_ranking_task_id:
             return
 
-        # Remove item from UI list and map immediately upon completion
-        if item_id in self._download_item_map:
-            list_item = self._download_item_map.pop(item_id)
+        if work_id in self._download_item_map:
+            list_item = self._download_item_map.pop(work_id)
             row = self.download_list_widget.row(list_item)
             if row != -1:
                 self.download_list_widget.takeItem(row)
-            # self.append_log(f"【{item_id}】下载任务已结束。")
-
-            if item_id in self.current_ranking_illust_ids:
-                self.completed_illusts_for_current_ranking += 1
-                self.current_ranking_downloaded_ids.add(item_id)
 
-                self.append_log(f"排行榜下载进度: {self.completed_illusts_for_current_ranking}/{self.total_illusts_for_current_ranking}")
+        if work_id in self.current_ranking_illust_ids:
+            self.completed_illusts_for_current_ranking += 1
+            self.append_log(f"排行榜下载进度: {self.completed_illusts_for_current_ranking}/{self.total_illusts_for_current_ranking}")
 
-                if self.completed_illusts_for_current_ranking >= self.total_illusts_for_current_ranking:
-                    self.append_log(f"【{self.current_ranking_type_name}】所有作品下载完成！")
-                    self._save_ranking_metadata()
-                    self.is_ranking_download_active = False
-                    self.enabled_true()
+    def on_download_finished(self, item_id, catalog): # 接收 catalog 参数
+        # 仅处理当前排行榜任务的完成信息，被停止的任务不会发出该信号
+        if catalog != 'Ranking' or item_id != self.current_ranking_task_id:
+            return
 
+        self.append_log(f"【{self.current_ranking_type_name}】所有作品下载完成！")
+        self._reset_ranking_state()  # 元数据已由下载任务保存
+        self.is_ranking_download_active = False
+        self.enabled_true()
 
-    def _save_ranking_metadata(self):
-        if not self.current_ranking_metadata_path:
-            self.append_log("元数据保存失败: 无法确定排行榜保存路径。")
-            return
 
-        all_downloaded_ids = self.current_ranking_downloaded_ids
-        try:
-            sorted_all_downloaded_ids = sorted(list(all_downloaded_ids), key=lambda x: int(x))
-        except ValueError:
-            sorted_all_downloaded_ids = sorted(list(all_downloaded_ids))
-
-        meta = {
-            "ranking_type": self.current_ranking_type_name,
-            "ranking_date": self.current_ranking_date_str,
-            "quantity": len(sorted_all_downloaded_ids),
-            "image_id": sorted_all_downloaded_ids,
-            "download_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "base_path": os.path.abspath(self.current_ranking_metadata_path),
-            "pid_option": get_config().get('download_path', {}).get('pid_option', '无')
-        }
+    def _reset_ranking_state(self):
+        self.current_ranking_task_id = None
+        self.current_ranking_illust_ids.clear()
+        self.current_ranking_metadata_path = None
+        self.current_ranking_type_name = None
+        self.current_ranking_date_str = None
+        self.total_illusts_for_current_ranking = 0
+        self.completed_illusts_for_current_ranking = 0
 
+    def _ranking_metadata_file(self):
+        """当前排行榜元数据文件的路径，文件名由排行榜日期决定"""
         folder_date_for_meta = ""
         if "日榜" in self.current_ranking_type_name or "新人" in self.current_ranking_type_name or \
            "原创" in self.current_ranking_type_name or "欢迎" in self.current_ranking_type_name:
@@ -692,26 +680,12 @@ class Ranking(QWidget):
         if self.r18_toggle.isChecked() and "R18" in self.current_ranking_type_name:
              metadata_filename += "_R18"
         metadata_filename += ".json"
-
-        meta_path = os.path.join(self.current_ranking_metadata_path, metadata_filename)
-        try:
-            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(meta, f, ensure_ascii=False, indent=2)
-            self.append_log(f"【{self.current_ranking_type_name}】元数据保存成功: {meta_path}")
-        except Exception as e:
-            self.append_log(f"【{self.current_ranking_type_name}】元数据保存失败: {e}")
-
-        self.current_ranking_illust_ids.clear()
-        self.current_ranking_downloaded_ids.clear()
-        self.current_ranking_metadata_path = None
-        self.current_ranking_type_name = None
-        self.current_ranking_date_str = None
-        self.total_illusts_for_current_ranking = 0
-        self.completed_illusts_for_current_ranking = 0
+        return os.path.join(self.current_ranking_metadata_path, metadata_filename)
 
 
     def update_thread_count(self, count):
+        if download_manager.is_adaptive_concurrency():
+            count = download_manager.get_thread_count_text()
         self.thread_info_label.setText(f"线程: {count}")
 
     def update_proxy_info(self, proxy_info_str):
@@ -724,17 +698,18 @@ class Ranking(QWidget):
         proxy_info = "系统代理" if t == '0' else (
             f"HTTP: {a}:{p_}" if t == '1' else (f"SOCKS5: {a}:{p_}" if t == '2' else "未设置"))
         self.proxy_info_label.setText(f"代理: {proxy_info}")
-        self.thread_info_label.setText(f"线程: {config.get('thread_count', 'N/A')}")
+        self.thread_info_label.setText(f"线程: {download_manager.get_thread_count_text()}")
         self.cookie_info_label.setText(f"账号: {len(config.get('Accounts', {}))}")
 
     def update_speed_display(self, speed_bytes_per_sec):
+        self.limiter_info_label.setText(cookie_manager.format_limiter_state())
         if speed_bytes_per_sec > 1024 * 1024:
             speed_text = f"{speed_bytes_per_sec / (1024 * 1024):.2f} MB/s"
         elif speed_bytes_per_sec > 1024:
             speed_text = f"{speed_bytes_per_sec / 1024:.1f} KB/s"
         else:
             # 只有当没有活跃或排队的任务时才显示 0 KB/s
-            if not download_manager.get_active_and_queued_tasks():
+            if not download_manager.has_tasks():
                 speed_text = "0 KB/s"
             else:
                 speed_text = f"{int(speed_bytes_per_sec)} B/s"
@@ -759,8 +734,12 @@ class Ranking(QWidget):
             )
 
     def append_log(self, message):
-        self.log_output.append(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}");
-        self.log_output.verticalScrollBar().setValue(self.log_output.verticalScrollBar().maximum())
+        self.log_output.append_messages([message])
+
+    def append_logs(self, messages):
+        """一次追加一批日志"""
+        if messages:
+            self.log_output.append_messages(messages)
 
     def show_log_context_menu(self, pos):
         menu = RoundMenu(parent=self.log_output)
@@ -843,8 +822,8 @@ class Ranking(QWidget):
         self.create_info_bar("所有排行榜下载任务已停止。")
         self.download_list_widget.clear()
         self._download_item_map.clear()
+        self.current_ranking_task_id = None
         self.current_ranking_illust_ids.clear()
-        self.current_ranking_downloaded_ids.clear()
         self.current_ranking_metadata_path = None
         self.current_ranking_type_name = None
         self.current_ranking_date_str = None
@@ -862,25 +841,20 @@ class Ranking(QWidget):
         if not illust_id:
             illust_id = item.text().split(' ')[0]
 
-        if download_manager.is_task_queued_or_active(illust_id):
-            download_manager.stop_download(illust_id)
-            self.append_log(f"已停止并从列表移除作品: {illust_id}")
-        else:
-            row = self.download_list_widget.row(item)
-            if row != -1:
-                self.download_list_widget.takeItem(row)
-            self._download_item_map.pop(illust_id, None)
-            self.append_log(f"已从列表移除作品: {illust_id}")
+        row = self.download_list_widget.row(item)
+        if row != -1:
+            self.download_list_widget.takeItem(row)
+        self._download_item_map.pop(illust_id, None)
 
-        if illust_id in self.current_ranking_illust_ids:
+        if self.current_ranking_task_id and illust_id in self.current_ranking_illust_ids:
+            # 尚未开始的作品不再下载，已在下载的作品照常完成；全部结束后由任务完成信号保存元数据
+            download_manager.skip_works(self.current_ranking_task_id, [illust_id])
             self.current_ranking_illust_ids.remove(illust_id)
             self.total_illusts_for_current_ranking = len(self.current_ranking_illust_ids)
+            self.append_log(f"已从排行榜任务中移除作品: {illust_id}")
             self.append_log(f"排行榜剩余任务数更新: {self.total_illusts_for_current_ranking - self.completed_illusts_for_current_ranking}")
-            if self.completed_illusts_for_current_ranking >= self.total_illusts_for_current_ranking:
-                self.append_log(f"【{self.current_ranking_type_name}】所有作品下载完成！")
-                self._save_ranking_metadata()
-                self.is_ranking_download_active = False
-                self.enabled_true()
+        else:
+            self.append_log(f"已从列表移除作品: {illust_id}")
 
     def enabled_false(self):
         self.ranking_type_combo.setEnabled(False)
@@ -893,7 +867,7 @@ class Ranking(QWidget):
         self.ranking_type_combo.setEnabled(True)
         self.start_download_btn.setEnabled(True)
         self.r18_toggle.setEnabled(True)
-        if download_manager.get_active_and_queued_ranking_tasks():
+        if download_manager.has_ranking_tasks():
             self.pause_resume_btn.setEnabled(True)
             self.stop_all_btn.setEnabled(True)
         else:
@@ -0,0 +1,114 @@
+# app/rate_limit.py
+
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    令牌桶：以 rate 个/秒的速度补充令牌，最多积攒 capacity 个。
+    用于账号/主机的请求频率限制，也可以按字节数限制带宽。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self._lock = threading.Lock()
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def set_rate(self, rate, capacity=None):
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+            self._tokens = min(self._tokens, self.capacity)
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def time_until(self, amount=1.0):
+        """还需等待多少秒才能取到 amount 个令牌，rate<=0 视为不限速"""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill()
+            amount = min(amount, self.capacity)
+            return max(0.0, (amount - self._tokens) / self.rate)
+
+    def consume(self, amount=1.0):
+        """直接扣除令牌，允许欠账（余额为负时后续请求需等待更久）"""
+        with self._lock:
+            if self.rate <= 0:
+                return
+            self._refill()
+            self._tokens -= amount
+
+
+ACTIVE_CATALOG_WINDOW = 2.0  # 类别在最近多少秒内有传输视为正在下载
+
+
+class BandwidthLimiter:
+    """
+    下载带宽限制（字节/秒）。
+    全局令牌桶限制总速度；配置了类别权重时，再按 User/Tag/Ranking 的权重在正在下载的类别之间分配份额，
+    单独运行的类别可以用满全局带宽。图片下载每收到一块数据调用一次 throttle()，按返回值等待。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.weights = {}
+        self._global = TokenBucket(0)
+        self._buckets = {}  # catalog -> TokenBucket
+        self._last_seen = {}  # catalog -> 最近一次传输的时间
+        self._active = frozenset()
+
+    def configure(self, rate, weights=None):
+        """设置全局限速（<=0 为不限速）和类别权重，可在下载过程中随时调用"""
+        weights = {catalog: float(weight) for catalog, weight in (weights or {}).items() if float(weight) > 0}
+        with self._lock:
+            if float(rate) == self.rate and weights == self.weights:
+                return
+            self.rate, self.weights = float(rate), weights
+            self._global.set_rate(max(0.0, self.rate))
+            self._rebalance_locked()
+
+    def _rebalance_locked(self):
+        """按正在下载的类别重新分配份额（调用方需持有 _lock）"""
+        active_weight = sum(self.weights.get(catalog, 0) for catalog in self._active)
+        for catalog, bucket in self._buckets.items():
+            weight = self.weights.get(catalog, 0)
+            if self.rate > 0 and weight and active_weight:
+                bucket.set_rate(self.rate * weight / active_weight)
+            else:
+                bucket.set_rate(0)
+
+    def throttle(self, catalog, nbytes):
+        """登记 catalog 刚传输的 nbytes 字节，返回为遵守限速需要等待的秒数"""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._last_seen[catalog] = now
+            if catalog not in self._buckets:
+                self._buckets[catalog] = TokenBucket(0)
+            active = frozenset(c for c, seen in self._last_seen.items() if now - seen <= ACTIVE_CATALOG_WINDOW)
+            if active != self._active:
+                self._active = active
+                self._rebalance_locked()
+            buckets = (self._global, self._buckets[catalog])
+        for bucket in buckets:
+            bucket.consume(nbytes)
+        return max(bucket.time_until(0) for bucket in buckets)
+
+
+bandwidth_limiter = BandwidthLimiter()
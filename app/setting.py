@@ -1181,6 +1181,79 @@ class Setting(ScrollArea):
         )
         self.downloadGroup.addSettingCard(self.threadCountCard)
 
+        # 自适应并发设置卡
+        self.adaptiveCard = OptionsSettingCard(
+            OptionsConfigItem(
+                "Download", "AdaptiveConcurrency", 0,  # 默认使用固定线程数
+                OptionsValidator([0, 1]), EnumSerializer(int)
+            ),
+            FIF.SYNC,
+            self.tr('并发控制'),
+            self.tr('自适应模式以线程数量为起点，根据延迟和 429/超时自动增减工作线程'),
+            texts=[
+                self.tr('固定'),
+                self.tr('自适应')
+            ],
+            parent=self.downloadGroup
+        )
+        self.downloadGroup.addSettingCard(self.adaptiveCard)
+
+        # 单作品并行页数设置卡
+        self.pageConcurrencyCard = OptionsSettingCard(
+            OptionsConfigItem(
+                "Download", "PageConcurrency", 2,  # 默认每个作品同时下载4页
+                OptionsValidator([0, 1, 2, 3]), EnumSerializer(int)
+            ),
+            FIF.ALBUM,
+            self.tr('多页作品并行页数'),
+            self.tr('多页作品同时下载的页数，失败的页会单独重试'),
+            texts=[
+                self.tr('1页'),
+                self.tr('2页'),
+                self.tr('4页'),
+                self.tr('8页')
+            ],
+            parent=self.downloadGroup
+        )
+        self.downloadGroup.addSettingCard(self.pageConcurrencyCard)
+
+        # 下载限速设置卡
+        self.bandwidthCard = OptionsSettingCard(
+            OptionsConfigItem(
+                "Download", "BandwidthLimit", 0,  # 默认不限速
+                OptionsValidator([0, 1, 2, 3, 4]), EnumSerializer(int)
+            ),
+            FIF.SPEED_MEDIUM,
+            self.tr('下载限速'),
+            self.tr('限制所有任务的总下载速度，修改后立即对正在进行的下载生效'),
+            texts=[
+                self.tr('不限速'),
+                self.tr('1 MB/s'),
+                self.tr('2 MB/s'),
+                self.tr('5 MB/s'),
+                self.tr('10 MB/s')
+            ],
+            parent=self.downloadGroup
+        )
+        self.downloadGroup.addSettingCard(self.bandwidthCard)
+
+        # 下载引擎设置卡
+        self.engineCard = OptionsSettingCard(
+            OptionsConfigItem(
+                "Download", "Engine", 0,  # 默认使用线程池引擎
+                OptionsValidator([0, 1]), EnumSerializer(int)
+            ),
+            FIF.DEVELOPER_TOOLS,
+            self.tr('下载引擎'),
+            self.tr('异步引擎需要安装 httpx，可同时保持数百个请求在途'),
+            texts=[
+                self.tr('线程池'),
+                self.tr('异步 (asyncio)')
+            ],
+            parent=self.downloadGroup
+        )
+        self.downloadGroup.addSettingCard(self.engineCard)
+
         # ============================================================
         # 4. 其它设置
         # ============================================================
@@ -1275,6 +1348,12 @@ class Setting(ScrollArea):
         thread_mapping = {0: 1, 1: 3, 2: 5, 3: 10}
         thread_index = self.threadCountCard.configItem.value
         settings['thread_count'] = str(thread_mapping.get(thread_index, 1))
+        settings['download_engine'] = 'async' if self.engineCard.configItem.value == 1 else 'thread'
+        settings['adaptive_concurrency'] = str(self.adaptiveCard.configItem.value == 1)
+        page_mapping = {0: 1, 1: 2, 2: 4, 3: 8}
+        settings['page_concurrency'] = str(page_mapping.get(self.pageConcurrencyCard.configItem.value, 4))
+        bandwidth_mapping = {0: 0, 1: 1024, 2: 2048, 3: 5120, 4: 10240}
+        settings['bandwidth_limit'] = str(bandwidth_mapping.get(self.bandwidthCard.configItem.value, 0))
 
         # 4. 动图设置
         settings['download_gif'] = str(self.gifSettingCard.isChecked())
@@ -1400,6 +1479,20 @@ class Setting(ScrollArea):
             index = self.threadCountCard.configItem.value
             settings['thread_count'] = thread_counts.get(index, 1)
 
+        if hasattr(self, 'engineCard'):
+            settings['download_engine'] = 'async' if self.engineCard.configItem.value == 1 else 'thread'
+
+        if hasattr(self, 'adaptiveCard'):
+            settings['adaptive_concurrency'] = self.adaptiveCard.configItem.value == 1
+
+        if hasattr(self, 'pageConcurrencyCard'):
+            page_counts = {0: 1, 1: 2, 2: 4, 3: 8}
+            settings['page_concurrency'] = page_counts.get(self.pageConcurrencyCard.configItem.value, 4)
+
+        if hasattr(self, 'bandwidthCard'):
+            bandwidth_limits = {0: 0, 1: 1024, 2: 2048, 3: 5120, 4: 10240}
+            settings['bandwidth_limit'] = bandwidth_limits.get(self.bandwidthCard.configItem.value, 0)
+
         # 动图设置
         if hasattr(self, 'gifSettingCard'):
             settings['download_gif'] = self.gifSettingCard.isChecked()
@@ -1441,6 +1534,19 @@ class Setting(ScrollArea):
         if hasattr(self, 'threadCountCard'):
             self.threadCountCard.optionChanged.connect(self.save_settings)
 
+        if hasattr(self, 'adaptiveCard'):
+            self.adaptiveCard.optionChanged.connect(self.save_settings)
+
+        if hasattr(self, 'pageConcurrencyCard'):
+            self.pageConcurrencyCard.optionChanged.connect(self.save_settings)
+
+        if hasattr(self, 'bandwidthCard'):
+            self.bandwidthCard.optionChanged.connect(self.save_settings)
+
+        # 下载引擎设置卡
+        if hasattr(self, 'engineCard'):
+            self.engineCard.optionChanged.connect(self.save_settings)
+
         # 动图设置开关卡
         if hasattr(self, 'gifSettingCard'):
             self.gifSettingCard.checkedChanged.connect(self.save_settings)
@@ -1483,6 +1589,30 @@ class Setting(ScrollArea):
             except (ValueError, TypeError):
                 pass
 
+        # 并发控制
+        if 'adaptive_concurrency' in self.config and hasattr(self, 'adaptiveCard'):
+            self.adaptiveCard.setValue(1 if self.config['adaptive_concurrency'] == 'True' else 0)
+
+        # 多页作品并行页数
+        if 'page_concurrency' in self.config and hasattr(self, 'pageConcurrencyCard'):
+            try:
+                page_mapping = {1: 0, 2: 1, 4: 2, 8: 3}
+                self.pageConcurrencyCard.setValue(page_mapping.get(int(self.config['page_concurrency']), 2))
+            except (ValueError, TypeError):
+                pass
+
+        # 下载限速（KB/s）
+        if 'bandwidth_limit' in self.config and hasattr(self, 'bandwidthCard'):
+            try:
+                bandwidth_mapping = {0: 0, 1024: 1, 2048: 2, 5120: 3, 10240: 4}
+                self.bandwidthCard.setValue(bandwidth_mapping.get(int(self.config['bandwidth_limit']), 0))
+            except (ValueError, TypeError):
+                pass
+
+        # 下载引擎
+        if 'download_engine' in self.config and hasattr(self, 'engineCard'):
+            self.engineCard.setValue(1 if self.config['download_engine'] == 'async' else 0)
+
         # 下载路径设置
         if 'download_path' in self.config:
             path_config = self.config['download_path']
@@ -1554,6 +1684,24 @@ class Setting(ScrollArea):
             thread_count = thread_counts.get(index, 1)
             self.config['thread_count'] = str(thread_count)
 
+        # 并发控制
+        if hasattr(self, 'adaptiveCard'):
+            self.config['adaptive_concurrency'] = str(self.adaptiveCard.configItem.value == 1)
+
+        # 多页作品并行页数
+        if hasattr(self, 'pageConcurrencyCard'):
+            page_counts = {0: 1, 1: 2, 2: 4, 3: 8}
+            self.config['page_concurrency'] = str(page_counts.get(self.pageConcurrencyCard.configItem.value, 4))
+
+        # 下载限速（KB/s）
+        if hasattr(self, 'bandwidthCard'):
+            bandwidth_limits = {0: 0, 1: 1024, 2: 2048, 3: 5120, 4: 10240}
+            self.config['bandwidth_limit'] = str(bandwidth_limits.get(self.bandwidthCard.configItem.value, 0))
+
+        # 下载引擎
+        if hasattr(self, 'engineCard'):
+            self.config['download_engine'] = 'async' if self.engineCard.configItem.value == 1 else 'thread'
+
         # 下载路径设置
         if 'download_path' not in self.config:
             self.config['download_path'] = {}
@@ -7,18 +7,21 @@ from PyQt5.QtWidgets import (
 )
 from qfluentwidgets import (
     RoundMenu, Action, MenuAnimationType, FluentIcon as FIF, InfoBar, InfoBarPosition,
-    ListWidget, TextEdit
+    ListWidget
 )
 from PyQt5.QtCore import Qt, QEvent
 from PyQt5.QtGui import QPixmap, QIcon
-import json
 import os
-import datetime
 import re
 
 from .config_manager import config_manager, get_config
-from .download import download_manager
+from .download import download_manager, cookie_manager
 from .history_manager import history_manager
+from .log_view import LogView
+from .task_list import TaskListView
+from .completion_planner import CompletionPlannerThread, read_json_config
+from .metadata_store import metadata_exists
+from .task_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
 
 
 class Tag(QWidget):
@@ -39,8 +42,8 @@ class Tag(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.is_paused = False
-        self.current_downloading_tag = None
+        self.is_paused = False  # 整体暂停了标签下载
+        self.completion_planner = None  # 批量补全下载的目录扫描线程
 
         self.initUI()
         self.connect_signals()
@@ -189,10 +192,9 @@ class Tag(QWidget):
         inner_func_layout.setContentsMargins(0, 0, 0, 0)
         inner_func_layout.setSpacing(15)
 
-        list_area, self.result_list = self.create_area_widget("下载列表", ListWidget)
-        output_area, self.log_output = self.create_area_widget("操作日志", TextEdit)
-
-        self.log_output.setReadOnly(True)
+        list_area, self.result_list = self.create_area_widget("下载列表", TaskListView)
+        output_area, self.log_output = self.create_area_widget("操作日志", LogView)
+        self.log_output.set_log_name("Tag")
 
         inner_func_layout.addWidget(list_area, 3)
         inner_func_layout.addWidget(output_area, 17)
@@ -251,11 +253,14 @@ class Tag(QWidget):
         self.thread_info_label.setStyleSheet(label_style)
         self.speed_label = QLabel("速度: 0 KB/s")
         self.speed_label.setStyleSheet(label_style)
+        self.limiter_info_label = QLabel("限流: N/A")
+        self.limiter_info_label.setStyleSheet(label_style)
         self.cookie_info_label = QLabel("账号: N/A")
         self.cookie_info_label.setStyleSheet(label_style)
         status_layout.addWidget(self.proxy_info_label)
         status_layout.addWidget(self.thread_info_label)
         status_layout.addWidget(self.speed_label)
+        status_layout.addWidget(self.limiter_info_label)
         status_layout.addStretch()
         status_layout.addWidget(self.cookie_info_label)
 
@@ -390,70 +395,81 @@ class Tag(QWidget):
         # 修改信号连接，槽函数需要接收新的 catalog 参数
         download_manager.task_progress.connect(self.on_task_progress)
         download_manager.task_finished.connect(self.on_task_finished)
+        download_manager.task_started.connect(self.on_task_started)
         download_manager.speed_updated.connect(self.update_speed_display)
+        download_manager.concurrency_changed.connect(self.update_thread_count)
 
     def start_download_from_input(self):
         if not self.func_container.isVisible(): self.toggle_func_area()
         tag = self.search_input.text().strip()
         if not tag: self.create_info_bar("请输入有效的标签", is_error=True); return
 
-        for i in range(self.result_list.count()):
-            if self.result_list.item(i).text() == tag:
-                self.create_info_bar(f"任务 {tag} 已在列表中", is_error=True);
-                return
-
-        item = QListWidgetItem(tag)
-        item.setData(Qt.UserRole, {'existing_ids': None, 'strategy': 'default', 'age_mode': 'all'})
-        self.result_list.addItem(item)
+        if not self.result_list.task_model.add_item(tag, {'metadata_file': None, 'strategy': 'default',
+                                                          'age_mode': 'all', 'priority': PRIORITY_HIGH}):
+            self.create_info_bar(f"任务 {tag} 已在列表中", is_error=True);
+            return
 
         self.append_log(f"添加任务: {tag} (年龄模式: 全部)")
-        if self.current_downloading_tag is None: self.start_next_download()
+        self.submit_download(tag)
 
         history_manager.add_record('tag', tag)
         self.update_history_list()
         self.history_list_outer_container.hide()
 
-    def start_next_download(self):
-        if self.result_list.count() > 0:
-            current_item = self.result_list.item(0)
-            self.current_downloading_tag = current_item.text()
-            download_data = current_item.data(Qt.UserRole)
-
-            existing_ids = download_data.get('existing_ids') if download_data else None
-            strategy = download_data.get('strategy') if download_data else 'default'
-            age_mode = download_data.get('age_mode') if download_data else 'all'
-
-            self.is_paused = False
-            self.append_log(
-                f"开始下载任务: {self.current_downloading_tag} (策略: {strategy}, 年龄模式: 全部)")
-            download_manager.add_task(
-                item_id=self.current_downloading_tag,
+    def submit_download(self, tag):
+        self.submit_downloads([tag])
+
+    def submit_downloads(self, tags):
+        """把列表中的任务批量交给 DownloadManager 排队，由它按线程数同时下载多个标签"""
+        model = self.result_list.task_model
+        tasks = []
+        for tag in tags:
+            download_data = model.payload(tag) or {}
+            model.set_status(tag, "排队中")  # 有空闲名额时 add_tasks 中就会收到 task_started
+            tasks.append(dict(
+                item_id=tag,
                 catalog='Tag',
                 item_type='tag',
-                age_mode=age_mode,
-                existing_image_ids=existing_ids,
-                completion_strategy=strategy
-            )
-        else:
-            self.current_downloading_tag = None
-            self.is_paused = False
-
-    def on_task_progress(self, item_id, completed, total, status, catalog): # 接收 catalog 参数
+                age_mode=download_data.get('age_mode', 'all'),
+                metadata_file=download_data.get('metadata_file'),  # 补全下载：任务开始后从中读取已下载的作品ID
+                completion_strategy=download_data.get('strategy', 'default'),
+                priority=download_data.get('priority', PRIORITY_NORMAL)
+            ))
+        added = set(download_manager.add_tasks(tasks))
+        for tag in tags:
+            if tag not in added and tag in download_manager.active_tasks:
+                model.set_status(tag, "下载中")  # 恢复的任务已在下载
+
+    def on_task_started(self, item_id, catalog):
+        if catalog != 'Tag':
+            return
+        model = self.result_list.task_model
+        if item_id not in model:
+            model.add_item(item_id)  # 启动时从任务日志恢复的任务
+        download_data = model.payload(item_id)
+        strategy = download_data.get('strategy') if download_data else 'default'
+        model.set_status(item_id, "下载中")
+        self.append_log(f"开始下载任务: {item_id} (策略: {strategy}, 年龄模式: 全部)")
+
+    def on_task_progress(self, item_id, completed, total, messages, catalog): # 一次收到该任务的一批消息
         # 仅处理 Tag 类型的进度信息
         if catalog != 'Tag':
             return
-        if item_id == self.current_downloading_tag: self.append_log(f"【{item_id}】 {status}")
+        if item_id in self.result_list.task_model:
+            self.result_list.task_model.set_status(item_id, completed=completed, total=total)
+            self.append_logs([f"【{item_id}】 {status}" for status in messages])
 
     def on_task_finished(self, item_id, catalog): # 接收 catalog 参数
         # 仅处理 Tag 类型的完成信息
         if catalog != 'Tag':
             return
-        if item_id == self.current_downloading_tag:
+        if item_id in self.result_list.task_model:
             self.append_log(f"【{item_id}】下载任务已结束。");
             self.remove_item_from_list(item_id);
-            self.start_next_download()
 
     def update_thread_count(self, count):
+        if download_manager.is_adaptive_concurrency():
+            count = download_manager.get_thread_count_text()
         self.thread_info_label.setText(f"线程: {count}")
 
     def update_proxy_info(self, proxy_info_str):
@@ -466,10 +482,11 @@ class Tag(QWidget):
         proxy_info = "系统代理" if t == '0' else (
             f"HTTP: {a}:{p_}" if t == '1' else (f"SOCKS5: {a}:{p_}" if t == '2' else "未设置"))
         self.proxy_info_label.setText(f"代理: {proxy_info}")
-        self.thread_info_label.setText(f"线程: {config.get('thread_count', 'N/A')}")
+        self.thread_info_label.setText(f"线程: {download_manager.get_thread_count_text()}")
         self.cookie_info_label.setText(f"账号: {len(config.get('Accounts', {}))}")
 
     def update_speed_display(self, speed_bytes_per_sec):
+        self.limiter_info_label.setText(cookie_manager.format_limiter_state())
         if speed_bytes_per_sec > 1024 * 1024:
             speed_text = f"{speed_bytes_per_sec / (1024 * 1024):.2f} MB/s"
         elif speed_bytes_per_sec > 1024:
@@ -477,15 +494,14 @@ class Tag(QWidget):
         elif speed_bytes_per_sec > 0:
             speed_text = f"{int(speed_bytes_per_sec)} B/s"
         else:
-            if self.current_downloading_tag is None:
+            if not download_manager.has_tasks():
                 speed_text = "0 KB/s"
             else:
                 return
         self.speed_label.setText(f"速度: {speed_text}")
 
     def remove_item_from_list(self, item_id):
-        for i in range(self.result_list.count()):
-            if self.result_list.item(i).text() == item_id: self.result_list.takeItem(i); break
+        self.result_list.task_model.remove_item(item_id)
 
     def show_search_input_context_menu(self, pos):
         menu = RoundMenu(parent=self.search_input)
@@ -493,7 +509,7 @@ class Tag(QWidget):
             action = Action(FIF.PLAY, '继续下载');
             action.triggered.connect(self.resume_download);
             menu.addAction(action)
-        elif self.current_downloading_tag:
+        elif len(self.result_list.task_model):
             action = Action(FIF.PAUSE, '暂停下载');
             action.triggered.connect(self.pause_download);
             menu.addAction(action)
@@ -532,17 +548,38 @@ class Tag(QWidget):
         menu.exec(self.mapToGlobal(pos), aniType=MenuAnimationType.DROP_DOWN)
 
     def pause_download(self):
-        if self.current_downloading_tag: download_manager.pause_download(
-            self.current_downloading_tag); self.is_paused = True; self.append_log(
-            f"【{self.current_downloading_tag}】下载已暂停。")
+        """暂停全部标签任务，排队中的标签在恢复前不会开始"""
+        download_manager.pause_catalog('Tag')
+        self.is_paused = True
+        self._set_active_status("已暂停")
+        self.append_log("标签下载已全部暂停。")
 
     def resume_download(self):
-        if self.current_downloading_tag: download_manager.resume_download(
-            self.current_downloading_tag); self.is_paused = False; self.append_log(
-            f"【{self.current_downloading_tag}】下载已恢复。")
+        download_manager.resume_catalog('Tag')
+        self.is_paused = False
+        self._set_active_status("下载中")
+        self.append_log("标签下载已全部恢复。")
 
     def stop_download(self):
-        if self.current_downloading_tag: download_manager.stop_download(self.current_downloading_tag)
+        stopped = download_manager.stop_catalog('Tag')
+        self.result_list.task_model.remove_items(stopped)
+        self.is_paused = False
+        self.append_log(f"已停止 {len(stopped)} 个标签任务。")
+
+    def pause_item(self, tag):
+        download_manager.pause_download(tag)
+        self.result_list.task_model.set_status(tag, "已暂停")
+        self.append_log(f"【{tag}】下载已暂停。")
+
+    def resume_item(self, tag):
+        download_manager.resume_download(tag)
+        self.result_list.task_model.set_status(tag, "下载中")
+        self.append_log(f"【{tag}】下载已恢复。")
+
+    def _set_active_status(self, status):
+        for tag in self.result_list.task_model.item_ids():
+            if tag in download_manager.active_tasks:
+                self.result_list.task_model.set_status(tag, status)
 
     def open_download_directory(self):
         try:
@@ -560,17 +597,25 @@ class Tag(QWidget):
             self.create_info_bar(f"无法打开目录: {e}", is_error=True)
 
     def show_result_list_context_menu(self, pos):
-        if item := self.result_list.itemAt(pos):
+        if (tag := self.result_list.item_id_at(pos)) is not None:
             menu = RoundMenu(parent=self.result_list)
+            if tag in download_manager.active_tasks:
+                status = self.result_list.task_model.status(tag)
+                if status and status[0] == "已暂停":
+                    action = Action(FIF.PLAY, '继续')
+                    action.triggered.connect(lambda: self.resume_item(tag))
+                else:
+                    action = Action(FIF.PAUSE, '暂停')
+                    action.triggered.connect(lambda: self.pause_item(tag))
+                menu.addAction(action)
             action = Action(FIF.DELETE, '删除')
-            action.triggered.connect(lambda: self.delete_list_item(item))
+            action.triggered.connect(lambda: self.delete_list_item(tag))
             menu.addAction(action)
             menu.exec(self.result_list.mapToGlobal(pos), aniType=MenuAnimationType.DROP_DOWN)
 
-    def delete_list_item(self, item):
-        tag = item.text()
-        if tag == self.current_downloading_tag: download_manager.stop_download(tag)
-        self.result_list.takeItem(self.result_list.row(item));
+    def delete_list_item(self, tag):
+        if download_manager.is_task_queued_or_active(tag): download_manager.stop_download(tag)
+        self.result_list.task_model.remove_item(tag)
         self.append_log(f"已从列表移除任务: {tag}")
 
     def show_history_list_context_menu(self, pos):
@@ -623,8 +668,12 @@ class Tag(QWidget):
         menu.exec(widget.mapToGlobal(pos), aniType=MenuAnimationType.DROP_DOWN)
 
     def append_log(self, message):
-        self.log_output.append(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}");
-        self.log_output.verticalScrollBar().setValue(self.log_output.verticalScrollBar().maximum())
+        self.log_output.append_messages([message])
+
+    def append_logs(self, messages):
+        """一次追加一批日志"""
+        if messages:
+            self.log_output.append_messages(messages)
 
     def toggle_func_area(self):
         is_visible = not self.func_container.isVisible()
@@ -728,7 +777,7 @@ class Tag(QWidget):
             sanitized_tag_input = self._sanitize_filename(tag_input)
             json_file_path = os.path.join(tag_download_dir, sanitized_tag_input, f"{sanitized_tag_input}.json")
 
-            if os.path.exists(json_file_path):
+            if metadata_exists(json_file_path):
                 self.append_log(f"【补全下载】检测到标签 {tag_input} 的配置文件: {json_file_path}")
                 self._process_single_completion_download(tag_input, json_file_path, strategy)
             else:
@@ -745,69 +794,60 @@ class Tag(QWidget):
             existing_image_ids = config_data.get('image_id', [])
             age_mode = 'all'
             self.append_log(f"【补全下载】标签 {tag} 配置已加载：")
-            self.append_log(f"  - image_id: {existing_image_ids}")
+            self.append_log(f"  - image_id: 共 {len(existing_image_ids)} 个")
             self.append_log(f"  - base_path: {config_data.get('base_path', 'N/A')}")
             self.append_log(f"  - age_mode: {age_mode}")
 
-            for i in range(self.result_list.count()):
-                if self.result_list.item(i).text() == tag:
-                    self.create_info_bar(f"任务 {tag} 已在列表中，无需重复添加。", is_error=True);
-                    return
-
-            item = QListWidgetItem(tag)
-            item.setData(Qt.UserRole, {'existing_ids': existing_image_ids, 'strategy': strategy, 'age_mode': age_mode})
-            self.result_list.addItem(item)
+            if not self.result_list.task_model.add_item(tag, {'metadata_file': json_path,
+                                                              'strategy': strategy, 'age_mode': age_mode,
+                                                              'priority': PRIORITY_HIGH}):
+                self.create_info_bar(f"任务 {tag} 已在列表中，无需重复添加。", is_error=True);
+                return
             self.append_log(f"【补全下载】已将标签 {tag} 添加到下载列表。")
-
-            if self.current_downloading_tag is None:
-                self.start_next_download()
+            self.submit_download(tag)
         else:
             self.create_info_bar(f"读取标签 {tag} 的配置文件失败，请检查文件格式。", is_error=True)
             self.append_log(f"【补全下载】读取标签 {tag} 的配置文件失败。")
 
     def _process_all_completion_downloads(self, tag_download_dir, strategy):
-        found_tags = set()
+        """目录遍历和配置文件解析都在规划线程中进行，完成后一次性加入下载列表"""
+        if self.completion_planner and self.completion_planner.isRunning():
+            self.create_info_bar("正在扫描补全下载目录，请稍候。", is_error=True)
+            return
         self.append_log(f"【补全下载】开始扫描目录: {tag_download_dir}")
-
-        for item_name in os.listdir(tag_download_dir):
-            item_path = os.path.join(tag_download_dir, item_name)
-            if os.path.isdir(item_path):
-                tag = item_name
-                json_file_path = os.path.join(item_path, f"{tag}.json")
-                if os.path.exists(json_file_path):
-                    config_data = self._read_tag_json_config(json_file_path)
-                    if config_data:
-                        existing_image_ids = config_data.get('image_id', [])
-                        age_mode = 'all'
-                        for i in range(self.result_list.count()):
-                            if self.result_list.item(i).text() == tag:
-                                self.append_log(f"【补全下载】任务 {tag} 已在列表中，跳过。")
-                                found_tags.add(tag)
-                                break
-                        else:
-                            item = QListWidgetItem(tag)
-                            item.setData(Qt.UserRole, {'existing_ids': existing_image_ids, 'strategy': strategy,
-                                                       'age_mode': age_mode})
-                            self.result_list.addItem(item)
-                            self.append_log(f"【补全下载】已将标签 {tag} 添加到下载列表。")
-                            found_tags.add(tag)
-                    else:
-                        self.append_log(f"【补全下载】警告: 读取标签 {tag} 的配置文件失败，跳过。")
+        self.completion_planner = CompletionPlannerThread('Tag', tag_download_dir, self)
+        self.completion_planner.progress_signal.connect(
+            lambda done, total: self.append_log(f"【补全下载】已扫描 {done}/{total} 个目录"))
+        self.completion_planner.plan_ready.connect(
+            lambda plan, logs: self._on_completion_plan_ready(plan, logs, strategy))
+        self.completion_planner.start()
+
+    def _on_completion_plan_ready(self, plan, logs, strategy):
+        found_tags = set()
+        new_items = []
+        for tag, metadata_file in plan:
+            if tag in self.result_list.task_model:
+                logs.append(f"【补全下载】任务 {tag} 已在列表中，跳过。")
+            else:
+                new_items.append((tag, {'metadata_file': metadata_file, 'strategy': strategy,
+                                        'age_mode': 'all', 'priority': PRIORITY_LOW}))
+                logs.append(f"【补全下载】已将标签 {tag} 添加到下载列表。")
+            found_tags.add(tag)
+
+        added_tags = self.result_list.task_model.add_items(new_items)
+        self.append_logs(logs)
+        self.submit_downloads(added_tags)
         if not found_tags:
             self.create_info_bar("未找到任何标签配置文件进行补全下载。", is_error=False)
             self.append_log("【补全下载】未找到任何标签配置文件。")
         else:
             self.create_info_bar(f"已将 {len(found_tags)} 个标签添加到补全下载队列。", is_error=False)
-            if self.current_downloading_tag is None:
-                self.start_next_download()
 
     def _read_tag_json_config(self, json_path):
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            self.append_log(f"错误: 读取配置文件 {json_path} 失败: {e}")
-            return None
+        config_data, error = read_json_config(json_path)
+        if error:
+            self.append_log(error)
+        return config_data
 
     def _sanitize_filename(self, name):
         """
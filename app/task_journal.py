@@ -0,0 +1,153 @@
+# app/task_journal.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 任务日志数据库放在软件目录下，与 config.ini 同级
+JOURNAL_DB_PATH = os.path.join(BASE_DIR, '../task_journal.db')
+
+
+class TaskJournal:
+    """
+    下载队列的持久化日志（SQLite）。
+    记录 任务 -> 作品 -> 图片地址 三级状态：任务加入队列时写入参数，枚举过程中追加作品列表，
+    获取详情后写入图片地址，作品完成后标记为 done。任务正常结束或被用户停止时删除记录，
+    程序退出或崩溃时留下的记录在下次启动时恢复，已完成的作品和已获取的详情都不会重复请求。
+    图片本身的进度由磁盘上的最终文件和 .tmp 续传文件体现。
+    """
+    _instance, _lock = None, threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None: cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path=JOURNAL_DB_PATH):
+        if hasattr(self, '_initialized'): return
+        self.db_path = db_path
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._initialized = True
+
+    def _get_conn(self):
+        """延迟打开数据库，打开失败时返回 None，日志自动失效但不影响下载"""
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                                    item_id TEXT PRIMARY KEY,
+                                    params TEXT NOT NULL,
+                                    expanded INTEGER NOT NULL DEFAULT 0,
+                                    created_at REAL NOT NULL)""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS works (
+                                    item_id TEXT NOT NULL,
+                                    work_id TEXT NOT NULL,
+                                    seq INTEGER NOT NULL,
+                                    done INTEGER NOT NULL DEFAULT 0,
+                                    details TEXT,
+                                    PRIMARY KEY (item_id, work_id))""")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"警告: 无法打开任务日志数据库 {self.db_path}: {e}")
+                self._conn = False
+        return self._conn or None
+
+    def _execute(self, statements):
+        """在一个事务中执行 [(sql, params 或 [params...], many)]，失败只打印日志"""
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    for sql, params, many in statements:
+                        (conn.executemany if many else conn.execute)(sql, params)
+            except sqlite3.Error as e:
+                print(f"写入任务日志失败: {e}")
+
+    def add_task(self, task_data):
+        self.add_tasks([task_data])
+
+    def add_tasks(self, tasks_data):
+        """批量加入任务，所有任务在同一个事务中写入"""
+        if not tasks_data:
+            return
+        now = time.time()
+        self._execute([
+            ("DELETE FROM works WHERE item_id = ?", [(task_data['item_id'],) for task_data in tasks_data], True),
+            ("INSERT OR REPLACE INTO tasks (item_id, params, expanded, created_at) VALUES (?, ?, 0, ?)",
+             [(task_data['item_id'], json.dumps(task_data, ensure_ascii=False, default=list), now)
+              for task_data in tasks_data], True),
+        ])
+
+    def set_works(self, item_id, work_ids, start_seq=0):
+        """追加枚举得到的作品（标签分页枚举时逐页追加），start_seq 用于保持作品顺序"""
+        self._execute([("INSERT OR IGNORE INTO works (item_id, work_id, seq) VALUES (?, ?, ?)",
+                        [(item_id, str(work_id), start_seq + i) for i, work_id in enumerate(work_ids)], True)])
+
+    def update_params(self, task_data):
+        """改写排队中任务的参数（如排行榜删除部分作品），保持原来的加入顺序"""
+        self._execute([("UPDATE tasks SET params = ? WHERE item_id = ?",
+                        (json.dumps(task_data, ensure_ascii=False, default=list), task_data['item_id']), False)])
+
+    def mark_expanded(self, item_id):
+        """作品列表已枚举完整，之后恢复任务时不再请求作品列表接口"""
+        self._execute([("UPDATE tasks SET expanded = 1 WHERE item_id = ?", (item_id,), False)])
+
+    def set_work_details(self, item_id, work_id, details):
+        self._execute([("UPDATE works SET details = ? WHERE item_id = ? AND work_id = ?",
+                        (json.dumps(details, ensure_ascii=False), item_id, str(work_id)), False)])
+
+    def remove_works(self, item_id, work_ids):
+        """去掉任务中不再下载的作品，恢复任务时不再出现"""
+        self._execute([("DELETE FROM works WHERE item_id = ? AND work_id = ?",
+                        [(item_id, str(work_id)) for work_id in work_ids], True)])
+
+    def mark_work_done(self, item_id, work_id):
+        self._execute([("UPDATE works SET done = 1 WHERE item_id = ? AND work_id = ?",
+                        (item_id, str(work_id)), False)])
+
+    def remove_task(self, item_id):
+        self._execute([("DELETE FROM works WHERE item_id = ?", (item_id,), False),
+                       ("DELETE FROM tasks WHERE item_id = ?", (item_id,), False)])
+
+    def load_unfinished(self):
+        """
+        返回上次未完成的任务列表（按加入顺序）。
+        每项为 task_data，其中 'restored' 为 None（尚未枚举作品）或
+        {'pending': [作品ID], 'done': [作品ID], 'details': {作品ID: 详情}}。
+        """
+        with self._db_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return []
+            try:
+                tasks = conn.execute("SELECT item_id, params, expanded FROM tasks ORDER BY created_at").fetchall()
+                restored_tasks = []
+                for item_id, params, expanded in tasks:
+                    task_data = json.loads(params)
+                    task_data['restored'] = None
+                    if expanded:
+                        state = {'pending': [], 'done': [], 'details': {}}
+                        for work_id, done, details in conn.execute(
+                                "SELECT work_id, done, details FROM works WHERE item_id = ? ORDER BY seq", (item_id,)):
+                            state['done' if done else 'pending'].append(work_id)
+                            if details and not done:
+                                state['details'][work_id] = json.loads(details)
+                        task_data['restored'] = state
+                    restored_tasks.append(task_data)
+                return restored_tasks
+            except (sqlite3.Error, ValueError) as e:
+                print(f"读取任务日志失败: {e}")
+                return []
+
+
+task_journal = TaskJournal()
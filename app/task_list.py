@@ -0,0 +1,169 @@
+# app/task_list.py
+
+import bisect
+import itertools
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from qfluentwidgets import ListView
+
+
+class TaskListModel(QAbstractListModel):
+    """
+    下载列表的数据模型，按任务ID（UID/标签）索引。
+    每行保存任务ID和附带的下载参数（已下载ID、补全策略等），通过 Qt.UserRole 读取；
+    set_status() 为每行附加状态和作品进度，显示在任务ID后面。
+    查重、取参数为 O(1)；每行带一个递增序号，删除任意行时二分查找行号，
+    不需要逐行比较文本。批量添加/删除只发出一次（或每段连续行一次）行变更通知。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ids = []  # 按行顺序排列的任务ID
+        self._seqs = []  # 与 _ids 一一对应的递增序号，用于二分查找行号
+        self._seq_of = {}  # 任务ID -> 序号
+        self._payloads = {}  # 任务ID -> 下载参数
+        self._status = {}  # 任务ID -> (状态, 已完成作品数, 作品总数)
+        self._counter = itertools.count()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._ids):
+            return None
+        item_id = self._ids[index.row()]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            if item_id not in self._status:
+                return item_id
+            status, completed, total = self._status[item_id]
+            return f"{item_id}  [{status} {completed}/{total}]" if total else f"{item_id}  [{status}]"
+        if role == Qt.UserRole:
+            return self._payloads.get(item_id)
+        return None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, item_id):
+        return item_id in self._seq_of
+
+    def contains(self, item_id):
+        return item_id in self._seq_of
+
+    def row_of(self, item_id):
+        """返回任务所在行号，不存在时返回 -1"""
+        seq = self._seq_of.get(item_id)
+        if seq is None:
+            return -1
+        return bisect.bisect_left(self._seqs, seq)
+
+    def item_ids(self):
+        return list(self._ids)
+
+    def item_id_at(self, row):
+        return self._ids[row] if 0 <= row < len(self._ids) else None
+
+    def first(self):
+        """返回第一行的 (任务ID, 下载参数)，列表为空时返回 None"""
+        if not self._ids:
+            return None
+        return self._ids[0], self._payloads.get(self._ids[0])
+
+    def payload(self, item_id):
+        return self._payloads.get(item_id)
+
+    def status(self, item_id):
+        """返回 (状态, 已完成作品数, 作品总数)，未设置时返回 None"""
+        return self._status.get(item_id)
+
+    def set_status(self, item_id, status=None, completed=None, total=None):
+        """更新一行的状态和进度，参数为 None 的部分保持不变"""
+        row = self.row_of(item_id)
+        if row < 0:
+            return
+        old_status, old_completed, old_total = self._status.get(item_id, ('', 0, 0))
+        new = (old_status if status is None else status,
+               old_completed if completed is None else completed,
+               old_total if total is None else total)
+        if new != self._status.get(item_id):
+            self._status[item_id] = new
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.ToolTipRole])
+
+    def add_item(self, item_id, payload=None):
+        """添加一个任务，已在列表中时返回 False"""
+        return bool(self.add_items([(item_id, payload)]))
+
+    def add_items(self, items):
+        """批量添加 [(任务ID, 下载参数)]，跳过已在列表中的任务，返回实际添加的任务ID列表"""
+        added, pending = [], set()
+        for item_id, payload in items:
+            if item_id in self._seq_of or item_id in pending:
+                continue
+            pending.add(item_id)
+            added.append((item_id, payload))
+        if not added:
+            return []
+
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+        for item_id, payload in added:
+            seq = next(self._counter)
+            self._ids.append(item_id)
+            self._seqs.append(seq)
+            self._seq_of[item_id] = seq
+            self._payloads[item_id] = payload
+        self.endInsertRows()
+        return [item_id for item_id, _ in added]
+
+    def remove_item(self, item_id):
+        return bool(self.remove_items([item_id]))
+
+    def remove_items(self, item_ids):
+        """批量删除任务，连续的行合并为一次删除，返回实际删除的数量"""
+        rows = sorted({row for row in map(self.row_of, item_ids) if row >= 0})
+        if not rows:
+            return 0
+
+        # 从后往前按连续区间删除，前面区间的行号不受影响
+        end = len(rows) - 1
+        while end >= 0:
+            start = end
+            while start > 0 and rows[start - 1] == rows[start] - 1:
+                start -= 1
+            first, last = rows[start], rows[end]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for item_id in self._ids[first:last + 1]:
+                del self._seq_of[item_id]
+                self._payloads.pop(item_id, None)
+                self._status.pop(item_id, None)
+            del self._ids[first:last + 1]
+            del self._seqs[first:last + 1]
+            self.endRemoveRows()
+            end = start - 1
+        return len(rows)
+
+    def clear(self):
+        if not self._ids:
+            return
+        self.beginResetModel()
+        self._ids, self._seqs = [], []
+        self._seq_of.clear()
+        self._payloads.clear()
+        self._status.clear()
+        self.endResetModel()
+
+
+class TaskListView(ListView):
+    """显示 TaskListModel 的下载列表，只渲染可见行"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.task_model = TaskListModel(self)
+        self.setModel(self.task_model)
+
+    def item_id_at(self, pos):
+        """返回视图坐标 pos 处的任务ID，空白处返回 None"""
+        index = self.indexAt(pos)
+        return self.task_model.item_id_at(index.row()) if index.isValid() else None
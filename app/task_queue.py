@@ -0,0 +1,124 @@
+# app/task_queue.py
+
+import heapq
+import itertools
+import collections
+
+# 任务优先级，数值越小越先开始：界面上手动添加的单个任务可以插到批量的排行榜/补全任务前面
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+COMPACT_MIN_TOMBSTONES = 64  # 墓碑数超过该值且超过队列一半时整理队列
+
+
+class TaskQueue:
+    """
+    DownloadManager 的等待队列：每个优先级、每个类别（User/Tag/Ranking）一个 deque，按任务ID建立索引。
+    入队、出队、查重均为 O(1)；取消任务时只把队列中的条目标记为墓碑并移出索引，
+    出队时跳过墓碑，墓碑过多时才整理一次 deque。同优先级内按加入顺序先进先出，
+    出队时可以跳过被暂停的类别。只在 GUI 线程中使用，不加锁。
+    """
+
+    def __init__(self):
+        self._queues = {priority: {} for priority in PRIORITIES}  # priority -> {catalog: deque}
+        self._index = {}  # item_id -> 条目 [序号, task_data, alive]
+        self._counter = itertools.count()
+        self._tombstones = 0
+        self._catalog_counts = collections.Counter()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __bool__(self):
+        return bool(self._index)
+
+    def __contains__(self, item_id):
+        return item_id in self._index
+
+    def __iter__(self):
+        """按出队顺序遍历等待中的 task_data"""
+        for priority in PRIORITIES:
+            for entry in heapq.merge(*self._queues[priority].values()):
+                if entry[2]:
+                    yield entry[1]
+
+    def push(self, task_data, priority=PRIORITY_NORMAL):
+        """加入队尾，同一任务ID已在队列中时返回 False"""
+        item_id = task_data['item_id']
+        if item_id in self._index:
+            return False
+        if priority not in self._queues:
+            priority = PRIORITY_NORMAL
+        catalog = task_data.get('catalog')
+        entry = [next(self._counter), task_data, True]
+        self._queues[priority].setdefault(catalog, collections.deque()).append(entry)
+        self._index[item_id] = entry
+        self._catalog_counts[catalog] += 1
+        return True
+
+    def pop(self, skip_catalogs=()):
+        """取出优先级最高的最早任务（跳过 skip_catalogs 中的类别），没有可取的任务时返回 None"""
+        for priority in PRIORITIES:
+            head_queue = None
+            for catalog, queue in self._queues[priority].items():
+                if catalog in skip_catalogs:
+                    continue
+                while queue and not queue[0][2]:
+                    queue.popleft()
+                    self._tombstones -= 1
+                if queue and (head_queue is None or queue[0][0] < head_queue[0][0]):
+                    head_queue = queue
+            if head_queue is not None:
+                task_data = head_queue.popleft()[1]
+                self._forget(task_data)
+                return task_data
+        return None
+
+    def remove(self, item_id):
+        """取消等待中的任务，返回其 task_data，不在队列中时返回 None"""
+        entry = self._index.get(item_id)
+        if entry is None:
+            return None
+        entry[2] = False
+        self._tombstones += 1
+        self._forget(entry[1])
+        self._maybe_compact()
+        return entry[1]
+
+    def remove_catalog(self, catalog):
+        """取消某一类别的全部等待任务，返回被取消的 task_data 列表"""
+        removed = []
+        for queues in self._queues.values():
+            for entry in queues.pop(catalog, ()):
+                if entry[2]:
+                    self._forget(entry[1])
+                    removed.append(entry[1])
+                else:
+                    self._tombstones -= 1
+        return removed
+
+    def get(self, item_id):
+        """返回等待中任务的 task_data（可直接修改），不在队列中时返回 None"""
+        entry = self._index.get(item_id)
+        return entry[1] if entry is not None else None
+
+    def count(self, catalog=None):
+        return len(self._index) if catalog is None else self._catalog_counts.get(catalog, 0)
+
+    def item_ids(self, catalog=None):
+        return [task_data['item_id'] for task_data in self
+                if catalog is None or task_data.get('catalog') == catalog]
+
+    def _forget(self, task_data):
+        del self._index[task_data['item_id']]
+        self._catalog_counts[task_data.get('catalog')] -= 1
+
+    def _maybe_compact(self):
+        if self._tombstones < COMPACT_MIN_TOMBSTONES or self._tombstones < len(self._index):
+            return
+        for queues in self._queues.values():
+            for catalog, queue in queues.items():
+                queues[catalog] = collections.deque(entry for entry in queue if entry[2])
+        self._tombstones = 0
@@ -7,19 +7,20 @@ from PyQt5.QtWidgets import (
 )
 from qfluentwidgets import (
     RoundMenu, Action, MenuAnimationType, FluentIcon as FIF, InfoBar, InfoBarPosition,
-    ListWidget, TextEdit
+    ListWidget
 )
 from PyQt5.QtCore import Qt, QEvent, QPoint
 from PyQt5.QtGui import QPixmap, QIcon
-import json
 import os
-import datetime
 import re
-import requests
 
 from .download import download_manager, cookie_manager
 from .config_manager import config_manager, get_config
 from .history_manager import history_manager
+from .log_view import LogView
+from .task_list import TaskListView
+from .completion_planner import CompletionPlannerThread
+from .task_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
 
 
 class User(QWidget):
@@ -40,8 +41,8 @@ class User(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.is_paused = False
-        self.current_downloading_uid = None
+        self.is_paused = False  # 整体暂停了用户下载
+        self.completion_planner = None  # 补全下载的目录扫描线程
 
         self.initUI()
         self.connect_signals()
@@ -189,10 +190,9 @@ class User(QWidget):
         inner_func_layout.setContentsMargins(0, 0, 0, 0)
         inner_func_layout.setSpacing(15)
 
-        list_area, self.result_list = self.create_area_widget("下载列表", ListWidget)
-        output_area, self.log_output = self.create_area_widget("操作日志", TextEdit)
-
-        self.log_output.setReadOnly(True)
+        list_area, self.result_list = self.create_area_widget("下载列表", TaskListView)
+        output_area, self.log_output = self.create_area_widget("操作日志", LogView)
+        self.log_output.set_log_name("User")
 
         inner_func_layout.addWidget(list_area, 3)
         inner_func_layout.addWidget(output_area, 17)
@@ -251,11 +251,14 @@ class User(QWidget):
         self.thread_info_label.setStyleSheet(label_style)
         self.speed_label = QLabel("速度: 0 KB/s")
         self.speed_label.setStyleSheet(label_style)
+        self.limiter_info_label = QLabel("限流: N/A")
+        self.limiter_info_label.setStyleSheet(label_style)
         self.cookie_info_label = QLabel("账号: N/A")
         self.cookie_info_label.setStyleSheet(label_style)
         status_layout.addWidget(self.proxy_info_label)
         status_layout.addWidget(self.thread_info_label)
         status_layout.addWidget(self.speed_label)
+        status_layout.addWidget(self.limiter_info_label)
         status_layout.addStretch()
         status_layout.addWidget(self.cookie_info_label)
 
@@ -390,69 +393,82 @@ class User(QWidget):
         # 修改信号连接，槽函数需要接收新的 catalog 参数
         download_manager.task_progress.connect(self.on_task_progress)
         download_manager.task_finished.connect(self.on_task_finished)
+        download_manager.task_started.connect(self.on_task_started)
         download_manager.speed_updated.connect(self.update_speed_display)
+        download_manager.concurrency_changed.connect(self.update_thread_count)
 
     def start_download_from_input(self):
         if not self.func_container.isVisible(): self.toggle_func_area()
         uid = self.search_input.text().strip()
         if not uid.isdigit(): self.create_info_bar("请输入有效的用户UID", is_error=True); return
+        self._add_user_download(uid)
 
-        for i in range(self.result_list.count()):
-            if self.result_list.item(i).text() == uid:
-                self.create_info_bar(f"任务 {uid} 已在列表中", is_error=True);
-                return
-
-        item = QListWidgetItem(uid)
-        item.setData(Qt.UserRole, {'existing_ids': None, 'strategy': 'default'})
-        self.result_list.addItem(item)
+    def _add_user_download(self, uid):
+        if not self.result_list.task_model.add_item(uid, {'metadata_file': None, 'strategy': 'default',
+                                                          'priority': PRIORITY_HIGH}):
+            self.create_info_bar(f"任务 {uid} 已在列表中", is_error=True);
+            return
 
         self.append_log(f"添加任务: {uid}") # 用户下载没有年龄模式
-        if self.current_downloading_uid is None:
-            self.start_next_download()
+        self.submit_download(uid)
 
         history_manager.add_record('user', uid)
         self.update_history_list()
         self.history_list_outer_container.hide()
 
-    def start_next_download(self):
-        if self.result_list.count() > 0:
-            current_item = self.result_list.item(0)
-            self.current_downloading_uid = current_item.text()
-            download_data = current_item.data(Qt.UserRole)
-
-            existing_ids = download_data.get('existing_ids') if download_data else None
-            strategy = download_data.get('strategy') if download_data else 'default'
-
-            self.is_paused = False
-            self.append_log(f"开始下载任务: {self.current_downloading_uid} (策略: {strategy})")
-            download_manager.add_task(
-                item_id=self.current_downloading_uid,
+    def submit_download(self, uid):
+        self.submit_downloads([uid])
+
+    def submit_downloads(self, uids):
+        """把列表中的任务批量交给 DownloadManager 排队，由它按线程数同时下载多个用户"""
+        model = self.result_list.task_model
+        tasks = []
+        for uid in uids:
+            download_data = model.payload(uid) or {}
+            model.set_status(uid, "排队中")  # 有空闲名额时 add_tasks 中就会收到 task_started
+            tasks.append(dict(
+                item_id=uid,
                 catalog='User',
                 item_type='user',
-                existing_image_ids=existing_ids,
-                completion_strategy=strategy
-            )
-        else:
-            self.current_downloading_uid = None
-            self.is_paused = False
-
-    def on_task_progress(self, item_id, completed, total, status, catalog): # 接收 catalog 参数
+                metadata_file=download_data.get('metadata_file'),  # 补全下载：任务开始后从中读取已下载的作品ID
+                completion_strategy=download_data.get('strategy', 'default'),
+                priority=download_data.get('priority', PRIORITY_NORMAL)
+            ))
+        added = set(download_manager.add_tasks(tasks))
+        for uid in uids:
+            if uid not in added and uid in download_manager.active_tasks:
+                model.set_status(uid, "下载中")  # 恢复的任务已在下载
+
+    def on_task_started(self, item_id, catalog):
+        if catalog != 'User':
+            return
+        model = self.result_list.task_model
+        if item_id not in model:
+            model.add_item(item_id)  # 启动时从任务日志恢复的任务
+        download_data = model.payload(item_id)
+        strategy = download_data.get('strategy') if download_data else 'default'
+        model.set_status(item_id, "下载中")
+        self.append_log(f"开始下载任务: {item_id} (策略: {strategy})")
+
+    def on_task_progress(self, item_id, completed, total, messages, catalog): # 一次收到该任务的一批消息
         # 仅处理 User 类型的进度信息
         if catalog != 'User':
             return
-        if item_id == self.current_downloading_uid:
-            self.append_log(f"【{item_id}】 {status}")
+        if item_id in self.result_list.task_model:
+            self.result_list.task_model.set_status(item_id, completed=completed, total=total)
+            self.append_logs([f"【{item_id}】 {status}" for status in messages])
 
     def on_task_finished(self, item_id, catalog): # 接收 catalog 参数
         # 仅处理 User 类型的完成信息
         if catalog != 'User':
             return
-        if item_id == self.current_downloading_uid:
+        if item_id in self.result_list.task_model:
             self.append_log(f"【{item_id}】下载任务已结束。");
             self.remove_item_from_list(item_id);
-            self.start_next_download()
 
     def update_thread_count(self, count):
+        if download_manager.is_adaptive_concurrency():
+            count = download_manager.get_thread_count_text()
         self.thread_info_label.setText(f"线程: {count}")
 
     def update_proxy_info(self, proxy_info_str):
@@ -465,25 +481,25 @@ class User(QWidget):
         proxy_info = "系统代理" if t == '0' else (
             f"HTTP: {a}:{p_}" if t == '1' else (f"SOCKS5: {a}:{p_}" if t == '2' else "未设置"))
         self.proxy_info_label.setText(f"代理: {proxy_info}")
-        self.thread_info_label.setText(f"线程: {config.get('thread_count', 'N/A')}")
+        self.thread_info_label.setText(f"线程: {download_manager.get_thread_count_text()}")
         self.cookie_info_label.setText(f"账号: {len(config.get('Accounts', {}))}")
 
     def update_speed_display(self, speed_bytes_per_sec):
+        self.limiter_info_label.setText(cookie_manager.format_limiter_state())
         if speed_bytes_per_sec > 1024 * 1024:
             speed_text = f"{speed_bytes_per_sec / (1024 * 1024):.2f} MB/s"
         elif speed_bytes_per_sec > 1024:
             speed_text = f"{speed_bytes_per_sec / 1024:.1f} KB/s"
         else:
             # 只有当没有活跃或排队的任务时才显示 0 KB/s
-            if not download_manager.get_active_and_queued_tasks():
+            if not download_manager.has_tasks():
                 speed_text = "0 KB/s"
             else:
                 speed_text = f"{int(speed_bytes_per_sec)} B/s"
         self.speed_label.setText(f"速度: {speed_text}")
 
     def remove_item_from_list(self, item_id):
-        for i in range(self.result_list.count()):
-            if self.result_list.item(i).text() == item_id: self.result_list.takeItem(i); break
+        self.result_list.task_model.remove_item(item_id)
 
     def show_search_input_context_menu(self, pos):
         menu = RoundMenu(parent=self.search_input)
@@ -491,7 +507,7 @@ class User(QWidget):
             action = Action(FIF.PLAY, '继续下载');
             action.triggered.connect(self.resume_download);
             menu.addAction(action)
-        elif self.current_downloading_uid:
+        elif len(self.result_list.task_model):
             action = Action(FIF.PAUSE, '暂停下载');
             action.triggered.connect(self.pause_download);
             menu.addAction(action)
@@ -513,6 +529,10 @@ class User(QWidget):
         smart_completion_action.triggered.connect(lambda: self.start_completion_download(strategy='smart'))
         completion_menu.addAction(smart_completion_action)
 
+        incremental_completion_action = Action(FIF.SYNC, '增量补全')  # 只在有新作品时才获取完整作品列表
+        incremental_completion_action.triggered.connect(lambda: self.start_completion_download(strategy='incremental'))
+        completion_menu.addAction(incremental_completion_action)
+
         menu.addMenu(completion_menu)
         menu.exec(self.search_input.mapToGlobal(pos), aniType=MenuAnimationType.DROP_DOWN)
 
@@ -531,20 +551,38 @@ class User(QWidget):
 
 
     def pause_download(self):
-        if self.current_downloading_uid:
-            download_manager.pause_download(self.current_downloading_uid)
-            self.is_paused = True
-            self.append_log(f"【{self.current_downloading_uid}】下载已暂停。")
+        """暂停全部用户任务，排队中的用户在恢复前不会开始"""
+        download_manager.pause_catalog('User')
+        self.is_paused = True
+        self._set_active_status("已暂停")
+        self.append_log("用户下载已全部暂停。")
 
     def resume_download(self):
-        if self.current_downloading_uid:
-            download_manager.resume_download(self.current_downloading_uid)
-            self.is_paused = False
-            self.append_log(f"【{self.current_downloading_uid}】下载已恢复。")
+        download_manager.resume_catalog('User')
+        self.is_paused = False
+        self._set_active_status("下载中")
+        self.append_log("用户下载已全部恢复。")
 
     def stop_download(self):
-        if self.current_downloading_uid:
-            download_manager.stop_download(self.current_downloading_uid)
+        stopped = download_manager.stop_catalog('User')
+        self.result_list.task_model.remove_items(stopped)
+        self.is_paused = False
+        self.append_log(f"已停止 {len(stopped)} 个用户任务。")
+
+    def pause_item(self, uid):
+        download_manager.pause_download(uid)
+        self.result_list.task_model.set_status(uid, "已暂停")
+        self.append_log(f"【{uid}】下载已暂停。")
+
+    def resume_item(self, uid):
+        download_manager.resume_download(uid)
+        self.result_list.task_model.set_status(uid, "下载中")
+        self.append_log(f"【{uid}】下载已恢复。")
+
+    def _set_active_status(self, status):
+        for uid in self.result_list.task_model.item_ids():
+            if uid in download_manager.active_tasks:
+                self.result_list.task_model.set_status(uid, status)
 
     def open_download_directory(self):
         try:
@@ -562,18 +600,26 @@ class User(QWidget):
             self.create_info_bar(f"无法打开目录: {e}", is_error=True)
 
     def show_result_list_context_menu(self, pos):
-        if item := self.result_list.itemAt(pos):
+        if (uid := self.result_list.item_id_at(pos)) is not None:
             menu = RoundMenu(parent=self.result_list)
+            if uid in download_manager.active_tasks:
+                status = self.result_list.task_model.status(uid)
+                if status and status[0] == "已暂停":
+                    action = Action(FIF.PLAY, '继续')
+                    action.triggered.connect(lambda: self.resume_item(uid))
+                else:
+                    action = Action(FIF.PAUSE, '暂停')
+                    action.triggered.connect(lambda: self.pause_item(uid))
+                menu.addAction(action)
             action = Action(FIF.DELETE, '删除')
-            action.triggered.connect(lambda: self.delete_list_item(item))
+            action.triggered.connect(lambda: self.delete_list_item(uid))
             menu.addAction(action)
             menu.exec(self.result_list.mapToGlobal(pos), aniType=MenuAnimationType.DROP_DOWN)
 
-    def delete_list_item(self, item):
-        uid = item.text()
-        if uid == self.current_downloading_uid:
+    def delete_list_item(self, uid):
+        if download_manager.is_task_queued_or_active(uid):
             download_manager.stop_download(uid)
-        self.result_list.takeItem(self.result_list.row(item));
+        self.result_list.task_model.remove_item(uid)
         self.append_log(f"已从列表移除任务: {uid}")
 
     def show_history_list_context_menu(self, pos):
@@ -626,8 +672,12 @@ class User(QWidget):
         menu.exec(widget.mapToGlobal(pos), aniType=MenuAnimationType.DROP_DOWN)
 
     def append_log(self, message):
-        self.log_output.append(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}");
-        self.log_output.verticalScrollBar().setValue(self.log_output.verticalScrollBar().maximum())
+        self.log_output.append_messages([message])
+
+    def append_logs(self, messages):
+        """一次追加一批日志"""
+        if messages:
+            self.log_output.append_messages(messages)
 
     def toggle_func_area(self):
         is_visible = not self.func_container.isVisible()
@@ -732,215 +782,71 @@ class User(QWidget):
                 self.create_info_bar("请输入有效的用户UID进行补全下载。", is_error=True)
                 return
 
-            user_specific_download_folder = os.path.join(user_download_dir, uid_input)
-            json_file_path = os.path.join(user_specific_download_folder, f"{uid_input}.json")
-
-            self._process_single_completion_download(uid_input, json_file_path, strategy)
+            self._process_single_completion_download(uid_input, user_download_dir, strategy)
         else:
             self.append_log(f"【补全下载】搜索框为空，开始遍历所有用户下载配置 (策略: {strategy})。")
             self._process_all_completion_downloads(user_download_dir, strategy)
 
-    def _process_single_completion_download(self, uid, json_path, strategy):
-        config_data = None
-        existing_image_ids = []
-
-        user_download_folder = os.path.dirname(json_path)
-
-        if os.path.exists(json_path):
-            config_data = self._read_user_json_config(json_path)
-            if config_data:
-                existing_image_ids = config_data.get('image_id', [])
-                self.append_log(f"【补全下载】用户 {uid} 配置已加载：")
-                self.append_log(f"  - image_id: {existing_image_ids}")
-                self.append_log(f"  - base_path: {config_data.get('base_path', 'N/A')}")
-            else:
-                self.append_log(f"【补全下载】读取用户 {uid} 的配置文件失败，尝试从文件生成。")
-                if os.path.isdir(user_download_folder):
-                    generated_ids = self._generate_metadata_from_files(uid, user_download_folder, 'user')
-                    if generated_ids is not None:
-                        existing_image_ids = generated_ids
-                        self.create_info_bar(f"已为用户 {uid} 生成配置文件。", is_error=False)
-                    else:
-                        self.create_info_bar(f"无法为用户 {uid} 生成配置文件，将进行常规下载。", is_error=True)
-                        self.append_log(f"【补全下载】用户 {uid} 无配置文件且无法生成，按常规方式添加任务。")
-                        self.start_download_from_input()
-                        return
-                else:
-                    self.create_info_bar(f"用户 {uid} 的下载目录不存在，将进行常规下载。", is_error=False)
-                    self.append_log(f"【补全下载】用户 {uid} 下载目录不存在，按常规方式添加任务。")
-                    self.start_download_from_input()
-                    return
-        elif os.path.isdir(user_download_folder):
-            generated_ids = self._generate_metadata_from_files(uid, user_download_folder, 'user')
-            if generated_ids is not None:
-                existing_image_ids = generated_ids
-                self.create_info_bar(f"已为用户 {uid} 生成配置文件。", is_error=False)
-            else:
-                self.create_info_bar(f"无法为用户 {uid} 生成配置文件，将进行常规下载。", is_error=True)
-                self.append_log(f"【补全下载】用户 {uid} 无配置文件且无法生成，按常规方式添加任务。")
-                self.start_download_from_input()
-                return
-        else:
-            self.create_info_bar(f"未找到用户 {uid} 的配置文件或下载目录，将进行常规下载。", is_error=False)
-            self.append_log(f"【补全下载】未找到用户 {uid} 的配置文件或下载目录，按常规方式添加任务。")
-            self.start_download_from_input()
+    def _process_single_completion_download(self, uid, user_download_dir, strategy):
+        """读取配置文件、扫描图片生成配置文件和请求用户名都在规划线程中进行，只处理该用户的目录"""
+        if self.completion_planner and self.completion_planner.isRunning():
+            self.create_info_bar("正在扫描补全下载目录，请稍候。", is_error=True)
+            return
+        self.append_log(f"【补全下载】开始检查用户 {uid} 的下载目录。")
+        self.completion_planner = CompletionPlannerThread('User', user_download_dir, self, item_names=[uid])
+        self.completion_planner.plan_ready.connect(
+            lambda plan, logs: self._on_single_completion_plan_ready(uid, plan, logs, strategy))
+        self.completion_planner.start()
+
+    def _on_single_completion_plan_ready(self, uid, plan, logs, strategy):
+        self.append_logs(logs)
+        if not plan:
+            self.create_info_bar(f"未找到用户 {uid} 的配置文件且无法生成，将进行常规下载。", is_error=False)
+            self.append_log(f"【补全下载】用户 {uid} 无可用的配置文件，按常规方式添加任务。")
+            self._add_user_download(uid)
             return
 
-        for i in range(self.result_list.count()):
-            if self.result_list.item(i).text() == uid:
-                self.create_info_bar(f"任务 {uid} 已在列表中，无需重复添加。", is_error=True);
-                return
-
-        item = QListWidgetItem(uid)
-        item.setData(Qt.UserRole, {'existing_ids': existing_image_ids, 'strategy': strategy})
-        self.result_list.addItem(item)
+        _, metadata_file = plan[0]
+        if not self.result_list.task_model.add_item(uid, {'metadata_file': metadata_file, 'strategy': strategy,
+                                                          'priority': PRIORITY_HIGH}):
+            self.create_info_bar(f"任务 {uid} 已在列表中，无需重复添加。", is_error=True);
+            return
         self.append_log(f"【补全下载】已将用户 {uid} 添加到下载列表。")
-
-        if self.current_downloading_uid is None:
-            self.start_next_download()
+        self.submit_download(uid)
 
     def _process_all_completion_downloads(self, user_download_dir, strategy):
-        found_users = set()
+        """目录遍历、配置文件解析和图片扫描都在规划线程中进行，完成后一次性加入下载列表"""
+        if self.completion_planner and self.completion_planner.isRunning():
+            self.create_info_bar("正在扫描补全下载目录，请稍候。", is_error=True)
+            return
         self.append_log(f"【补全下载】开始扫描目录: {user_download_dir}")
-
-        for item_name in os.listdir(user_download_dir):
-            item_path = os.path.join(user_download_dir, item_name)
-            if not os.path.isdir(item_path):
-                continue
-
-            uid_to_process = None
-            existing_image_ids = []
-
-            for fname in os.listdir(item_path):
-                if fname.endswith('.json'):
-                    current_json_path = os.path.join(item_path, fname)
-                    config_data = self._read_user_json_config(current_json_path)
-                    if config_data and config_data.get('user_id'):
-                        uid_to_process = config_data['user_id']
-                        existing_image_ids = config_data.get('image_id', [])
-                        self.append_log(f"【补全下载】找到用户 {uid_to_process} 的配置文件: {current_json_path}")
-                        break
-
-            if uid_to_process is None:
-                if item_name.isdigit():
-                    uid_to_process = item_name
-                    generated_ids = self._generate_metadata_from_files(uid_to_process, item_path, 'user')
-                    if generated_ids is not None:
-                        existing_image_ids = generated_ids
-                        self.append_log(f"【补全下载】已为用户 {uid_to_process} 从文件生成配置文件。")
-                    else:
-                        self.append_log(f"【补全下载】警告: 无法为用户 {uid_to_process} 生成配置文件，跳过。")
-                        continue
-                else:
-                    self.append_log(
-                        f"【补全下载】警告: 用户目录 '{item_name}' 无UID配置文件且无法自动生成 (非数字目录名)，跳过。")
-                    continue
-
-            if uid_to_process is None:
-                continue
-
-            for i in range(self.result_list.count()):
-                if self.result_list.item(i).text() == uid_to_process:
-                    self.append_log(f"【补全下载】任务 {uid_to_process} 已在列表中，跳过。")
-                    found_users.add(uid_to_process)
-                    break
+        self.completion_planner = CompletionPlannerThread('User', user_download_dir, self)
+        self.completion_planner.progress_signal.connect(
+            lambda done, total: self.append_log(f"【补全下载】已扫描 {done}/{total} 个目录"))
+        self.completion_planner.plan_ready.connect(
+            lambda plan, logs: self._on_completion_plan_ready(plan, logs, strategy))
+        self.completion_planner.start()
+
+    def _on_completion_plan_ready(self, plan, logs, strategy):
+        found_users = set()
+        new_items = []
+        for uid, metadata_file in plan:
+            if uid in self.result_list.task_model or uid in found_users:
+                logs.append(f"【补全下载】任务 {uid} 已在列表中，跳过。")
             else:
-                item = QListWidgetItem(uid_to_process)
-                item.setData(Qt.UserRole, {'existing_ids': existing_image_ids, 'strategy': strategy})
-                self.result_list.addItem(item)
-                self.append_log(f"【补全下载】已将用户 {uid_to_process} 添加到下载列表。")
-                found_users.add(uid_to_process)
-
+                new_items.append((uid, {'metadata_file': metadata_file, 'strategy': strategy,
+                                        'priority': PRIORITY_LOW}))
+                logs.append(f"【补全下载】已将用户 {uid} 添加到下载列表。")
+            found_users.add(uid)
+
+        added_uids = self.result_list.task_model.add_items(new_items)
+        self.append_logs(logs)
+        self.submit_downloads(added_uids)
         if not found_users:
             self.create_info_bar("未找到任何用户配置文件进行补全下载。", is_error=False)
             self.append_log("【补全下载】未找到任何用户配置文件。")
         else:
             self.create_info_bar(f"已将 {len(found_users)} 个用户添加到补全下载队列。", is_error=False)
-            if self.current_downloading_uid is None:
-                self.start_next_download()
-
-    def _read_user_json_config(self, json_path):
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            self.append_log(f"错误: 读取配置文件 {json_path} 失败: {e}")
-            return None
-
-    def _get_proxies(self):
-        p = get_config().get('proxy', {});
-        t, a, p_ = p.get('type', 'none'), p.get('address', ''), p.get('port', '')
-        if t == 'none' or not a or not p_: return None
-        proto = 'socks5' if t == '2' else 'http';
-        return {'http': f"{proto}://{a}:{p_}", 'https': f"{proto}://{a}:{p_}"}
-
-    def _generate_metadata_from_files(self, item_id, item_folder_path, item_type):
-        self.append_log(f"【补全下载】未找到 {item_type} {item_id} 的配置文件，尝试从文件生成...")
-        extracted_image_ids = set()
-
-        path_config = get_config().get('download_path', {})
-        pid_option = path_config.get('pid_option', '无')
-
-        scan_root_dir = item_folder_path
-
-        for root, dirs, files in os.walk(scan_root_dir):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-                    match = re.match(r'(\d+)', file)
-                    if match:
-                        extracted_image_ids.add(match.group(1))
-
-        if not extracted_image_ids:
-            self.append_log(f"【补全下载】在 {item_folder_path} 中未找到任何图片文件。")
-            return None
-
-        sorted_ids = sorted(list(extracted_image_ids), key=lambda x: int(x) if x.isdigit() else x)
-
-        entity_name = item_id
-        if item_type == 'user':
-            try:
-                cookie = cookie_manager.get_cookie()
-                headers = {"cookie": f"PHPSESSID={cookie}", "referer": "https://www.pixiv.net",
-                           "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
-                proxies = self._get_proxies()
-                user_profile_url = f"https://www.pixiv.net/ajax/user/{item_id}/profile/top"
-                response = requests.get(user_profile_url, headers=headers, proxies=proxies, timeout=10)
-                response.raise_for_status()
-                user_data = response.json()
-                if not user_data.get('error') and user_data.get('body', {}).get('name'):
-                    entity_name = user_data['body']['name']
-                else:
-                    self.append_log(f"【补全下载】无法获取用户 {item_id} 的名称，将使用ID作为名称。")
-            except Exception as e:
-                self.append_log(f"【补全下载】获取用户 {item_id} 名称时发生错误: {e}，将使用ID作为名称。")
-
-        meta = {
-            "quantity": len(sorted_ids),
-            "image_id": sorted_ids,
-            "download_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "base_path": os.path.abspath(path_config.get('base_path', './downloads')),
-            "uid_option": path_config.get('uid_option', 'UID'),
-            "pid_option": pid_option
-        }
-
-        if item_type == 'user':
-            meta["user_name"] = entity_name
-            meta["user_id"] = item_id
-        elif item_type == 'tag':
-            meta["tag_name"] = item_id
-            meta["tag_id"] = item_id
-
-        json_file_path = os.path.join(item_folder_path, f"{item_id}.json")
-        try:
-            os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(meta, f, ensure_ascii=False, indent=2)
-            self.append_log(f"【补全下载】已为 {item_type} {item_id} 生成配置文件: {json_file_path}")
-            return sorted_ids
-        except Exception as e:
-            self.append_log(f"【补全下载】生成配置文件 {json_file_path} 失败: {e}")
-            return None
-
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)